@@ -0,0 +1,133 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ansible_base.lib.abstract_models.common import CommonModel, reading_raw_encrypted_values
+from ansible_base.lib.utils.management import StateFileMixin
+
+
+def get_encrypted_models() -> dict:
+    """
+    Returns a dict of model label to (model, [EncryptedFieldDescriptor]) for every model with encrypted fields
+    """
+    encrypted_models = {}
+    for model in apps.get_models():
+        if not issubclass(model, CommonModel) or model._meta.proxy:
+            continue
+        # Fields inherited from a concrete parent model are re-encrypted with the parent
+        descriptors = [descriptor for descriptor in model._get_encrypted_field_descriptors() if descriptor.field.model is model]
+        if descriptors:
+            encrypted_models[model._meta.label] = (model, descriptors)
+    return encrypted_models
+
+
+class Command(StateFileMixin, BaseCommand):
+    help = (
+        "Re-encrypt the encrypted fields of all models with the primary key and method of the encryption key ring. "
+        "Rows are processed in primary key batches so this can be run while the service is online."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", dest="models", help="Only re-encrypt this model (app_label.ModelName), can be repeated", required=False)
+        parser.add_argument("--batch-size", type=int, default=500, help="The number of rows to re-encrypt in each transaction", required=False)
+        parser.add_argument("--workers", type=int, default=1, help="The number of threads used to decrypt and encrypt the values of a batch", required=False)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to sleep between batches to throttle the load on the database", required=False)
+        self.add_state_file_argument(parser)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows which need to be re-encrypted", required=False)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        encrypted_models = get_encrypted_models()
+        labels = options['models'] or list(encrypted_models.keys())
+        for label in labels:
+            if label not in encrypted_models:
+                raise CommandError(f"{label} is not a model with encrypted fields, choices are: {', '.join(encrypted_models.keys())}")
+
+        self.verbosity = options['verbosity']
+        self.state = self.load_state(options['state_file'])
+
+        for label in labels:
+            model, descriptors = encrypted_models[label]
+            self.reencrypt_model(model, descriptors, options)
+
+    def reencrypt_model(self, model, descriptors, options):
+        label = model._meta.label
+        model_state = self.state.setdefault(label, {'last_pk': None, 'rows': 0, 'reencrypted': 0, 'done': False})
+        if model_state['done']:
+            self.stdout.write(f"{label}: already re-encrypted, skipping")
+            return
+
+        field_names = [descriptor.field.name for descriptor in descriptors]
+        self.stdout.write(f"{label}: re-encrypting {', '.join(field_names)}")
+
+        pk_queryset = model._base_manager.order_by('pk').values_list('pk', flat=True)
+        if model_state['last_pk'] is not None:
+            pk_queryset = pk_queryset.filter(pk__gt=model_state['last_pk'])
+
+        stats = {'start_time': time.monotonic(), 'rows': 0, 'reencrypted': 0}
+        batch = []
+        for pk in pk_queryset.iterator(chunk_size=options['batch_size']):
+            batch.append(pk)
+            if len(batch) >= options['batch_size']:
+                self.process_batch(model, descriptors, batch, model_state, stats, options)
+                batch = []
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+        if batch:
+            self.process_batch(model, descriptors, batch, model_state, stats, options)
+
+        if not options['dry_run']:
+            model_state['done'] = True
+            self.save_state()
+        self.report(label, stats, finished=True, dry_run=options['dry_run'])
+
+    def process_batch(self, model, descriptors, batch, model_state, stats, options):
+        reencrypted = self.reencrypt_batch(model, descriptors, batch, options['workers'], options['dry_run'])
+        stats['rows'] += len(batch)
+        stats['reencrypted'] += reencrypted
+        if not options['dry_run']:
+            model_state['last_pk'] = batch[-1]
+            model_state['rows'] += len(batch)
+            model_state['reencrypted'] += reencrypted
+            self.save_state()
+        self.report(model._meta.label, stats, dry_run=options['dry_run'])
+
+    def reencrypt_batch(self, model, descriptors, pks, workers, dry_run) -> int:
+        with transaction.atomic():
+            # Lock the rows so that concurrent changes to them are not overwritten
+            objs = list(model._base_manager.select_for_update().filter(pk__in=pks).order_by('pk'))
+            if dry_run:
+                return sum(1 for obj in objs if any(descriptor.needs_reencryption(obj) for descriptor in descriptors))
+
+            changed_objs = {}
+            changed_fields = []
+            for descriptor in descriptors:
+                # Re-encrypt each field for the whole batch at once
+                needs_reencryption = [obj for obj in objs if descriptor.needs_reencryption(obj)]
+                if needs_reencryption:
+                    descriptor.reencrypt_many(needs_reencryption, workers=workers)
+                    changed_objs.update((obj.pk, obj) for obj in needs_reencryption)
+                    changed_fields.append(descriptor.field.name)
+
+            if changed_objs:
+                with reading_raw_encrypted_values(*changed_objs.values()):
+                    model._base_manager.bulk_update(list(changed_objs.values()), changed_fields)
+            return len(changed_objs)
+
+    def report(self, label, stats, finished=False, dry_run=False):
+        elapsed = time.monotonic() - stats['start_time']
+        rate = stats['rows'] / elapsed if elapsed > 0 else 0
+        if dry_run:
+            message = f"{label}: {stats['reencrypted']} of {stats['rows']} rows need to be re-encrypted"
+        elif finished:
+            message = f"{label}: finished, re-encrypted {stats['reencrypted']} of {stats['rows']} rows in {elapsed:.2f}s ({rate:.1f} rows/s)"
+        else:
+            message = f"{label}: processed {stats['rows']} rows, re-encrypted {stats['reencrypted']} ({rate:.1f} rows/s)"
+        if finished or self.verbosity > 1:
+            self.stdout.write(message)
@@ -2,10 +2,86 @@ from django.conf import settings
 from django.db.models import JSONField, ManyToManyField, fields
 
 from ansible_base.authentication.authenticator_plugins.utils import generate_authenticator_slug, get_authenticator_plugin
-from ansible_base.lib.abstract_models.common import UniqueNamedCommonModel
+from ansible_base.lib.abstract_models.common import EncryptedFieldDescriptor, UniqueNamedCommonModel
 from ansible_base.lib.utils.models import prevent_search
 
 
+class AuthenticatorConfigurationDescriptor(EncryptedFieldDescriptor):
+    """
+    The keys of the configuration which are encrypted depend on the authenticator plugin so the configuration is
+    decrypted (and encrypted) a key at a time as specified by the plugins configuration_encrypted_fields.
+    """
+
+    def _get_encrypted_keys(self, instance):
+        authenticator = get_authenticator_plugin(instance.type)
+        return getattr(authenticator, 'configuration_encrypted_fields', [])
+
+    def decrypt_value(self, instance, value):
+        from ansible_base.lib.utils.encryption import ENCRYPTED_STRING, ansible_encryption
+
+        if not isinstance(value, dict):
+            return value
+
+        try:
+            encrypted_keys = [key for key in self._get_encrypted_keys(instance) if str(value.get(key, '')).startswith(ENCRYPTED_STRING)]
+        except ImportError:
+            # A log message will already be displayed if this fails
+            return value
+
+        if not encrypted_keys:
+            return value
+
+        # Decrypt into a copy so that the raw value loaded from the database stays encrypted
+        value = dict(value)
+        for key in encrypted_keys:
+            value[key] = ansible_encryption.decrypt_string(value[key])
+        return value
+
+    def encrypt_value(self, instance, value):
+        from ansible_base.lib.utils.encryption import ansible_encryption
+
+        if not isinstance(value, dict):
+            return value
+
+        # Here we are going to allow an exception to raise because what else can we do at this point?
+        encrypted_keys = [key for key in self._get_encrypted_keys(instance) if key in value]
+        if not encrypted_keys:
+            return value
+
+        value = dict(value)
+        for key in encrypted_keys:
+            value[key] = ansible_encryption.encrypt_string(value[key])
+        return value
+
+    def needs_reencryption(self, instance):
+        from ansible_base.lib.utils.encryption import ansible_encryption
+
+        raw_value = instance.__dict__.get(self.field.attname, None)
+        if not isinstance(raw_value, dict):
+            return False
+
+        try:
+            encrypted_keys = self._get_encrypted_keys(instance)
+        except ImportError:
+            # Without the plugin we can't know which keys are encrypted
+            return False
+
+        return any(raw_value.get(key) and not ansible_encryption.is_current(raw_value[key]) for key in encrypted_keys)
+
+    def reencrypt_many(self, instances, workers: int = None):
+        # Each configuration has its own set of encrypted keys so they are re-encrypted one at a time
+        for instance in instances:
+            self.reencrypt(instance)
+
+    def current_value(self, instance):
+        # The decrypted configuration is a dict which may have been modified in place so it has to be used if it was ever read
+        raw_value = instance.__dict__.get(self.field.attname, None)
+        cached = instance.__dict__.get('_decrypted_values', {}).get(self.field.attname, None)
+        if cached is not None and cached[0] is raw_value:
+            return cached[1]
+        return raw_value
+
+
 class Authenticator(UniqueNamedCommonModel):
     enabled = fields.BooleanField(default=False, help_text="Should this authenticator be enabled")
     create_objects = fields.BooleanField(default=True, help_text="Allow authenticator to create objects (users, teams, organizations)")
@@ -35,44 +111,22 @@ class Authenticator(UniqueNamedCommonModel):
     reverse_foreign_key_fields = ['authenticator-map']
 
     def save(self, *args, **kwargs):
-        from ansible_base.lib.utils.encryption import ansible_encryption
-
         # Here we are going to allow an exception to raise because what else can we do at this point?
         authenticator = get_authenticator_plugin(self.type)
 
         if not self.category:
             self.category = authenticator.category
 
-        for field in getattr(authenticator, 'configuration_encrypted_fields', []):
-            if field in self.configuration:
-                self.configuration[field] = ansible_encryption.encrypt_string(self.configuration[field])
-
         if not self.slug:
             self.slug = generate_authenticator_slug(self.type, self.name)
             # TODO: What happens if computed slug is not unique?
             # You would have to create an adapter with a name, rename it and then create a new one with the same name
+        # The encrypted configuration fields are encrypted by the AuthenticatorConfigurationDescriptor in CommonModel.save
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
-    @classmethod
-    def from_db(cls, db, field_names, values):
-        from ansible_base.lib.utils.encryption import ENCRYPTED_STRING, ansible_encryption
-
-        instance = super().from_db(db, field_names, values)
-
-        try:
-            authenticator = get_authenticator_plugin(instance.type)
-            for field in getattr(authenticator, 'configuration_encrypted_fields', []):
-                if field in instance.configuration and instance.configuration[field].startswith(ENCRYPTED_STRING):
-                    instance.configuration[field] = ansible_encryption.decrypt_string(instance.configuration[field])
-        except ImportError:
-            # A log message will already be displayed if this fails
-            pass
-
-        return instance
-
     def get_login_url(self):
         plugin = get_authenticator_plugin(self.type)
         return plugin.get_login_url(self)
@@ -88,3 +142,7 @@ class Authenticator(UniqueNamedCommonModel):
             pass
 
         return response
+
+
+# Encrypted keys of the configuration are decrypted lazily the first time the configuration is read
+Authenticator.configuration = AuthenticatorConfigurationDescriptor(Authenticator._meta.get_field('configuration'))
@@ -1,6 +1,7 @@
 from django.db import models
 
 from ansible_base.lib.abstract_models.common import NamedCommonModel
+from ansible_base.lib.utils.models import filterable_json_keys
 
 from .authenticator import Authenticator
 
@@ -58,11 +59,19 @@ class AuthenticatorMap(NamedCommonModel):
         blank=True,
         help_text='An organization name this rule works on',
     )
-    triggers = models.JSONField(
-        null=False,
-        default=dict,
-        blank=True,
-        help_text="Trigger information for this rule",
+    triggers = filterable_json_keys(
+        models.JSONField(
+            null=False,
+            default=dict,
+            blank=True,
+            help_text="Trigger information for this rule",
+        ),
+        'always',
+        'never',
+        'groups',
+        'groups__*',
+        'attributes',
+        'attributes__*',
     )
     order = models.PositiveIntegerField(
         null=False,
@@ -1,6 +1,6 @@
 from collections import OrderedDict
 
-from rest_framework.serializers import ChoiceField, ValidationError
+from rest_framework.serializers import ChoiceField, ListSerializer, ValidationError
 
 from ansible_base.authentication.authenticator_plugins.utils import get_authenticator_plugin, get_authenticator_plugins
 from ansible_base.authentication.models import Authenticator
@@ -25,15 +25,19 @@ class AuthenticatorSerializer(NamedCommonModelSerializer):
     # TODO: Do we need/want to delve into dicts and search their keys?
     def to_representation(self, authenticator):
         ret = super().to_representation(authenticator)
-        configuration = authenticator.configuration
         masked_configuration = OrderedDict()
 
         try:
             authenticator_plugin = get_authenticator_plugin(authenticator.type)
             encrypted_keys = authenticator_plugin.configuration_encrypted_fields
 
-            # If the authenticator configuration has a to_representation we need to respect it
-            ret['configuration'] = authenticator_plugin.to_representation(authenticator)
+            if isinstance(self.parent, ListSerializer):
+                # Lists are masked from the stored configuration so that listing authenticators doesn't decrypt anything
+                configuration = Authenticator.configuration.raw_value(authenticator)
+            else:
+                configuration = authenticator.configuration
+                # If the authenticator configuration has a to_representation we need to respect it
+                ret['configuration'] = authenticator_plugin.to_representation(authenticator)
 
             keys = list(configuration.keys())
             keys.sort()
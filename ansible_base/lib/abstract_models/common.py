@@ -1,9 +1,14 @@
+import copy
 import logging
+from contextlib import contextmanager
 
 from crum import get_current_user
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from django.db.models.signals import class_prepared
+from django.dispatch import receiver
 from django.urls.exceptions import NoReverseMatch
 from django.utils import timezone
 from inflection import underscore
@@ -14,6 +19,121 @@ from ansible_base.lib.utils.settings import get_setting
 logger = logging.getLogger('ansible_base.lib.abstract_models.common')
 
 
+class EncryptedFieldDescriptor(DeferredAttribute):
+    """
+    Attribute descriptor for a model field which is stored encrypted in the database.
+
+    The raw (encrypted) value loaded from the database is kept in the instance __dict__ and is only decrypted
+    the first time the attribute is read. The decrypted value is memoised on the instance until the field is assigned again.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+
+        raw_value = super().__get__(instance, cls)
+        # While the instance is being written to the database the raw value needs to be returned
+        if instance.__dict__.get('_reading_raw_encrypted_values', False):
+            return raw_value
+
+        decrypted_values = instance.__dict__.setdefault('_decrypted_values', {})
+        cached = decrypted_values.get(self.field.attname, None)
+        if cached is not None and cached[0] is raw_value:
+            return cached[1]
+
+        value = self.decrypt_value(instance, raw_value)
+        decrypted_values[self.field.attname] = (raw_value, value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def decrypt_value(self, instance, value):
+        from ansible_base.lib.utils.encryption import ENCRYPTED_STRING, ansible_encryption
+
+        if isinstance(value, str) and value.startswith(ENCRYPTED_STRING):
+            return ansible_encryption.decrypt_string(value)
+        return value
+
+    def encrypt_value(self, instance, value):
+        from ansible_base.lib.utils.encryption import ansible_encryption
+
+        if value:
+            return ansible_encryption.encrypt_string(value)
+        return value
+
+    def raw_value(self, instance):
+        """
+        Returns the value of the field on instance as it is stored in the database, without decrypting it
+        """
+        return super().__get__(instance, type(instance))
+
+    def current_value(self, instance):
+        """
+        Returns the value which needs to be encrypted for this field on instance without decrypting anything
+        """
+        # encrypt_string leaves already encrypted strings alone so an untouched raw value can be passed straight through
+        return instance.__dict__.get(self.field.attname, None)
+
+    def encrypt(self, instance):
+        """
+        Encrypt the current value of the field on instance in preparation for writing it to the database
+        """
+        if self.field.attname not in instance.__dict__:
+            # Deferred fields were never loaded so there is nothing to write
+            return
+
+        value = self.current_value(instance)
+        encrypted_value = self.encrypt_value(instance, value)
+        instance.__dict__[self.field.attname] = encrypted_value
+        if encrypted_value is not value:
+            # Remember the plain text value so reading the field after a save does not need to decrypt it again
+            instance.__dict__.setdefault('_decrypted_values', {})[self.field.attname] = (encrypted_value, value)
+
+    def needs_reencryption(self, instance):
+        """
+        Returns True if the raw value of the field on instance is not encrypted with the primary key and method of the key ring
+        """
+        from ansible_base.lib.utils.encryption import ansible_encryption
+
+        raw_value = instance.__dict__.get(self.field.attname, None)
+        return bool(raw_value) and not ansible_encryption.is_current(raw_value)
+
+    def reencrypt(self, instance):
+        """
+        Decrypt the raw value of the field on instance with whichever key it was encrypted with and encrypt it with the primary key
+        """
+        value = self.decrypt_value(instance, instance.__dict__.get(self.field.attname, None))
+        instance.__dict__[self.field.attname] = self.encrypt_value(instance, value)
+        instance.__dict__.get('_decrypted_values', {}).pop(self.field.attname, None)
+
+    def reencrypt_many(self, instances, workers: int = None):
+        """
+        Re-encrypt the field on all of instances with the batch encryption API, workers is passed through to it
+        """
+        from ansible_base.lib.utils.encryption import ansible_encryption
+
+        attname = self.field.attname
+        values = ansible_encryption.decrypt_many([instance.__dict__.get(attname, None) for instance in instances], workers=workers)
+        for instance, value in zip(instances, ansible_encryption.encrypt_many(values, workers=workers)):
+            instance.__dict__[attname] = value
+            instance.__dict__.get('_decrypted_values', {}).pop(attname, None)
+
+
+@contextmanager
+def reading_raw_encrypted_values(*instances):
+    """
+    Make the encrypted fields of instances return their raw (encrypted) values, this is needed while writing instances to the database
+    """
+    for instance in instances:
+        instance.__dict__['_reading_raw_encrypted_values'] = True
+    try:
+        yield
+    finally:
+        for instance in instances:
+            instance.__dict__.pop('_reading_raw_encrypted_values', None)
+
+
 class CommonModel(models.Model):
     # These are fields that should be reversed lookup as related fields.
     # For example, an environment has related organizations so environment might specify reverse_foreign_key_fields = ['organizations']
@@ -23,6 +143,10 @@ class CommonModel(models.Model):
     # Any field marked as encrypted will automatically be stored in an encrypted fashion
     encrypted_fields = []
 
+    # If set to True, calling save() without update_fields on an instance loaded from the database will only write the columns
+    # which changed since the instance was loaded (plus the modified_on/modified_by audit columns)
+    track_dirty_fields = False
+
     class Meta:
         abstract = True
 
@@ -70,8 +194,36 @@ class CommonModel(models.Model):
                     user = None
         return user
 
+    def _snapshot_field_values(self):
+        # Deferred fields are not in __dict__ so they are never considered loaded
+        self._loaded_field_values = {
+            field.attname: copy.deepcopy(self.__dict__[field.attname]) for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        """
+        Return the names of the concrete fields which changed since this instance was loaded or saved.
+        Returns None if the instance is not tracking its field values.
+        """
+        loaded_values = getattr(self, '_loaded_field_values', None)
+        if loaded_values is None:
+            return None
+
+        dirty_fields = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded_values or self.__dict__[field.attname] != loaded_values[field.attname]:
+                dirty_fields.append(field.name)
+        return dirty_fields
+
     def save(self, *args, warn_nonexistent_system_user=True, **kwargs):
-        update_fields = list(kwargs.get('update_fields', []))
+        update_fields = kwargs.get('update_fields', None)
+        if update_fields is None and self.track_dirty_fields and not self._state.adding:
+            update_fields = self.get_dirty_fields()
+        if update_fields is not None:
+            update_fields = list(update_fields)
+
         user = self._attributable_user(warn_nonexistent_system_user)
 
         # Manually perform auto_now_add and auto_now logic.
@@ -79,36 +231,53 @@ class CommonModel(models.Model):
         if not self.pk and not self.created_on:
             self.created_on = now
             self.created_by = user
-            if 'created_on' not in update_fields:
-                update_fields.append('created_on')
-            if 'created_by' not in update_fields:
-                update_fields.append('created_by')
-        if 'modified_on' not in update_fields or not self.modified_on:
+            if update_fields is not None:
+                for field in ('created_on', 'created_by'):
+                    if field not in update_fields:
+                        update_fields.append(field)
+        if update_fields is None or 'modified_on' not in update_fields or not self.modified_on:
             self.modified_on = now
             self.modified_by = user
-            update_fields.append('modified_on')
-            update_fields.append('modified_by')
-
-        # Encrypt any fields
-        from ansible_base.lib.utils.encryption import ansible_encryption
-
-        for field in self.encrypted_fields:
-            field_value = getattr(self, field, None)
-            if field_value:
-                setattr(self, field, ansible_encryption.encrypt_string(field_value))
+            if update_fields is not None:
+                for field in ('modified_on', 'modified_by'):
+                    if field not in update_fields:
+                        update_fields.append(field)
+
+        # Encrypt any fields, if we were given update_fields only the ones being written need to be encrypted
+        for descriptor in self._get_encrypted_field_descriptors():
+            if update_fields is not None and descriptor.field.name not in update_fields:
+                continue
+            descriptor.encrypt(self)
+
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        with reading_raw_encrypted_values(self):
+            super().save(*args, **kwargs)
+
+        if self.track_dirty_fields:
+            self._snapshot_field_values()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if self.track_dirty_fields:
+            self._snapshot_field_values()
 
-        super().save(*args, **kwargs)
+    @classmethod
+    def _get_encrypted_field_descriptors(cls):
+        descriptors = []
+        for field in cls._meta.concrete_fields:
+            descriptor = getattr(cls, field.attname, None)
+            if isinstance(descriptor, EncryptedFieldDescriptor):
+                descriptors.append(descriptor)
+        return descriptors
 
     @classmethod
     def from_db(self, db, field_names, values):
+        # Encrypted fields are decrypted lazily by their EncryptedFieldDescriptor the first time they are read
         instance = super().from_db(db, field_names, values)
 
-        from ansible_base.lib.utils.encryption import ENCRYPTED_STRING, ansible_encryption
-
-        for field in self.encrypted_fields:
-            field_value = getattr(instance, field, None)
-            if field_value and field_value.startswith(ENCRYPTED_STRING):
-                setattr(instance, field, ansible_encryption.decrypt_string(field_value))
+        if instance.track_dirty_fields:
+            instance._snapshot_field_values()
 
         return instance
 
@@ -158,6 +327,16 @@ class CommonModel(models.Model):
         return response
 
 
+@receiver(class_prepared)
+def install_encrypted_field_descriptors(sender, **kwargs):
+    if not issubclass(sender, CommonModel) or sender._meta.abstract:
+        return
+
+    for field in sender._meta.local_fields:
+        if field.name in sender.encrypted_fields and not isinstance(sender.__dict__.get(field.attname), EncryptedFieldDescriptor):
+            setattr(sender, field.attname, EncryptedFieldDescriptor(field))
+
+
 class NamedCommonModel(CommonModel):
     class Meta:
         abstract = True
@@ -60,6 +60,20 @@ if 'ansible_base.rest_filters' in INSTALLED_APPS:
         }
     )
 
+    # The filter strategy middleware only adds debugging headers so it is only added when DEBUG is on
+    try:
+        _add_filter_middleware = DEBUG  # noqa: F821
+    except NameError:
+        _add_filter_middleware = False
+    if _add_filter_middleware:
+        try:
+            MIDDLEWARE  # noqa: F821
+            if 'ansible_base.rest_filters.middleware.FilterStrategyMiddleware' not in MIDDLEWARE:  # noqa: F821
+                MIDDLEWARE.append('ansible_base.rest_filters.middleware.FilterStrategyMiddleware')  # noqa: F821
+        except NameError:
+            MIDDLEWARE = ['ansible_base.rest_filters.middleware.FilterStrategyMiddleware']
+    del _add_filter_middleware
+
 
 if 'ansible_base.authentication' in INSTALLED_APPS:
     try:
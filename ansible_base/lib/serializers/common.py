@@ -5,6 +5,7 @@ from rest_framework import serializers
 from rest_framework.fields import empty
 from rest_framework.reverse import reverse_lazy
 
+from ansible_base.lib.abstract_models.common import reading_raw_encrypted_values
 from ansible_base.lib.utils.encryption import ENCRYPTED_STRING
 
 logger = logging.getLogger('ansible_base.lib.serializers.common')
@@ -54,7 +55,9 @@ class CommonModelSerializer(serializers.ModelSerializer):
         return obj.get_summary_fields()
 
     def to_representation(self, obj):
-        ret = super().to_representation(obj)
+        # The encrypted fields are masked below, serializing their stored values means nothing is decrypted for them
+        with reading_raw_encrypted_values(obj):
+            ret = super().to_representation(obj)
 
         for key in obj.encrypted_fields:
             if key in ret:
@@ -1,8 +1,14 @@
 import base64
 import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from django.conf import settings
 from django.utils.encoding import smart_bytes, smart_str
 from django.utils.functional import SimpleLazyObject
@@ -15,59 +21,228 @@ __all__ = [
 
 ENCRYPTED_STRING = '$encrypted$'
 ENCRYPTION_METHOD = 'AESCBC'
+AESGCM_ENCRYPTION_METHOD = 'AESGCM'
+SUPPORTED_ENCRYPTION_METHODS = (ENCRYPTION_METHOD, AESGCM_ENCRYPTION_METHOD)
 
+KEY_ID_LENGTH = 8
+AESGCM_NONCE_LENGTH = 12
+AESCBC_IV_LENGTH = 16
 
-class Fernet256(Fernet):
-    """Not technically Fernet, but uses the base of the Fernet spec and uses AES-256-CBC
-    instead of AES-128-CBC. All other functionality remain identical.
+
+class EncryptionKey(Fernet):
     """
+    A single key of the key ring, derived from a secret with SHA-512.
 
-    def __init__(self):
+    The key is usable as an AES-256-CBC Fernet256 key and also provides an AES-256-GCM cipher whose key is derived
+    from the same secret with HKDF. The key id is a short hash of the key which is embedded in the encrypted strings.
+    """
+
+    def __init__(self, secret):
         h = hashlib.sha512()
-        h.update(smart_bytes(settings.SECRET_KEY))
+        h.update(smart_bytes(secret))
         self.key = h.digest()
 
         if len(self.key) != 64:
             raise ValueError("Fernet key must be 64 url-safe base64-encoded bytes.")
 
+        self.key_id = hashlib.sha256(self.key).hexdigest()[:KEY_ID_LENGTH]
         self._signing_key = self.key[:32]
         self._encryption_key = self.key[32:]
         self._backend = default_backend()
 
-    def encrypt_string(self, value: str) -> str:
-        # Its possible for a serializer to accept a number for a CharField (like 5). In the serializer its "5" but when we get here it might be 5
-        if type(value) is not str:
-            value = str(value)
+        aead_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b'ansible_base AESGCM').derive(self.key)
+        self._aesgcm = AESGCM(aead_key)
+
+    def decrypt_aesgcm(self, data: bytes, associated_data: bytes) -> bytes:
+        return self._aesgcm.decrypt(data[:AESGCM_NONCE_LENGTH], data[AESGCM_NONCE_LENGTH:], associated_data)
+
+
+class Fernet256(EncryptionKey):
+    """Not technically Fernet, but uses the base of the Fernet spec and uses AES-256-CBC
+    instead of AES-128-CBC. All other functionality remain identical.
+
+    Strings are encrypted with the first (primary) key of the key ring, any of the keys in the ring can be used to decrypt.
+    The key ring defaults to ANSIBLE_BASE_ENCRYPTION_KEYS or [SECRET_KEY] and the method used for encrypting new strings
+    defaults to ANSIBLE_BASE_ENCRYPTION_METHOD or AESCBC. Decryption dispatches on the method and key id in the encrypted string.
+
+    While the key ring is a single key and the method is AESCBC, strings are written in the format from before key ids
+    were added so that nodes still running older code (mixed version deploys, rollbacks) can decrypt them.
+    """
+
+    def __init__(self, secret_keys: list = None, method: str = None):
+        if secret_keys is None:
+            secret_keys = getattr(settings, 'ANSIBLE_BASE_ENCRYPTION_KEYS', None) or [settings.SECRET_KEY]
+        if not secret_keys:
+            raise ValueError("At least one encryption key must be specified")
+
+        if method is None:
+            method = getattr(settings, 'ANSIBLE_BASE_ENCRYPTION_METHOD', None) or ENCRYPTION_METHOD
+        if method not in SUPPORTED_ENCRYPTION_METHODS:
+            raise ValueError(f'Unsupported algorithm: {method}')
+        self.method = method
 
-        if value.startswith(ENCRYPTED_STRING):
-            return value
-        encrypted = self.encrypt(smart_bytes(value))
-        b64data = smart_str(base64.b64encode(encrypted))
-        return f'{ENCRYPTED_STRING}UTF8${ENCRYPTION_METHOD}${b64data}'
+        super().__init__(secret_keys[0])
+        # The primary key is this object, any older keys are only used to decrypt
+        self.keys = {self.key_id: self}
+        for secret in secret_keys[1:]:
+            key = EncryptionKey(secret)
+            self.keys.setdefault(key.key_id, key)
+
+        # AESGCM strings always need a key id for their associated data
+        self.writes_key_id = len(self.keys) > 1 or method != ENCRYPTION_METHOD
+
+    def encrypt_string(self, value: str) -> str:
+        return self.encrypt_many([value])[0]
 
     def decrypt_string(self, value: str) -> str:
         if type(value) is not str:
             raise ValueError("decrypt_string can only accept string")
 
-        if not value.startswith(ENCRYPTED_STRING):
-            return value
-
+        return self.decrypt_many([value])[0]
+
+    def encrypt_many(self, values: list, workers: int = None) -> list:
+        """
+        Encrypt a list of strings, returning the encrypted strings in the same order.
+
+        The random IVs (or nonces) for the whole batch are read at once and the cipher and envelope are only set up once.
+        If workers is more than 1 the batch is split across a pool of that many threads.
+        """
+        values = list(values)
+        if workers and workers > 1 and len(values) > workers:
+            return self._map_chunks(self.encrypt_many, values, workers)
+
+        results = []
+        to_encrypt = []
+        for value in values:
+            # Its possible for a serializer to accept a number for a CharField (like 5). In the serializer its "5" but when we get here it might be 5
+            if type(value) is not str:
+                value = str(value)
+            if not value.startswith(ENCRYPTED_STRING):
+                to_encrypt.append(len(results))
+            results.append(value)
+
+        if not to_encrypt:
+            return results
+
+        prefix = f'{ENCRYPTED_STRING}UTF8${self.method}${self.key_id}$' if self.writes_key_id else f'{ENCRYPTED_STRING}UTF8${self.method}$'
+        if self.method == AESGCM_ENCRYPTION_METHOD:
+            random_bytes = os.urandom(AESGCM_NONCE_LENGTH * len(to_encrypt))
+            associated_data = self._associated_data(self.method, self.key_id)
+            encrypt = self._aesgcm.encrypt
+            for position, index in enumerate(to_encrypt):
+                nonce = random_bytes[position * AESGCM_NONCE_LENGTH : (position + 1) * AESGCM_NONCE_LENGTH]
+                encrypted = nonce + encrypt(nonce, smart_bytes(results[index]), associated_data)
+                results[index] = prefix + smart_str(base64.b64encode(encrypted))
+        else:
+            random_bytes = os.urandom(AESCBC_IV_LENGTH * len(to_encrypt))
+            current_time = int(time.time())
+            for position, index in enumerate(to_encrypt):
+                iv = random_bytes[position * AESCBC_IV_LENGTH : (position + 1) * AESCBC_IV_LENGTH]
+                encrypted = self._encrypt_from_parts(smart_bytes(results[index]), current_time, iv)
+                results[index] = prefix + smart_str(base64.b64encode(encrypted))
+
+        return results
+
+    def decrypt_many(self, values: list, workers: int = None) -> list:
+        """
+        Decrypt a list of strings, returning the decrypted strings in the same order.
+
+        Strings which are not encrypted are returned as is. The key and associated data of each method and key id are only looked up once.
+        If workers is more than 1 the batch is split across a pool of that many threads.
+        """
+        values = list(values)
+        if workers and workers > 1 and len(values) > workers:
+            return self._map_chunks(self.decrypt_many, values, workers)
+
+        decryptors = {}
+        results = []
+        for value in values:
+            if type(value) is not str:
+                raise ValueError("decrypt_many can only accept strings")
+
+            if not value.startswith(ENCRYPTED_STRING):
+                results.append(value)
+                continue
+
+            method, key_id, b64data = self.parse_encrypted_string(value)
+            decryptor = decryptors.get((method, key_id), None)
+            if decryptor is None:
+                decryptor = decryptors[(method, key_id)] = self._get_decryptor(method, key_id)
+            results.append(smart_str(decryptor(base64.b64decode(b64data))))
+
+        return results
+
+    def _get_decryptor(self, method: str, key_id: str):
+        if key_id is None:
+            # Strings encrypted before the key ring existed have no key id, try each of the keys in order
+            def decrypt_without_key_id(encrypted):
+                for key in self.keys.values():
+                    try:
+                        return key.decrypt(encrypted)
+                    except InvalidToken as e:
+                        last_exception = e
+                raise last_exception
+
+            return decrypt_without_key_id
+
+        key = self.keys.get(key_id, None)
+        if key is None:
+            raise ValueError(f'Unknown encryption key id: {key_id}')
+
+        if method == AESGCM_ENCRYPTION_METHOD:
+            associated_data = self._associated_data(method, key_id)
+            return lambda encrypted: key.decrypt_aesgcm(encrypted, associated_data)
+        return key.decrypt
+
+    def _map_chunks(self, function, values: list, workers: int) -> list:
+        chunk_size = -(-len(values) // workers)
+        chunks = [values[i : i + chunk_size] for i in range(0, len(values), chunk_size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return [value for chunk in executor.map(function, chunks) for value in chunk]
+
+    def is_current(self, value: str) -> bool:
+        """
+        Returns True if value is encrypted with the primary key and the method currently used for encrypting,
+        strings without a key id are only current while the key ring is a single key
+        """
+        if type(value) is not str or not value.startswith(ENCRYPTED_STRING):
+            return False
+        try:
+            method, key_id, _ = self.parse_encrypted_string(value)
+        except ValueError:
+            return False
+        if key_id is None:
+            return method == self.method and not self.writes_key_id
+        return method == self.method and key_id == self.key_id
+
+    def parse_encrypted_string(self, value: str) -> tuple:
+        """
+        Split an encrypted string into its method, key id (None for strings without a key id) and base64 data
+        """
         raw_data = value[len(ENCRYPTED_STRING) :]
 
         # If the encrypted string contains a UTF8 marker, discard it
         if raw_data.startswith('UTF8$'):
             raw_data = raw_data[len('UTF8$') :]
 
-        # Extract the algorithm and ensure its what we expect
-        algo, b64data = raw_data.split('$', 1)
-        if algo != ENCRYPTION_METHOD:
-            raise ValueError(f'Unsupported algorithm: {algo}')
+        # Extract the algorithm and ensure its one we support
+        method, raw_data = raw_data.split('$', 1)
+        if method not in SUPPORTED_ENCRYPTION_METHODS:
+            raise ValueError(f'Unsupported algorithm: {method}')
+
+        # The base64 alphabet does not contain $ so a $ means there is a key id
+        if '$' in raw_data:
+            key_id, b64data = raw_data.split('$', 1)
+        elif method == ENCRYPTION_METHOD:
+            key_id, b64data = None, raw_data
+        else:
+            raise ValueError(f'Missing encryption key id for algorithm: {method}')
 
-        # Finally decode the value
-        encrypted = base64.b64decode(b64data)
-        value = self.decrypt(encrypted)
+        return method, key_id, b64data
 
-        return smart_str(value)
+    def _associated_data(self, method: str, key_id: str) -> bytes:
+        # Authenticate the envelope along with the data so the method and key id can't be swapped
+        return smart_bytes(f'{method}${key_id}')
 
 
 ansible_encryption = SimpleLazyObject(func=lambda: Fernet256())
@@ -0,0 +1,29 @@
+import json
+import os
+
+
+class StateFileMixin:
+    """
+    A mixin for management commands which record their progress in a JSON --state-file, so an interrupted run can be resumed
+    """
+
+    def add_state_file_argument(self, parser):
+        parser.add_argument(
+            "--state-file", help="A file to record progress in, if the command is interrupted running it again with the same file resumes it", required=False
+        )
+
+    def load_state(self, state_file) -> dict:
+        self.state_file = state_file
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        # Written to a temporary file first so an interrupted write doesn't leave a truncated state file
+        tmp_file = f'{self.state_file}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.state, f, default=str)
+        os.replace(tmp_file, self.state_file)
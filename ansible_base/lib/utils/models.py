@@ -1,22 +1,69 @@
+import threading
+from collections import namedtuple
 from itertools import chain
+from types import MappingProxyType
 
+from django.apps import apps
+from django.db.models.fields.related import ForeignObjectRel
 from inflection import underscore
 
+FieldIndex = namedtuple("FieldIndex", ["names", "attnames", "all_names", "has_polymorphic_ctype", "fields_map", "prevent_search"])
+
+_field_indexes = {}
+_field_indexes_lock = threading.Lock()
+
+
+def build_field_index(model) -> FieldIndex:
+    all_fields = model._meta.get_fields()
+    fields = [
+        field
+        for field in all_fields
+        # For complete backwards compatibility, you may want to exclude
+        # GenericForeignKey from the results.
+        if not (field.many_to_one and field.related_model is None)
+    ]
+    names = frozenset(field.name for field in fields)
+    attnames = frozenset(field.attname for field in fields if hasattr(field, 'attname'))
+    fields_map = MappingProxyType(dict(model._meta.fields_map))
+
+    prevent_search = set()
+    for field in chain(all_fields, fields_map.values()):
+        # A relation is prevented from search if the field on the other side of it is
+        if getattr(field.field if isinstance(field, ForeignObjectRel) else field, '__prevent_search__', False):
+            prevent_search.add(field.name)
+
+    return FieldIndex(
+        names=names,
+        attnames=attnames,
+        all_names=names | attnames,
+        has_polymorphic_ctype='polymorphic_ctype' in names,
+        fields_map=fields_map,
+        prevent_search=frozenset(prevent_search),
+    )
+
+
+def get_field_index(model) -> FieldIndex:
+    """
+    Returns the FieldIndex of model: its field names and attnames, whether it has a polymorphic_ctype,
+    its fields_map and the names of fields and relations marked with prevent_search.
+
+    Indexes are cached per model once the app registry is ready, before that the fields of a model may still change.
+    """
+    index = _field_indexes.get(model, None)
+    if index is not None:
+        return index
+
+    index = build_field_index(model)
+    if apps.ready:
+        with _field_indexes_lock:
+            index = _field_indexes.setdefault(model, index)
+    return index
+
 
 def get_all_field_names(model):
     # Implements compatibility with _meta.get_all_field_names
     # See: https://docs.djangoproject.com/en/1.11/ref/models/meta/#migrating-from-the-old-api
-    return list(
-        set(
-            chain.from_iterable(
-                (field.name, field.attname) if hasattr(field, 'attname') else (field.name,)
-                for field in model._meta.get_fields()
-                # For complete backwards compatibility, you may want to exclude
-                # GenericForeignKey from the results.
-                if not (field.many_to_one and field.related_model is None)
-            )
-        )
-    )
+    return list(get_field_index(model).all_names)
 
 
 def get_type_for_model(model):
@@ -44,6 +91,29 @@ def prevent_search(relation):
     return relation
 
 
+def filterable_json_keys(field, *key_paths):
+    """
+    Used to allow filtering on keys inside of a JSONField, by default only the whole document can be filtered on
+    e.g.,
+
+    class AuthenticatorMap(NamedCommonModel):
+        triggers = filterable_json_keys(models.JSONField(...), 'always', 'groups', 'groups__*')
+
+    Nested keys are separated by __ and * matches any single key. Only the listed key paths can be filtered on,
+    `ansible_base.rest_filters.rest_framework.field_lookup_backend.FieldLookupBackend` rejects any other keys
+    """
+    setattr(field, '__filterable_json_keys__', tuple(key_paths))
+    return field
+
+
+def is_json_key_path_allowed(field, keys) -> bool:
+    for key_path in getattr(field, '__filterable_json_keys__', ()):
+        allowed_keys = key_path.split('__')
+        if len(allowed_keys) == len(keys) and all(allowed in ('*', key) for allowed, key in zip(allowed_keys, keys)):
+            return True
+    return False
+
+
 def user_summary_fields(user):
     sf = {}
     for field_name in ('id', 'username', 'first_name', 'last_name'):
@@ -1,6 +1,9 @@
 import logging
 
 from django.apps import AppConfig
+from django.core.exceptions import FieldDoesNotExist
+from django.core.signals import setting_changed
+from django.db import transaction
 from django.db.models.signals import post_migrate
 
 import ansible_base.lib.checks  # noqa: F401 - register checks
@@ -9,6 +12,7 @@ logger = logging.getLogger('ansible_base.resource_registry.apps')
 
 
 def initialize_resources(sender, **kwargs):
+    from ansible_base.lib.utils.settings import get_setting
     from ansible_base.resource_registry.registry import get_registry
 
     # There isn't any evidence of this in the documentation, but it appears as though
@@ -31,37 +35,175 @@ def initialize_resources(sender, **kwargs):
     if apps is None:
         from django.apps import apps
 
-    Resource = apps.get_model("dab_resource_registry", "Resource")
+    if not get_registry():
+        return
+
+    initialize_resource_types(apps)
+
+    # Large installations can create the resources with the initialize_resources command instead
+    if get_setting('ANSIBLE_BASE_RESOURCE_CREATE_ON_MIGRATE', True):
+        ResourceType = apps.get_model("dab_resource_registry", "ResourceType")
+        for r_type in ResourceType.objects.filter(migrated=False).select_related('content_type'):
+            try:
+                apps.get_model(r_type.content_type.app_label, r_type.content_type.model)
+            except LookupError:
+                # The app of the model isn't migrated yet (ex. migrate dab_resource_registry), a later migrate creates its Resources
+                continue
+            logger.info(f"adding unmigrated resources for {r_type.name}")
+            create_resources(apps, r_type)
+
+
+def initialize_resource_types(apps):
+    from ansible_base.resource_registry.registry import get_registry
+
     ResourceType = apps.get_model("dab_resource_registry", "ResourceType")
     ContentType = apps.get_model("contenttypes", "ContentType")
 
     logger.info("updating resource types")
     registry = get_registry()
-    if registry:
-        # Create resource types
-        for key, resource in registry.get_resources().items():
-            content = ContentType.objects.get_for_model(resource.model)
-
-            if serializer := resource.managed_serializer:
-                resource_type = f"shared.{serializer.RESOURCE_TYPE}"
-            else:
-                resource_type = f"{registry.api_config.service_type}.{content.model}"
-            defaults = {"externally_managed": resource.externally_managed, "name": resource_type}
-            ResourceType.objects.update_or_create(content_type=content, defaults=defaults)
-
-        # Create resources
-        for r_type in ResourceType.objects.filter(migrated=False):
-            resource_model = apps.get_model(r_type.content_type.app_label, r_type.content_type.model)
+    for key, resource in registry.get_resources().items():
+        content = ContentType.objects.get_for_model(resource.model)
+
+        if serializer := resource.managed_serializer:
+            resource_type = f"shared.{serializer.RESOURCE_TYPE}"
+        else:
+            resource_type = f"{registry.api_config.service_type}.{content.model}"
+        defaults = {"externally_managed": resource.externally_managed, "name": resource_type}
+        ResourceType.objects.update_or_create(content_type=content, defaults=defaults)
+
+
+def create_resources(apps, r_type, batch_size=1000, start_after=None, progress=None) -> int:
+    """
+    Create the missing Resources of the rows of the model of r_type and mark r_type as migrated.
+
+    Only the primary key and name columns are read, streamed in primary key order, and the Resources of each batch
+    are created in their own transaction. The rows of the models with a managed serializer are loaded again by batch
+    to compute their content hashes, once the content_hash column exists. If this is interrupted, starting again after
+    the last primary key passed to progress(last_pk, rows) resumes it, rows which already have a Resource are skipped either way.
+    Returns the number of rows processed.
+    """
+    from ansible_base.resource_registry.registry import get_registry
 
-            logger.info(f"adding unmigrated resources for {r_type.name}")
+    resource_model = apps.get_model(r_type.content_type.app_label, r_type.content_type.model)
+
+    # The config is looked up once, not for every row
+    config = get_registry().get_resources().get(resource_model._meta.label, None)
+    columns = ['pk']
+    if config is not None:
+        try:
+            resource_model._meta.get_field(config.name_field)
+            columns.append(config.name_field)
+        except FieldDoesNotExist:
+            pass
+
+    rows = resource_model._base_manager.order_by('pk').values_list(*columns)
+    if start_after is not None:
+        rows = rows.filter(pk__gt=start_after)
+
+    processed = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            processed += create_resource_batch(apps, r_type, batch, resource_model, config)
+            if progress:
+                progress(batch[-1][0], processed)
+            batch = []
+    if batch:
+        processed += create_resource_batch(apps, r_type, batch, resource_model, config)
+        if progress:
+            progress(batch[-1][0], processed)
+
+    r_type.migrated = True
+    r_type.save(update_fields=['migrated'])
+    return processed
+
+
+def has_content_hash(apps) -> bool:
+    """
+    Returns True if the Resource model of apps has the content_hash column, it doesn't before migration 0003
+    """
+    try:
+        apps.get_model("dab_resource_registry", "Resource")._meta.get_field('content_hash')
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def get_content_hashes(resource_model, config, pks) -> dict:
+    """
+    Returns the content hashes of the rows of resource_model with pks by object_id.
+
+    resource_model can be a historical model, which matches the database but may not have every field the managed serializer
+    reads yet, then nothing is hashed rather than hashing partial data (reconcile_resources computes the hashes later).
+    """
+    from ansible_base.resource_registry.managers import get_serialized_fields
+    from ansible_base.resource_registry.models import get_content_hash
+
+    if config is None or config.managed_serializer is None:
+        return {}
+    for name in get_serialized_fields(config):
+        try:
+            resource_model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return {}
+    objs = resource_model._base_manager.in_bulk(pks)
+    return {str(pk): get_content_hash(obj, config.managed_serializer) for pk, obj in objs.items()}
+
+
+def create_resource_batch(apps, r_type, rows, resource_model, config=None) -> int:
+    from ansible_base.resource_registry.models import ResourceChange, record_resource_changes
 
-            data = []
-            for obj in resource_model.objects.all():
-                data.append(Resource.init_from_object(obj, resource_type=r_type))
+    Resource = apps.get_model("dab_resource_registry", "Resource")
+    resources = [
+        Resource(object_id=str(row[0]), content_type_id=r_type.content_type_id, name=str(row[1])[:512] if len(row) > 1 and row[1] is not None else None)
+        for row in rows
+    ]
+    if has_content_hash(apps):
+        content_hashes = get_content_hashes(resource_model, config, [row[0] for row in rows])
+        for resource in resources:
+            resource.content_hash = content_hashes.get(resource.object_id)
+    with transaction.atomic():
+        Resource.objects.bulk_create(resources, ignore_conflicts=True)
+        # Only the rows which didn't have a Resource yet have the generated resource_id
+        created = Resource.objects.filter(resource_id__in=[resource.resource_id for resource in resources])
+        record_resource_changes(created, ResourceChange.CREATE, change_model=apps.get_model("dab_resource_registry", "ResourceChange"))
+    return len(rows)
+
+
+def backfill_content_hashes(apps, r_type, batch_size=1000) -> int:
+    """
+    Compute the content hashes of the Resources of r_type which don't have one, ex. the ones created before content hashes were added,
+    returns the number of Resources hashed. The resources didn't change, so nothing is recorded in the change feed.
+    """
+    from ansible_base.resource_registry.registry import get_registry
 
-            Resource.objects.bulk_create(data, ignore_conflicts=True)
-            r_type.migrated = True
-            r_type.save()
+    registry = get_registry()
+    if not registry:
+        return 0
+    try:
+        resource_model = apps.get_model(r_type.content_type.app_label, r_type.content_type.model)
+    except LookupError:
+        # The model was removed, reconcile_resources deletes its Resources
+        return 0
+    config = registry.get_resources().get(resource_model._meta.label, None)
+
+    Resource = apps.get_model("dab_resource_registry", "Resource")
+    unhashed = Resource.objects.filter(content_type_id=r_type.content_type_id, content_hash__isnull=True).order_by('pk')
+    hashed = 0
+    last_pk = None
+    while True:
+        # Resources whose row is gone stay unhashed, so the batches are paged by pk instead of repeating the query
+        batch = list((unhashed if last_pk is None else unhashed.filter(pk__gt=last_pk)).values_list('pk', 'object_id')[:batch_size])
+        if not batch:
+            return hashed
+        last_pk = batch[-1][0]
+        content_hashes = get_content_hashes(resource_model, config, [object_id for _, object_id in batch])
+        if not content_hashes:
+            return hashed
+        resources = [Resource(pk=pk, content_hash=content_hashes[object_id]) for pk, object_id in batch if object_id in content_hashes]
+        Resource.objects.bulk_update(resources, ['content_hash'])
+        hashed += len(resources)
 
 
 class AnsibleAuthConfig(AppConfig):
@@ -73,4 +215,11 @@ class AnsibleAuthConfig(AppConfig):
     def ready(self):
         post_migrate.connect(initialize_resources, sender=self)
 
-        from ansible_base.resource_registry.signals import handlers  # noqa: F401 - register signals
+        from ansible_base.resource_registry.registry import ResourceInspector
+
+        # The endpoints are inspected again if the URL conf is changed (ex. by tests)
+        setting_changed.connect(ResourceInspector.clear_instance, dispatch_uid='dab_resource_registry_clear_inspector')
+
+        from ansible_base.resource_registry.signals.handlers import connect_resource_signals
+
+        connect_resource_signals()
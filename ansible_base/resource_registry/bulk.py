@@ -0,0 +1,190 @@
+import uuid
+from itertools import groupby
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+
+from ansible_base.lib.utils.validation import ansible_id_validator
+from ansible_base.resource_registry.managers import bulk_resource_operation, create_resources, refresh_resources
+from ansible_base.resource_registry.models import Resource, ResourceType
+
+CREATED = 'created'
+UPDATED = 'updated'
+FAILED = 'failed'
+
+# Errors which fail a chunk of items while it is applied, the items are then applied one at a time to find the ones which failed
+APPLY_ERRORS = (DatabaseError, DjangoValidationError, serializers.ValidationError, TypeError, ValueError)
+
+
+class ResourceBulkItemSerializer(serializers.Serializer):
+    ansible_id = serializers.CharField(validators=[ansible_id_validator], required=False)
+    resource_type = serializers.CharField()
+    resource_data = serializers.DictField()
+
+
+class BulkItem:
+    """
+    An item of a bulk upsert and its result
+    """
+
+    def __init__(self, index, data):
+        self.index = index
+        self.ansible_id = data.get('ansible_id', None) if isinstance(data, dict) else None
+        self.resource_type_name = data.get('resource_type', None) if isinstance(data, dict) else None
+        self.resource_data = None
+        self.resource_type = None
+        # The existing Resource, None if the item creates one
+        self.resource = None
+        self.validated_data = None
+        self.status = None
+        self.errors = None
+
+        serializer = ResourceBulkItemSerializer(data=data)
+        if serializer.is_valid():
+            self.resource_data = serializer.validated_data['resource_data']
+        else:
+            self.fail(serializer.errors)
+
+    @property
+    def resource_uuid(self):
+        return uuid.UUID(self.ansible_id.split(':')[1]) if self.ansible_id else None
+
+    def fail(self, errors):
+        self.status = FAILED
+        self.errors = errors
+
+    def result(self) -> dict:
+        result = {
+            'index': self.index,
+            'ansible_id': self.resource.ansible_id if self.resource is not None and self.status != FAILED else self.ansible_id,
+            'resource_type': self.resource_type_name,
+            'status': self.status,
+        }
+        if self.errors:
+            result['errors'] = self.errors
+        return result
+
+
+def upsert_resources(data, chunk_size=500) -> list:
+    """
+    Create or update the resources of a list of {ansible_id, resource_type, resource_data} items, returns the result of each item.
+
+    Items with the ansible_id of an existing resource update it, with only the fields in resource_data, the other items create one.
+    The items are validated with the managed serializer of their resource type in bulk, then applied in chunks of chunk_size, each in
+    one transaction. If a chunk fails its items are applied one at a time so only the items which fail are reported as failed.
+    """
+    items = [BulkItem(index, item) for index, item in enumerate(data)]
+    pending = [item for item in items if item.status is None]
+
+    resource_types = ResourceType.objects.select_related('content_type').in_bulk({item.resource_type_name for item in pending}, field_name='name')
+    existing = Resource.objects.select_related('content_type').in_bulk({item.resource_uuid for item in pending if item.ansible_id}, field_name='resource_id')
+
+    seen = set()
+    for item in pending:
+        if item.ansible_id in seen:
+            item.fail({'ansible_id': [_('This ansible_id is already used by another item.')]})
+            continue
+        if item.ansible_id:
+            seen.add(item.ansible_id)
+
+        item.resource_type = resource_types.get(item.resource_type_name, None)
+        item.resource = existing.get(item.resource_uuid, None) if item.ansible_id else None
+        if item.resource_type is None:
+            item.fail({'resource_type': [_(f"Resource type: {item.resource_type_name} does not exist.")]})
+        elif not item.resource_type.can_be_managed:
+            item.fail({'resource_type': [_(f"Resource type: {item.resource_type_name} cannot be managed by Resources.")]})
+        elif item.resource is not None and item.resource.content_type_id != item.resource_type.content_type_id:
+            item.fail({'resource_type': [_(f"Resource {item.ansible_id} is not a {item.resource_type_name}.")]})
+
+    pending = sorted((item for item in pending if item.status is None), key=lambda item: item.resource_type.name)
+    for _name, type_items in groupby(pending, key=lambda item: item.resource_type.name):
+        type_items = list(type_items)
+        validate_items(type_items)
+        type_items = [item for item in type_items if item.status is None]
+        for start in range(0, len(type_items), chunk_size):
+            apply_chunk(type_items[start : start + chunk_size])
+
+    return [item.result() for item in items]
+
+
+def validate_items(items):
+    """
+    Validate the resource_data of items of a resource type with its managed serializer, creates with all the fields required
+    """
+    serializer_class = items[0].resource_type.serializer_class
+    for partial in (False, True):
+        to_validate = [item for item in items if (item.resource is not None) == partial]
+        if not to_validate:
+            continue
+        serializer = serializer_class(data=[item.resource_data for item in to_validate], many=True, partial=partial)
+        if not serializer.is_valid():
+            for item, errors in zip(to_validate, serializer.errors):
+                if errors:
+                    item.fail({'resource_data': errors})
+            to_validate = [item for item in to_validate if item.status is None]
+            serializer = serializer_class(data=[item.resource_data for item in to_validate], many=True, partial=partial)
+            serializer.is_valid(raise_exception=True)
+        for item, validated_data in zip(to_validate, serializer.validated_data):
+            item.validated_data = validated_data
+
+
+def apply_chunk(items):
+    try:
+        with transaction.atomic():
+            apply_items(items)
+    except APPLY_ERRORS:
+        for item in items:
+            item.status = None
+            try:
+                with transaction.atomic():
+                    apply_items([item])
+            except APPLY_ERRORS as e:
+                item.fail({'resource_data': [str(e)]})
+
+
+def apply_items(items):
+    """
+    Apply items of one resource type. The content objects are saved once each so the logic of their save() runs,
+    their Resources are created and refreshed in bulk.
+    """
+    resource_type = items[0].resource_type
+    model = resource_type.content_type.model_class()
+    updates = [item for item in items if item.resource is not None]
+    content_objects = model._base_manager.in_bulk([item.resource.object_id for item in updates]) if updates else {}
+    content_objects = {str(pk): obj for pk, obj in content_objects.items()}
+
+    new_resources = []
+    updated_pks = []
+    # The Resources are kept in sync below instead of by the signal receivers of each object
+    with bulk_resource_operation(model):
+        for item in updates:
+            content_object = content_objects.get(item.resource.object_id, None)
+            if content_object is None:
+                item.fail({'ansible_id': [_(f"The object of resource {item.ansible_id} no longer exists.")]})
+                continue
+            for k, val in item.validated_data.items():
+                setattr(content_object, k, val)
+            content_object.save()
+            updated_pks.append(content_object.pk)
+            item.status = UPDATED
+
+        for item in items:
+            if item.resource is not None:
+                continue
+            content_object = model(**item.validated_data)
+            content_object.save()
+            resource = Resource.init_from_object(content_object, resource_type=resource_type)
+            if item.ansible_id:
+                resource.ansible_id = item.ansible_id
+            new_resources.append(resource)
+
+    if new_resources and create_resources(new_resources) != len(new_resources):
+        # Another request created a resource with one of the ansible_ids since they were looked up
+        raise DatabaseError(_("A resource with this ansible_id already exists."))
+    refresh_resources(model, pks=updated_pks)
+
+    for item, resource in zip([item for item in items if item.resource is None], new_resources):
+        item.resource = resource
+        item.status = CREATED
@@ -0,0 +1,104 @@
+import zlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType
+
+
+def get_resume_position(after: str):
+    """
+    Returns the (content_type_id, object_id) of the resource with the ansible_id after, the export resumes after it.
+    A resource deleted since is found in the change feed.
+    """
+    try:
+        resource_id = after.split(':')[1]
+        position = Resource.objects.filter(resource_id=resource_id).values_list('content_type_id', 'object_id').first()
+        if position is None:
+            position = ResourceChange.objects.filter(resource_id=resource_id).order_by('-id').values_list('content_type_id', 'object_id').first()
+    except (IndexError, ValueError, DjangoValidationError):
+        position = None
+    if position is None:
+        raise ValidationError({"after": _(f"Resource {after} does not exist.")})
+    return position
+
+
+def get_export_resource_types(resource_type_names=None):
+    resource_types = ResourceType.objects.select_related('content_type').order_by('content_type_id')
+    if resource_type_names:
+        resource_types = resource_types.filter(name__in=resource_type_names)
+        missing = set(resource_type_names) - {resource_type.name for resource_type in resource_types}
+        if missing:
+            raise ValidationError({"resource_type": _(f"Resource type: {', '.join(sorted(missing))} does not exist.")})
+    return list(resource_types)
+
+
+def iter_resources(resource_types, position=None, chunk_size=1000):
+    """
+    Yields a dict for every resource of resource_types, with the resource_data of its managed serializer.
+
+    The resources are grouped by content type and ordered by object_id, which the (content_type, object_id) index is in,
+    and read with iterator() so a server-side cursor is used where the database supports it. The content objects are
+    fetched for chunk_size resources at a time, so memory use doesn't grow with the number of resources.
+    position is the (content_type_id, object_id) to resume after.
+    """
+    for resource_type in resource_types:
+        if position is not None and resource_type.content_type_id < position[0]:
+            continue
+        resources = Resource.objects.filter(content_type_id=resource_type.content_type_id).order_by('object_id')
+        if position is not None and resource_type.content_type_id == position[0]:
+            resources = resources.filter(object_id__gt=position[1])
+
+        model = resource_type.content_type.model_class()
+        serializer = resource_type.serializer_class
+        chunk = []
+        for resource in resources.iterator(chunk_size=chunk_size):
+            chunk.append(resource)
+            if len(chunk) >= chunk_size:
+                yield from serialize_chunk(resource_type, model, serializer, chunk)
+                chunk = []
+        if chunk:
+            yield from serialize_chunk(resource_type, model, serializer, chunk)
+
+
+def serialize_chunk(resource_type, model, serializer, resources):
+    content_objects = {}
+    if serializer and model is not None:
+        content_objects = {str(pk): obj for pk, obj in model._base_manager.in_bulk([resource.object_id for resource in resources]).items()}
+    for resource in resources:
+        content_object = content_objects.get(resource.object_id, None)
+        yield {
+            "ansible_id": resource.ansible_id,
+            "resource_type": resource_type.name,
+            "object_id": resource.object_id,
+            "name": resource.name,
+            "resource_data": serializer(content_object).data if content_object is not None else {},
+        }
+
+
+def iter_ndjson(resources):
+    encoder = JSONEncoder(separators=(',', ':'))
+    for resource in resources:
+        yield encoder.encode(resource) + '\n'
+
+
+def iter_gzip(lines, level=6):
+    """
+    Compresses a stream of lines into a stream of gzip data
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for line in lines:
+        if data := compressor.compress(line.encode('utf-8')):
+            yield data
+    yield compressor.flush()
+
+
+def export_resources(resource_type_names=None, after=None, chunk_size=1000):
+    """
+    Returns an iterator over the resources as newline-delimited JSON, the arguments are validated before it is returned
+    """
+    resource_types = get_export_resource_types(resource_type_names)
+    position = get_resume_position(after) if after else None
+    return iter_ndjson(iter_resources(resource_types, position=position, chunk_size=chunk_size))
@@ -0,0 +1,76 @@
+import hashlib
+import re
+import uuid
+from itertools import groupby
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from ansible_base.resource_registry.export import get_export_resource_types
+from ansible_base.resource_registry.models import Resource
+
+# Buckets are keyed by a prefix of the hex resource_id, deeper prefixes split a bucket in 16
+MAX_BUCKET_DEPTH = 8
+PREFIX_RE = re.compile(f'^[0-9a-f]{{0,{MAX_BUCKET_DEPTH}}}$')
+
+
+def validate_prefix(prefix: str) -> str:
+    prefix = (prefix or '').lower()
+    if not PREFIX_RE.match(prefix):
+        raise ValidationError({"prefix": _(f"prefix must be at most {MAX_BUCKET_DEPTH} hexadecimal characters")})
+    return prefix
+
+
+def get_hash_resources(resource_type_names=None, prefix=''):
+    """
+    Returns the Resources of the shared resource types (or of resource_type_names) whose resource_id starts with prefix,
+    ordered by resource_id so the Resources of a bucket are contiguous
+    """
+    if resource_type_names:
+        content_type_ids = [resource_type.content_type_id for resource_type in get_export_resource_types(resource_type_names)]
+        resources = Resource.objects.filter(content_type_id__in=content_type_ids)
+    else:
+        # Only the resource types with a managed serializer are shared, and have a content hash
+        resources = Resource.objects.filter(content_type__resource_type__name__startswith='shared.')
+    if prefix:
+        resources = resources.filter(resource_id__startswith=prefix)
+    return resources.order_by('resource_id')
+
+
+def hash_bucket(pairs) -> str:
+    """
+    Returns the hash of a bucket of (ansible_id, content_hash) pairs in resource_id order, a NULL content hash is hashed as empty
+    """
+    bucket_hash = hashlib.sha256()
+    for ansible_id, content_hash in pairs:
+        bucket_hash.update(f'{ansible_id} {content_hash or ""}\n'.encode('utf-8'))
+    return bucket_hash.hexdigest()
+
+
+def get_bucket_summaries(resources, depth: int) -> list:
+    """
+    Returns the {prefix, count, hash} of the non-empty buckets of resources, keyed by the first depth hex characters of resource_id.
+
+    Only (service_id, resource_id, content_hash) is read, with iterator() so memory use doesn't grow with the number of resources.
+    Two services with the same buckets have the same resources, a bucket whose hash differs is split with a deeper prefix
+    until it is small enough to compare its pairs.
+    """
+    rows = resources.values_list('service_id', 'resource_id', 'content_hash').iterator(chunk_size=5000)
+    summaries = []
+    for prefix, bucket in groupby(rows, key=lambda row: row[1].hex[:depth]):
+        pairs = [(f'{service_id}:{resource_id}', content_hash) for service_id, resource_id, content_hash in bucket]
+        summaries.append({"prefix": prefix, "count": len(pairs), "hash": hash_bucket(pairs)})
+    return summaries
+
+
+def get_hash_pairs(resources, after=None, page_size=1000) -> list:
+    """
+    Returns up to page_size {ansible_id, content_hash} of resources after the resource_id after, paged by resource_id
+    """
+    if after:
+        try:
+            resources = resources.filter(resource_id__gt=uuid.UUID(after.split(':')[-1]))
+        except ValueError:
+            raise ValidationError({"after": _(f"{after} is not a valid ansible_id")})
+    rows = resources.values_list('service_id', 'resource_id', 'content_hash')[:page_size]
+    return [{"ansible_id": f'{service_id}:{resource_id}', "content_hash": content_hash} for service_id, resource_id, content_hash in rows]
@@ -0,0 +1,82 @@
+import gzip
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from ansible_base.resource_registry.export import export_resources
+
+
+def get_last_exported(output) -> str:
+    """
+    Returns the ansible_id of the last complete line of an export, dropping an incomplete line left by an interrupted export
+    """
+    last_complete = 0
+    ansible_id = None
+    with open(output, 'rb+') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            last_complete += len(line)
+            ansible_id = json.loads(line)['ansible_id']
+        f.truncate(last_complete)
+    return ansible_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every resource with its resource_data as newline-delimited JSON, grouped by resource type. "
+        "Resources are streamed with a server-side cursor, so memory use doesn't depend on the number of resources."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="The file to write to, stdout by default", required=False)
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip", required=False)
+        parser.add_argument("--resource-type", action="append", dest="resource_types", help="Only export this resource type, can be repeated")
+        parser.add_argument("--after", help="Resume an export after the resource with this ansible_id", required=False)
+        parser.add_argument("--resume", action="store_true", help="Resume the export in --output after its last complete line", required=False)
+        parser.add_argument("--chunk-size", type=int, default=1000, help="The number of resources to fetch the data of at a time", required=False)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        after = options['after']
+        mode = 'w'
+        if options['resume']:
+            if not options['output'] or options['gzip']:
+                raise CommandError("--resume needs an uncompressed --output file")
+            if after:
+                raise CommandError("--resume and --after can't be used together")
+            if os.path.exists(options['output']):
+                after = get_last_exported(options['output'])
+                mode = 'a'
+
+        try:
+            lines = export_resources(resource_type_names=options['resource_types'], after=after, chunk_size=options['chunk_size'])
+        except ValidationError as e:
+            raise CommandError(str(e.detail))
+
+        if options['output'] and options['gzip']:
+            f = gzip.open(options['output'], mode + 't', encoding='utf-8')
+        elif options['output']:
+            f = open(options['output'], mode, encoding='utf-8')
+        elif options['gzip']:
+            f = gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8')
+        else:
+            f = None
+
+        count = 0
+        try:
+            for line in lines:
+                if f is None:
+                    self.stdout.write(line, ending='')
+                else:
+                    f.write(line)
+                count += 1
+        finally:
+            if f is not None:
+                f.close()
+        if options['output']:
+            self.stdout.write(f"Exported {count} resources to {options['output']}" + (f" after {after}" if after else ""))
@@ -0,0 +1,60 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ansible_base.lib.utils.management import StateFileMixin
+from ansible_base.resource_registry.apps import backfill_content_hashes, create_resources, initialize_resource_types
+from ansible_base.resource_registry.models import ResourceType
+from ansible_base.resource_registry.registry import get_registry
+
+
+class Command(StateFileMixin, BaseCommand):
+    help = (
+        "Create the resource types and the Resources of the rows of the registered models which don't have one, "
+        "and compute the content hashes of the Resources which don't have one yet. "
+        "Rows are streamed in primary key batches, each batch in its own transaction, so large installations can run this outside of migrate "
+        "(with ANSIBLE_BASE_RESOURCE_CREATE_ON_MIGRATE = False)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", dest="models", help="Only create the Resources of this model (app_label.ModelName), can be repeated")
+        parser.add_argument("--batch-size", type=int, default=1000, help="The number of rows to create Resources for in each transaction", required=False)
+        self.add_state_file_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        registry = get_registry()
+        if not registry:
+            raise CommandError("ANSIBLE_BASE_RESOURCE_CONFIG_MODULE is not set")
+        resources = registry.get_resources()
+        for label in options['models'] or []:
+            if label not in resources:
+                raise CommandError(f"{label} is not a registered resource model, choices are: {', '.join(resources.keys())}")
+
+        self.verbosity = options['verbosity']
+        self.state = self.load_state(options['state_file'])
+
+        initialize_resource_types(apps)
+        for r_type in ResourceType.objects.filter(migrated=False).select_related('content_type').order_by('name'):
+            label = r_type.content_type.model_class()._meta.label
+            if options['models'] and label not in options['models']:
+                continue
+            model_state = self.state.setdefault(label, {'last_pk': None, 'rows': 0})
+            self.stdout.write(f"{label}: creating Resources" + (f" after primary key {model_state['last_pk']}" if model_state['last_pk'] is not None else ""))
+
+            def progress(last_pk, rows, label=label, model_state=model_state, previous_rows=model_state['rows']):
+                model_state['last_pk'] = last_pk
+                model_state['rows'] = previous_rows + rows
+                self.save_state()
+                if self.verbosity > 1:
+                    self.stdout.write(f"{label}: {model_state['rows']} rows processed")
+
+            create_resources(apps, r_type, batch_size=options['batch_size'], start_after=model_state['last_pk'], progress=progress)
+            self.stdout.write(f"{label}: processed {model_state['rows']} rows")
+
+        for r_type in ResourceType.objects.select_related('content_type').order_by('name'):
+            label = r_type.content_type.model_class()._meta.label
+            if options['models'] and label not in options['models']:
+                continue
+            if hashed := backfill_content_hashes(apps, r_type, batch_size=options['batch_size']):
+                self.stdout.write(f"{label}: computed {hashed} content hashes")
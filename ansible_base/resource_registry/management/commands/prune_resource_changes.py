@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ansible_base.lib.utils.settings import get_setting
+from ansible_base.resource_registry.models import prune_resource_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the changes of the resource change feed older than the retention period. "
+        "Services which polled the feed less recently than that have to sync all the resources again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Delete the changes older than this many days, ANSIBLE_BASE_RESOURCE_CHANGE_RETENTION_DAYS (30) by default",
+            required=False,
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="The number of changes to delete in each query", required=False)
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_setting('ANSIBLE_BASE_RESOURCE_CHANGE_RETENTION_DAYS', 30)
+        if days < 0:
+            raise CommandError("--days must not be negative")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        deleted = prune_resource_changes(timedelta(days=days), batch_size=options['batch_size'])
+        self.stdout.write(f"Deleted {deleted} resource changes older than {days} days")
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ansible_base.resource_registry.managers import (
+    create_missing_resources,
+    delete_orphaned_resources,
+    get_name_expression,
+    get_resources_for_model,
+    object_ids,
+    object_ids_as_pks,
+    refresh_resources,
+    update_resource_names,
+)
+from ansible_base.resource_registry.registry import get_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair the Resources of the registered models which drifted from their rows, ex. after raw SQL or bulk operations "
+        "which bypass the signals. Missing Resources are created, Resources of deleted rows are deleted and names and content hashes are updated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", dest="models", help="Only reconcile this model (app_label.ModelName), can be repeated", required=False)
+        parser.add_argument("--batch-size", type=int, default=1000, help="The number of Resources to create or rows to hash in each query", required=False)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the Resources which need to be repaired", required=False)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        registry = get_registry()
+        if not registry:
+            raise CommandError("ANSIBLE_BASE_RESOURCE_CONFIG_MODULE is not set")
+        resources = registry.get_resources()
+        labels = options['models'] or list(resources.keys())
+        for label in labels:
+            if label not in resources:
+                raise CommandError(f"{label} is not a registered resource model, choices are: {', '.join(resources.keys())}")
+
+        for label in labels:
+            config = resources[label]
+            if options['dry_run']:
+                counts = self.count_drift(config, options['batch_size'])
+            else:
+                with transaction.atomic():
+                    counts = (
+                        create_missing_resources(config.model, batch_size=options['batch_size']),
+                        delete_orphaned_resources(config.model),
+                        update_resource_names(config.model),
+                        refresh_resources(config.model, batch_size=options['batch_size'], fields=['content_hash']),
+                    )
+            verb = "would be " if options['dry_run'] else ""
+            self.stdout.write(f"{label}: {counts[0]} {verb}created, {counts[1]} {verb}deleted, {counts[2]} {verb}renamed, {counts[3]} {verb}rehashed")
+
+    def count_drift(self, config, batch_size):
+        model = config.model
+        missing = model._base_manager.exclude(pk__in=object_ids_as_pks(model)).count()
+        orphaned = get_resources_for_model(model).exclude(object_id__in=object_ids(model._base_manager.all())).count()
+        name = get_name_expression(model, config.name_field)
+        renamed = get_resources_for_model(model).exclude(name=name).count() if name is not None else 0
+        rehashed = refresh_resources(model, batch_size=batch_size, dry_run=True, fields=['content_hash'])
+        return missing, orphaned, renamed, rehashed
@@ -0,0 +1,264 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.db.models.functions import Cast, Left
+
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType, get_content_hash, record_resource_changes
+from ansible_base.resource_registry.registry import get_concrete_model, get_registry
+
+# The models whose Resources a bulk operation is keeping in sync itself, the per object signal receivers skip them
+_bulk_operation_models = ContextVar('resource_registry_bulk_operation_models', default=frozenset())
+
+
+@contextmanager
+def bulk_resource_operation(model):
+    token = _bulk_operation_models.set(_bulk_operation_models.get() | {get_concrete_model(model)})
+    try:
+        yield
+    finally:
+        _bulk_operation_models.reset(token)
+
+
+def in_bulk_resource_operation(model) -> bool:
+    # Rows of other models deleted by a cascade still need their receivers
+    return get_concrete_model(model) in _bulk_operation_models.get()
+
+
+def get_registered_config(model):
+    """
+    Returns the ResourceConfig of model, None if it is not in the registry
+    """
+    registry = get_registry()
+    if not registry:
+        return None
+    return registry.get_resources().get(get_concrete_model(model)._meta.label, None)
+
+
+def get_pk_cast_field(model):
+    # Resource.object_id is text, it is cast to the type of the primary key to be compared with it
+    pk = model._meta.pk
+    while pk.remote_field is not None:
+        # The primary key of a multi-table inheritance child is a link to its parent
+        pk = pk.target_field
+    return pk.__class__()
+
+
+def get_resources_for_model(model, using=None):
+    resources = Resource.objects.using(using) if using else Resource.objects
+    return resources.filter(content_type=ContentType.objects.db_manager(using).get_for_model(model).pk)
+
+
+def object_ids(queryset):
+    """
+    Returns a subquery of the primary keys of queryset as text, to be compared with Resource.object_id
+    """
+    return queryset.order_by().annotate(resource_object_id=Cast('pk', output_field=models.TextField())).values('resource_object_id')
+
+
+def get_name_expression(model, name_field):
+    """
+    Returns an expression for the Resource name of the row of model the Resource points to, None if model has no name_field
+    """
+    try:
+        model._meta.get_field(name_field)
+    except FieldDoesNotExist:
+        return None
+    names = model._base_manager.filter(pk=Cast(models.OuterRef('object_id'), output_field=get_pk_cast_field(model)))
+    return models.Subquery(names.values(resource_name=Left(Cast(name_field, output_field=models.TextField()), 512))[:1])
+
+
+def object_ids_as_pks(model, using=None):
+    # The object_id of the Resources of model cast to its primary key type, so the primary key index can be used
+    resources = get_resources_for_model(model, using).order_by()
+    return resources.annotate(object_pk=Cast('object_id', output_field=get_pk_cast_field(model))).values('object_pk')
+
+
+def create_resources(resources, using=None) -> int:
+    """
+    Bulk create resources and record the changes of the ones which didn't exist yet, returns the number of Resources created
+    """
+    Resource.objects.using(using).bulk_create(resources, ignore_conflicts=True)
+    # resource_id is generated for each new Resource, the rows which already existed kept theirs
+    created = Resource.objects.using(using).filter(resource_id__in=[resource.resource_id for resource in resources])
+    return record_resource_changes(created, ResourceChange.CREATE)
+
+
+def delete_resources(resources) -> int:
+    """
+    Delete a queryset of Resources and record their changes, returns the number of Resources deleted
+    """
+    record_resource_changes(resources, ResourceChange.DELETE)
+    with bulk_resource_operation(Resource):
+        return resources.delete()[1].get(Resource._meta.label, 0)
+
+
+def create_missing_resources(model, using=None, batch_size=1000) -> int:
+    """
+    Create the Resource of every row of model which doesn't have one, returns the number of Resources created
+    """
+    resource_type = ResourceType.objects.db_manager(using).get(content_type=ContentType.objects.db_manager(using).get_for_model(model))
+    missing = model._base_manager.using(using).exclude(pk__in=object_ids_as_pks(model, using)).order_by('pk')
+    created = 0
+    batch = []
+    for obj in missing.iterator(chunk_size=batch_size):
+        batch.append(Resource.init_from_object(obj, resource_type=resource_type))
+        if len(batch) >= batch_size:
+            created += create_resources(batch, using=using)
+            batch = []
+    if batch:
+        created += create_resources(batch, using=using)
+    return created
+
+
+def delete_orphaned_resources(model, using=None) -> int:
+    """
+    Delete the Resources of model whose row no longer exists, returns the number of Resources deleted
+    """
+    return delete_resources(get_resources_for_model(model, using).exclude(object_id__in=object_ids(model._base_manager.using(using))))
+
+
+def update_resource_names(model, pks=None, using=None) -> int:
+    """
+    Copy the names of the rows of model (or only the rows with pks) to their Resources with a single UPDATE,
+    and record the changes, returns the number of Resources whose name changed
+    """
+    config = get_registered_config(model)
+    name = get_name_expression(model, config.name_field) if config else None
+    if name is None:
+        return 0
+    resources = get_resources_for_model(model, using)
+    if pks is not None:
+        resources = resources.filter(object_id__in=[str(pk) for pk in pks])
+    changed = list(resources.exclude(name=name).values_list('pk', flat=True))
+    if not changed:
+        return 0
+    updated = Resource.objects.using(using).filter(pk__in=changed)
+    updated.update(name=name)
+    return record_resource_changes(updated, ResourceChange.UPDATE)
+
+
+def get_serialized_fields(config) -> set:
+    """
+    Returns the names of the model fields serialized by the managed serializer of config, their changes change the content hash
+    """
+    if config.managed_serializer is None:
+        return set()
+    return {field.source.split('.')[0] for field in config.managed_serializer().fields.values()}
+
+
+def refresh_resources(model, pks=None, using=None, batch_size=1000, dry_run=False, fields=('name', 'content_hash')) -> int:
+    """
+    Copy the names and content hashes (or only fields) of the rows of model (or only the rows with pks) to their Resources
+    and record the changes, returns the number of Resources which changed. The content hash is computed by the managed serializer,
+    so the rows are read and serialized batch_size at a time and the changed Resources are updated with one bulk_update per batch.
+    """
+    config = get_registered_config(model)
+    if config is None:
+        return 0
+    rows = model._base_manager.using(using).order_by('pk')
+    if pks is not None:
+        rows = rows.filter(pk__in=pks)
+
+    changed = 0
+    batch = []
+    for obj in rows.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            changed += refresh_resource_batch(model, config, batch, using, dry_run, fields)
+            batch = []
+    if batch:
+        changed += refresh_resource_batch(model, config, batch, using, dry_run, fields)
+    return changed
+
+
+def refresh_resource_batch(model, config, objs, using, dry_run, fields) -> int:
+    if not hasattr(model, config.name_field):
+        # Models without name_field keep the name the Resource has
+        fields = [field for field in fields if field != 'name']
+    values = {}
+    for obj in objs:
+        values[str(obj.pk)] = {'content_hash': get_content_hash(obj, config.managed_serializer)}
+        if 'name' in fields:
+            values[str(obj.pk)]['name'] = str(getattr(obj, config.name_field))[:512]
+    resources = get_resources_for_model(model, using).filter(object_id__in=list(values.keys()))
+    changed = []
+    for resource in resources.only('pk', 'object_id', *fields):
+        new_values = {field: values[resource.object_id][field] for field in fields}
+        if any(getattr(resource, field) != value for field, value in new_values.items()):
+            changed.append(Resource(pk=resource.pk, **new_values))
+    if not changed or dry_run:
+        return len(changed)
+    Resource.objects.using(using).bulk_update(changed, list(fields))
+    return record_resource_changes(Resource.objects.using(using).filter(pk__in=[resource.pk for resource in changed]), ResourceChange.UPDATE)
+
+
+class ResourceRegistryQuerySet(models.QuerySet):
+    """
+    A QuerySet for registered models whose bulk methods keep the Resource rows in sync.
+
+    bulk_create, bulk_update, update and delete don't send post_save or post_delete for each row, so the
+    signal receivers can't keep the Resources in sync. These methods update the Resources of all the rows
+    with a few set based queries in the same transaction instead (bulk_update goes through update for each
+    batch). Content hashes are computed from the rows, which are read back in batches when an update changes
+    a field of the managed serializer, other renames are a single UPDATE. Use the reconcile_resources command
+    to repair Resources changed by other means, ex. raw SQL.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if get_registered_config(self.model) is None:
+            return super().bulk_create(objs, *args, **kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if any(obj.pk is None for obj in objs):
+                # The primary keys are not returned with ignore_conflicts or on some databases
+                create_missing_resources(self.model, using=self.db)
+            elif objs:
+                content_type = ContentType.objects.db_manager(self.db).get_for_model(self.model)
+                resource_type = ResourceType.objects.db_manager(self.db).get(content_type=content_type)
+                # Rows which already existed (ex. with update_conflicts) already have a Resource
+                create_resources([Resource.init_from_object(obj, resource_type=resource_type) for obj in objs], using=self.db)
+                if kwargs.get('update_conflicts', False):
+                    refresh_resources(self.model, pks=[obj.pk for obj in objs], using=self.db)
+        return objs
+
+    def update(self, **kwargs):
+        config = get_registered_config(self.model)
+        if config is None:
+            return super().update(**kwargs)
+        rename = config.name_field in kwargs
+        rehash = not get_serialized_fields(config).isdisjoint(kwargs)
+        if not rename and not rehash:
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            # The rows are selected before the update because it can change which rows the queryset matches
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            if rehash:
+                # The rows are read to compute their content hashes, their names are copied at the same time
+                refresh_resources(self.model, pks=pks, using=self.db)
+            else:
+                update_resource_names(self.model, pks=pks, using=self.db)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        if get_registered_config(self.model) is None:
+            return super().delete()
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            delete_resources(get_resources_for_model(self.model, self.db).filter(object_id__in=object_ids(self)))
+            with bulk_resource_operation(self.model):
+                return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class ResourceRegistryManager(models.Manager.from_queryset(ResourceRegistryQuerySet)):
+    pass
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-19 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dab_resource_registry', '0002_resourcechange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
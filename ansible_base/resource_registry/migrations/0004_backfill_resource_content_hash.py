@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def backfill_content_hashes(apps, schema_editor):
+    from ansible_base.resource_registry.apps import backfill_content_hashes
+
+    # The historical models match the database at this point, even if the apps of the resource models have more migrations to run
+    ResourceType = apps.get_model('dab_resource_registry', 'ResourceType')
+    for r_type in ResourceType.objects.select_related('content_type'):
+        backfill_content_hashes(apps, r_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dab_resource_registry', '0003_resource_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
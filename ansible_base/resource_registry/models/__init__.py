@@ -1,2 +1,3 @@
-from .resource import Resource, ResourceType  # noqa: 401
+from .resource import Resource, ResourceType, get_content_hash  # noqa: 401
+from .resource_change import ResourceChange, get_change_feed_watermark, prune_resource_changes, record_resource_changes  # noqa: 401
 from .service_id import service_id  # noqa: 401
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import uuid
 
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -5,7 +7,9 @@ from django.contrib.contenttypes.models import ContentType
 from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework.serializers import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
 
+from .resource_change import ResourceChange, record_resource_changes
 from .service_id import service_id
 
 
@@ -13,13 +17,18 @@ def short_service_id():
     return service_id().split('-')[0]
 
 
-class ResourceType(models.Model):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        from ansible_base.resource_registry.registry import get_registry
+def get_content_hash(obj, serializer_class):
+    """
+    Returns the sha256 of the canonical JSON of obj serialized by the managed serializer of its resource type,
+    None if the resource type has no managed serializer
+    """
+    if serializer_class is None or obj is None:
+        return None
+    data = json.dumps(serializer_class(obj).data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
 
-        self.resource_registry = get_registry()
 
+class ResourceType(models.Model):
     content_type = models.OneToOneField(ContentType, on_delete=models.CASCADE, related_name="resource_type", unique=True)
     externally_managed = models.BooleanField()
     migrated = models.BooleanField(null=False, default=False)
@@ -33,8 +42,17 @@ class ResourceType(models.Model):
     def can_be_managed(self):
         return self.externally_managed and self.serializer_class
 
+    @property
+    def resource_registry(self):
+        from ansible_base.resource_registry.registry import get_registry
+
+        return get_registry()
+
     def get_resource_config(self):
-        return self.resource_registry.get_config_for_model(model=self.content_type.model_class())
+        # Looked up when needed so loading a ResourceType (ex. with select_related) doesn't touch the registry
+        from ansible_base.resource_registry.registry import get_resource_config
+
+        return get_resource_config(self.content_type.model_class()._meta.label)
 
 
 class Resource(models.Model):
@@ -53,6 +71,9 @@ class Resource(models.Model):
     # human readable name for the resource
     name = models.CharField(max_length=512, null=True)
 
+    # sha256 of the resource_data of the managed serializer, to find the resources which differ between services
+    content_hash = models.CharField(max_length=64, null=True, editable=False)
+
     @property
     def ansible_id(self):
         return self.service_id + ":" + str(self.resource_id)
@@ -79,13 +100,32 @@ class Resource(models.Model):
         """
         Update any cached attributes from the Resource's content_object
         """
-        name_field = self.content_type.resource_type.get_resource_config().name_field
+        resource_config = self.content_type.resource_type.get_resource_config()
+        name = self.name
+        if hasattr(self.content_object, resource_config.name_field):
+            name = getattr(self.content_object, resource_config.name_field)[:512]
+        content_hash = get_content_hash(self.content_object, resource_config.managed_serializer)
 
-        if hasattr(self.content_object, name_field):
-            name = getattr(self.content_object, name_field)[:512]
-            if self.name != name:
-                self.name = name
-                self.save()
+        if self.name != name or self.content_hash != content_hash:
+            self.name = name
+            self.content_hash = content_hash
+            self.save()
+
+    @classmethod
+    def update_from_object(cls, obj, resource_config) -> int:
+        """
+        Copy the name and content hash of another model instance to its Resource without loading the Resource.
+        Returns the number of rows updated, 0 if neither changed.
+        """
+        values = {'content_hash': get_content_hash(obj, resource_config.managed_serializer)}
+        if hasattr(obj, resource_config.name_field):
+            values['name'] = str(getattr(obj, resource_config.name_field))[:512]
+        # exclude() also matches NULLs, so this is a single UPDATE ... WHERE NOT (name = %s AND content_hash = %s)
+        resources = cls.objects.filter(object_id=obj.pk, content_type=ContentType.objects.get_for_model(obj).pk)
+        updated = resources.exclude(**values).update(**values)
+        if updated:
+            record_resource_changes(resources, ResourceChange.UPDATE)
+        return updated
 
     @classmethod
     def init_from_object(cls, obj, resource_type=None):
@@ -101,6 +141,7 @@ class Resource(models.Model):
         resource_config = resource_type.get_resource_config()
         if hasattr(obj, resource_config.name_field):
             resource.name = str(getattr(obj, resource_config.name_field))[:512]
+        resource.content_hash = get_content_hash(obj, resource_config.managed_serializer)
 
         return resource
 
@@ -153,8 +194,9 @@ class Resource(models.Model):
         with transaction.atomic():
             for k, val in resource_data.items():
                 setattr(self.content_object, k, val)
-                self.content_object.save()
+            self.content_object.save()
 
             if ansible_id:
                 self.ansible_id = ansible_id
-                self.save()
+                # The name and content hash were updated by the post_save receiver of the content object
+                self.save(update_fields=['service_id', 'resource_id'])
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.timezone import now
+
+from ansible_base.lib.utils.settings import get_setting
+
+
+class ResourceChange(models.Model):
+    """
+    An append-only record of every Resource created, updated or deleted.
+
+    The id is a monotonic sequence number, services which sync resources poll for the changes after the last one they saw.
+    Ids are allocated when a change is inserted but only become visible when its transaction commits, so a change can
+    appear after changes with larger ids, see get_change_feed_watermark.
+    """
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = [(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    id = models.BigAutoField(primary_key=True)
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    # Copied from the Resource, which no longer exists after a delete
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="+")
+    object_id = models.TextField(null=False)
+    service_id = models.CharField(max_length=8)
+    resource_id = models.UUIDField()
+    name = models.CharField(max_length=512, null=True)
+    changed_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    @property
+    def ansible_id(self):
+        return self.service_id + ":" + str(self.resource_id)
+
+
+def record_resource_changes(resources, action, change_model=None) -> int:
+    """
+    Record a change of every resource in resources, a list of Resources or a queryset of them.
+    change_model is the historical ResourceChange model when this is called from a migration.
+    Returns the number of changes recorded.
+    """
+    change_model = change_model or ResourceChange
+    if isinstance(resources, models.QuerySet):
+        resources = resources.order_by('pk').values('content_type_id', 'object_id', 'service_id', 'resource_id', 'name')
+    else:
+        resources = [resource.__dict__ for resource in resources]
+    changes = [
+        change_model(
+            action=action,
+            content_type_id=resource['content_type_id'],
+            object_id=resource['object_id'],
+            service_id=resource['service_id'],
+            resource_id=resource['resource_id'],
+            name=resource['name'],
+        )
+        for resource in resources
+    ]
+    change_model.objects.bulk_create(changes)
+    return len(changes)
+
+
+def get_change_feed_watermark(changes, since: int) -> int:
+    """
+    Returns the id to poll the change feed from after reading changes, the changes after since in id order.
+
+    A change recorded by a transaction which hasn't committed yet is invisible while the changes after it can already be
+    read, skipping past it would lose it for good. The watermark stops before the first change recorded less than
+    ANSIBLE_BASE_RESOURCE_CHANGE_FEED_LAG seconds ago, so the recent changes are read again by the next poll along with
+    any change committed late in the meantime.
+    """
+    settled_before = now() - timedelta(seconds=get_setting('ANSIBLE_BASE_RESOURCE_CHANGE_FEED_LAG', 60))
+    watermark = since
+    for change in changes:
+        if change.changed_on > settled_before:
+            break
+        watermark = change.id
+    return watermark
+
+
+def prune_resource_changes(older_than: timedelta, batch_size=10000) -> int:
+    """
+    Delete the changes recorded more than older_than ago in batches of batch_size, returns the number of changes deleted
+    """
+    last_id = ResourceChange.objects.filter(changed_on__lt=now() - older_than).order_by('-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return 0
+    deleted = 0
+    while True:
+        # Deleting by id range uses the primary key index, the changes are in id order
+        batch = list(ResourceChange.objects.filter(id__lte=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += ResourceChange.objects.filter(id__gte=batch[0], id__lte=batch[-1]).delete()[0]
@@ -1,6 +1,10 @@
+import threading
 from collections import namedtuple
+from functools import lru_cache
 from typing import List
 
+from django.core.exceptions import ImproperlyConfigured
+
 ParentResource = namedtuple("ParentResource", ["model", "field_name"])
 SharedResource = namedtuple("SharedResource", ["serializer", "is_provider"])
 
@@ -22,6 +26,16 @@ class ServiceAPIConfig:
 
 
 class ResourceInspector:
+    """
+    Maps the label of each model served by the API to the (method, path) of each of its view actions
+
+    Building the map enumerates every URL endpoint and instantiates every view, use get_resource_inspector()
+    to get the map which is built once per process.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
     def __init__(self, urlpatterns=None):
         from rest_framework.schemas.generators import BaseSchemaGenerator
 
@@ -52,6 +66,27 @@ class ResourceInspector:
                 except:  # noqa E722
                     pass
 
+    @classmethod
+    def get_instance(cls) -> 'ResourceInspector':
+        """
+        Returns the inspector of this process, building it the first time it is needed
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def clear_instance(cls, **kwargs):
+        # Accepts signal kwargs so it can be connected to setting_changed for ROOT_URLCONF
+        if kwargs.get('setting', 'ROOT_URLCONF') == 'ROOT_URLCONF':
+            cls._instance = None
+
+
+def get_resource_inspector() -> ResourceInspector:
+    return ResourceInspector.get_instance()
+
 
 class ResourceConfig:
     model_label = None
@@ -59,7 +94,6 @@ class ResourceConfig:
     externally_managed = None
     managed_serializer = None
     parent_resources = None
-    actions = None
     name_field = None
 
     def __init__(self, model, shared_resource: SharedResource = None, parent_resources: List[ParentResource] = None, name_field: str = None):
@@ -84,16 +118,19 @@ class ResourceConfig:
         self.externally_managed = externally_managed
         self.managed_serializer = managed_serializer
         self.parent_resources = parent_map
-        self.actions = ResourceInspector().model_map.get(self.model_label, {})
         self.name_field = name_field
 
+    @property
+    def actions(self) -> dict:
+        # Looked up when needed, the URL conf can't be inspected while the resource list is being imported
+        return get_resource_inspector().model_map.get(self.model_label, {})
 
-class ResourceRegistry:
-    registry = {}
 
+class ResourceRegistry:
     def __init__(self, resource_list: List[ResourceConfig], service_api_config: ServiceAPIConfig = None):
         self._validate_api_config(service_api_config)
         self.api_config = service_api_config
+        self.registry = {}
         for r in resource_list:
             self.registry[r.model_label] = r
 
@@ -117,15 +154,37 @@ class ResourceRegistry:
         raise AttributeError("Must include either model or model_label arg.")
 
 
+@lru_cache(maxsize=None)
+def _build_registry(config_module: str) -> ResourceRegistry:
+    from django.utils.module_loading import import_string
+
+    resource_list = import_string(config_module + ".RESOURCE_LIST")
+    api_config = import_string(config_module + ".APIConfig")
+
+    return ResourceRegistry(resource_list, api_config())
+
+
 def get_registry() -> ResourceRegistry:
+    """
+    Returns the registry of ANSIBLE_BASE_RESOURCE_CONFIG_MODULE, it is only built once per process
+    """
     from django.conf import settings
 
     if hasattr(settings, "ANSIBLE_BASE_RESOURCE_CONFIG_MODULE"):
-        from django.utils.module_loading import import_string
-
-        resource_list = import_string(settings.ANSIBLE_BASE_RESOURCE_CONFIG_MODULE + ".RESOURCE_LIST")
-        api_config = import_string(settings.ANSIBLE_BASE_RESOURCE_CONFIG_MODULE + ".APIConfig")
-
-        return ResourceRegistry(resource_list, api_config())
+        return _build_registry(settings.ANSIBLE_BASE_RESOURCE_CONFIG_MODULE)
     else:
         return False
+
+
+def get_resource_config(model_label: str) -> ResourceConfig:
+    """
+    Returns the ResourceConfig registered for model_label from the registry of this process
+    """
+    registry = get_registry()
+    if not registry:
+        raise ImproperlyConfigured("ANSIBLE_BASE_RESOURCE_CONFIG_MODULE must be set to look up a resource config")
+    return registry.get_config_for_model(model_label=model_label)
+
+
+def clear_registry():
+    _build_registry.cache_clear()
@@ -1,25 +1,36 @@
 import logging
 
+from django.db.models import prefetch_related_objects
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.reverse import reverse_lazy
 
 from ansible_base.lib.utils.validation import ansible_id_validator
-from ansible_base.resource_registry.models import Resource, ResourceType
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType
 
 logger = logging.getLogger('ansible_base.serializers')
 
+# Replaced with the ansible_id of each resource in the reversed URL of the resource detail view
+ANSIBLE_ID_PLACEHOLDER = 'ansible_id_placeholder'
 
-def get_resource_detail_view(resource: Resource):
+
+def get_detail_view_template(resource_config):
     # TODO: format this so that it uses the correct API base path for the proxy.
-    actions = resource.content_type.resource_type.get_resource_config().actions
 
     # TODO: this needs some more logic to handle cases where the detail view isn't
     # name or pk, and in cases where there may be multiple detail views (such as with
     # nested API views). This may be solvable by providing a reverse_url_name when
     # resources are registered.
-    if detail := actions.get("retrieve"):
-        return detail[0][1].format(pk=resource.object_id, name=resource.name)
+    if detail := resource_config.actions.get("retrieve"):
+        return detail[0][1]
+
+    return None
+
+
+def get_resource_detail_view(resource: Resource):
+    if template := get_detail_view_template(resource.content_type.resource_type.get_resource_config()):
+        return template.format(pk=resource.object_id, name=resource.name)
 
     return None
 
@@ -31,7 +42,7 @@ class ResourceDataField(serializers.JSONField):
     """
 
     def to_representation(self, resource):
-        if serializer := resource.content_type.resource_type.serializer_class:
+        if serializer := self.parent.get_resource_config(resource).managed_serializer:
             return serializer(resource.content_object).data
         return {}
 
@@ -40,6 +51,18 @@ class ResourceDataField(serializers.JSONField):
         return {self.field_name: data}
 
 
+class ResourceManySerializer(serializers.ListSerializer):
+    """
+    Serializes a list of resources, fetching their content objects with one query per content type instead of one per resource
+    """
+
+    def to_representation(self, data):
+        resources = list(data.all() if hasattr(data, 'all') else data)
+        if not self.child.fields['resource_data'].write_only:
+            prefetch_related_objects(resources, 'content_object')
+        return super().to_representation(resources)
+
+
 class ResourceSerializer(serializers.ModelSerializer):
     has_serializer = serializers.SerializerMethodField()
     resource_data = ResourceDataField(source="*")
@@ -50,6 +73,7 @@ class ResourceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Resource
+        list_serializer_class = ResourceManySerializer
         read_only_fields = [
             "object_id",
             "name",
@@ -65,14 +89,32 @@ class ResourceSerializer(serializers.ModelSerializer):
             "url",
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Memoised per content type, the same serializer serializes every resource of a list
+        self._resource_configs = {}
+        self._detail_view_templates = {}
+        self._url_template = None
+
+    def get_resource_config(self, obj):
+        if obj.content_type_id not in self._resource_configs:
+            self._resource_configs[obj.content_type_id] = obj.content_type.resource_type.get_resource_config()
+        return self._resource_configs[obj.content_type_id]
+
     def get_url(self, obj):
-        return reverse_lazy('resource-detail', kwargs={"ansible_id": obj.ansible_id})
+        if self._url_template is None:
+            self._url_template = reverse('resource-detail', kwargs={"ansible_id": ANSIBLE_ID_PLACEHOLDER})
+        return self._url_template.replace(ANSIBLE_ID_PLACEHOLDER, obj.ansible_id)
 
     def get_detail_url(self, obj):
-        return get_resource_detail_view(obj)
+        if obj.content_type_id not in self._detail_view_templates:
+            self._detail_view_templates[obj.content_type_id] = get_detail_view_template(self.get_resource_config(obj))
+        if template := self._detail_view_templates[obj.content_type_id]:
+            return template.format(pk=obj.object_id, name=obj.name)
+        return None
 
     def get_has_serializer(self, obj):
-        return bool(obj.content_type.resource_type.get_resource_config().managed_serializer)
+        return bool(self.get_resource_config(obj).managed_serializer)
 
     # update ansible ID
     def update(self, instance, validated_data):
@@ -93,6 +135,16 @@ class ResourceListSerializer(ResourceSerializer):
     resource_data = ResourceDataField(source="*", write_only=True)
 
 
+class ResourceChangeSerializer(serializers.ModelSerializer):
+    ansible_id = serializers.CharField(read_only=True)
+    resource_type = serializers.CharField(source="content_type.resource_type.name", read_only=True)
+
+    class Meta:
+        model = ResourceChange
+        fields = ["id", "action", "ansible_id", "resource_type", "object_id", "name", "changed_on"]
+        read_only_fields = fields
+
+
 class ResourceTypeSerializer(serializers.ModelSerializer):
     shared_resource_type = serializers.SerializerMethodField()
     url = serializers.SerializerMethodField()
@@ -1,45 +1,59 @@
-from functools import lru_cache
-
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_delete, post_save
-from django.dispatch import receiver
 
-from ansible_base.resource_registry.models import Resource
-from ansible_base.resource_registry.registry import get_concrete_model, get_registry
+from ansible_base.resource_registry.managers import in_bulk_resource_operation
+from ansible_base.resource_registry.models import Resource, ResourceChange, record_resource_changes
+from ansible_base.resource_registry.registry import get_concrete_model, get_registry, get_resource_config
 
 
-@lru_cache(maxsize=1)
 def get_resource_models():
-    resource_models = set()
+    """
+    Returns the registered models and their proxies
+    """
     registry = get_registry()
-    if registry:
-        for k, resource in registry.get_resources().items():
-            resource_models.add(resource.model)
+    if not registry:
+        return set()
 
-    return resource_models
+    registered_models = {resource.model for resource in registry.get_resources().values()}
+    return {model for model in apps.get_models() if get_concrete_model(model) in registered_models}
 
 
-@receiver(post_delete)
 def remove_resource(sender, instance, **kwargs):
-    if sender._meta.object_name == 'Migration':
+    if in_bulk_resource_operation(sender):
         return
-    model = get_concrete_model(sender)
-    if model in get_resource_models():
-        try:
-            resource = Resource.get_resource_for_object(instance)
-            resource.delete()
-        except Resource.DoesNotExist:
-            return
+    Resource.objects.filter(object_id=instance.pk, content_type=ContentType.objects.get_for_model(instance).pk).delete()
 
 
-@receiver(post_save)
 def update_resource(sender, instance, created, **kwargs):
-    if sender._meta.object_name == 'Migration':
+    if in_bulk_resource_operation(sender):
         return
-    model = get_concrete_model(sender)
-    if model in get_resource_models():
-        if created:
-            resource = Resource.init_from_object(instance)
-            resource.save()
-        else:
-            resource = Resource.get_resource_for_object(instance)
-            resource.update_from_content_object()
+    if created:
+        resource = Resource.init_from_object(instance)
+        resource.save()
+    else:
+        Resource.update_from_object(instance, get_resource_config(get_concrete_model(sender)._meta.label))
+
+
+def record_saved_resource(sender, instance, created, **kwargs):
+    record_resource_changes([instance], ResourceChange.CREATE if created else ResourceChange.UPDATE)
+
+
+def record_deleted_resource(sender, instance, **kwargs):
+    if in_bulk_resource_operation(sender):
+        return
+    record_resource_changes([instance], ResourceChange.DELETE)
+
+
+def connect_resource_signals():
+    """
+    Connect the receivers which keep the Resource of an object in sync for the registered models only,
+    so saving any other model doesn't run them
+    """
+    for model in get_resource_models():
+        post_save.connect(update_resource, sender=model, dispatch_uid=f'dab_resource_registry_update_resource_{model._meta.label}')
+        post_delete.connect(remove_resource, sender=model, dispatch_uid=f'dab_resource_registry_remove_resource_{model._meta.label}')
+
+    # Record the changes of Resources saved or deleted one at a time for the change feed
+    post_save.connect(record_saved_resource, sender=Resource, dispatch_uid='dab_resource_registry_record_saved_resource')
+    post_delete.connect(record_deleted_resource, sender=Resource, dispatch_uid='dab_resource_registry_record_deleted_resource')
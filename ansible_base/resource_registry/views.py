@@ -1,14 +1,36 @@
-from django.http import HttpResponseNotFound
+from django.http import HttpResponseNotFound, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from rest_framework import permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, mixins
 
-from ansible_base.resource_registry.models import Resource, ResourceType, service_id
+from ansible_base.resource_registry.bulk import FAILED, ResourceBulkItemSerializer, upsert_resources
+from ansible_base.resource_registry.export import export_resources, iter_gzip
+from ansible_base.resource_registry.hashes import MAX_BUCKET_DEPTH, get_bucket_summaries, get_hash_pairs, get_hash_resources, validate_prefix
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType, get_change_feed_watermark, service_id
 from ansible_base.resource_registry.registry import get_registry
-from ansible_base.resource_registry.serializers import ResourceListSerializer, ResourceSerializer, ResourceTypeSerializer, get_resource_detail_view
+from ansible_base.resource_registry.serializers import (
+    ResourceChangeSerializer,
+    ResourceListSerializer,
+    ResourceSerializer,
+    ResourceTypeSerializer,
+    get_resource_detail_view,
+)
+
+
+def get_non_negative_int_param(request, name, default):
+    value = request.query_params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = -1
+    if value < 0:
+        raise ValidationError({name: f"{name} must be a non-negative integer"})
+    return value
 
 
 class ResourceViewSet(
@@ -27,10 +49,23 @@ class ResourceViewSet(
     serializer_class = ResourceSerializer
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "ansible_id"
+    changes_page_size = 100
+    changes_max_page_size = 1000
+    bulk_chunk_size = 500
+    bulk_max_items = 10000
+    export_chunk_size = 1000
+    hashes_page_size = 1000
+    hashes_max_page_size = 10000
+    # The most hex characters a summary can add to the prefix, at most 16 ** 3 buckets are returned
+    hashes_max_depth_step = 3
 
     def get_serializer_class(self):
         if self.action == "list":
             return ResourceListSerializer
+        if self.action == "changes":
+            return ResourceChangeSerializer
+        if self.action == "bulk":
+            return ResourceBulkItemSerializer
 
         return super().get_serializer_class()
 
@@ -55,6 +90,102 @@ class ResourceViewSet(
     def perform_destroy(self, instance):
         instance.delete_resource()
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create or update a list of {ansible_id, resource_type, resource_data} resources.
+
+        Items with the ansible_id of an existing resource update it with the fields in resource_data, the others create one.
+        The result of every item is returned in the order of the items, an item which fails doesn't prevent the others.
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError({"detail": "Expected a list of resources"})
+        if len(request.data) > self.bulk_max_items:
+            raise ValidationError({"detail": f"At most {self.bulk_max_items} resources can be sent at once"})
+
+        results = upsert_resources(request.data, chunk_size=self.bulk_chunk_size)
+        return Response({"failed": sum(1 for result in results if result['status'] == FAILED), "results": results})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every resource with its resource_data as newline-delimited JSON, grouped by resource type.
+
+        Filter with `resource_type` (can be repeated) and resume an interrupted export with `after`, the ansible_id of the last resource received.
+        The stream is gzip compressed if the client accepts it.
+        """
+        lines = export_resources(
+            resource_type_names=request.query_params.getlist('resource_type'), after=request.query_params.get('after', None), chunk_size=self.export_chunk_size
+        )
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = StreamingHttpResponse(iter_gzip(lines), content_type='application/x-ndjson')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse((line.encode('utf-8') for line in lines), content_type='application/x-ndjson')
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request, *args, **kwargs):
+        """
+        The resources created, updated and deleted after the change with the id `since`, oldest first.
+
+        Poll again with the `last_id` of the response as `since` to get the next changes, `next` is set while there are more.
+        `last_id` stays behind the most recent changes, they are returned again by the next poll so changes committed late
+        aren't missed, skip the changes whose id was already applied. `first_id` is the oldest change which wasn't pruned,
+        a client whose `since` is before it missed changes and has to sync all the resources again.
+        """
+        since = get_non_negative_int_param(request, 'since', 0)
+        page_size = min(get_non_negative_int_param(request, 'page_size', self.changes_page_size), self.changes_max_page_size) or self.changes_page_size
+
+        # The changes are paged by id, so each page is an index range scan no matter how many changes there are
+        changes = list(ResourceChange.objects.select_related("content_type__resource_type").filter(id__gt=since).order_by('id')[: page_size + 1])
+        has_next = len(changes) > page_size
+        changes = changes[:page_size]
+        last_id = get_change_feed_watermark(changes, since)
+        # The rest of the changes are only read once the ones on this page settled
+        has_next = has_next and last_id == changes[-1].id
+
+        return Response(
+            {
+                "next": replace_query_param(request.build_absolute_uri(), 'since', last_id) if has_next else None,
+                "last_id": last_id,
+                "first_id": ResourceChange.objects.order_by('id').values_list('id', flat=True).first(),
+                "results": self.get_serializer(changes, many=True).data,
+            }
+        )
+
+    @action(detail=False, methods=['get'])
+    def hashes(self, request, *args, **kwargs):
+        """
+        The content hash of every shared resource, to find the resources which differ from the ones of another service.
+
+        With `depth` the resources are summarized in buckets keyed by the first `depth` hex characters of their resource_id,
+        compare the bucket hashes and ask again for the buckets which differ with their prefix as `prefix` and a larger `depth`.
+        Without `depth` the {ansible_id, content_hash} of the resources are returned, paged by resource_id with `after`.
+        Filter with `resource_type` (can be repeated) and `prefix`.
+        """
+        prefix = validate_prefix(request.query_params.get('prefix', ''))
+        resources = get_hash_resources(resource_type_names=request.query_params.getlist('resource_type'), prefix=prefix)
+
+        if 'depth' in request.query_params:
+            depth = get_non_negative_int_param(request, 'depth', 0)
+            max_depth = min(len(prefix) + self.hashes_max_depth_step, MAX_BUCKET_DEPTH)
+            if not len(prefix) < depth <= max_depth:
+                raise ValidationError({"depth": f"depth must be between {len(prefix) + 1} and {max_depth} with this prefix"})
+            return Response({"prefix": prefix, "depth": depth, "buckets": get_bucket_summaries(resources, depth)})
+
+        page_size = min(get_non_negative_int_param(request, 'page_size', self.hashes_page_size), self.hashes_max_page_size) or self.hashes_page_size
+        pairs = get_hash_pairs(resources, after=request.query_params.get('after', None), page_size=page_size + 1)
+        has_next = len(pairs) > page_size
+        pairs = pairs[:page_size]
+        return Response(
+            {
+                "next": replace_query_param(request.build_absolute_uri(), 'after', pairs[-1]['ansible_id']) if has_next else None,
+                "results": pairs,
+            }
+        )
+
 
 class ResourceTypeViewSet(
     mixins.RetrieveModelMixin,
@@ -1,9 +1,29 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 
 import ansible_base.lib.checks  # noqa: F401 - register checks
+from ansible_base.lib.utils.settings import get_setting
 
 
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ansible_base.rest_filters'
     label = 'dab_rest_filters'
+
+    def ready(self):
+        from ansible_base.rest_filters.rest_framework.type_filter_backend import TypeFilterBackend
+        from ansible_base.rest_filters.result_cache import invalidate_cached_results
+
+        # New models and content types may have been added by the migration
+        post_migrate.connect(TypeFilterBackend.clear_types_map, dispatch_uid='dab_rest_filters_clear_types_map')
+
+        # The receiver does nothing unless ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_TIMEOUT is set
+        post_save.connect(invalidate_cached_results, dispatch_uid='dab_rest_filters_invalidate_post_save')
+        post_delete.connect(invalidate_cached_results, dispatch_uid='dab_rest_filters_invalidate_post_delete')
+        m2m_changed.connect(invalidate_cached_results, dispatch_uid='dab_rest_filters_invalidate_m2m_changed')
+
+        depth = get_setting('ANSIBLE_BASE_REST_FILTERS_WARM_LOOKUP_DEPTH', 0)
+        if depth:
+            from ansible_base.rest_filters.rest_framework.field_lookup_backend import FieldLookupBackend
+
+            FieldLookupBackend().warm_lookup_cache(apps.get_models(), depth)
@@ -0,0 +1,155 @@
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+
+from ansible_base.lib.utils.settings import get_setting
+
+logger = logging.getLogger('ansible_base.rest_filters.cost')
+
+REJECT_OVER_BUDGET = 'reject'
+DOWNGRADE_OVER_BUDGET = 'downgrade'
+
+
+def is_indexed(field) -> bool:
+    """
+    Returns True if field is the leading column of an index, so sorting on it does not need to sort the whole table
+    """
+    if field.primary_key or getattr(field, 'unique', False) or getattr(field, 'db_index', False):
+        return True
+    opts = field.model._meta
+    leading_fields = [index.fields[0].lstrip('-') for index in opts.indexes if index.fields]
+    leading_fields += [fields[0] for fields in opts.unique_together if fields]
+    leading_fields += [constraint.fields[0] for constraint in opts.constraints if getattr(constraint, 'fields', None)]
+    return field.name in leading_fields
+
+
+class QueryCostEstimator:
+    """
+    Scores the filters and ordering a client asks for, a higher score means a more expensive query
+
+    Each join costs join_cost, each to-many relation crossed adds to_many_cost (the rows multiply and may need a distinct),
+    a regex lookup costs regex_cost (it can't use an index) and a related search costs search_cost per field searched.
+    Ordering by a column which is not the leading column of an index costs unindexed_order_cost.
+    Subclass this and set ANSIBLE_BASE_REST_FILTERS_COST_ESTIMATOR to change the weights or the rules.
+    """
+
+    join_cost = 1
+    to_many_cost = 4
+    regex_cost = 5
+    search_cost = 2
+    unindexed_order_cost = 3
+
+    REGEX_LOOKUPS = ('regex', 'iregex')
+
+    def count_joins(self, field_list, into_last=False) -> int:
+        """
+        Returns the number of joins needed to reach the last of the fields, or the model it relates to if into_last is True
+        """
+        joins = 0
+        for position, field in enumerate(field_list):
+            if not field.is_relation:
+                continue
+            if not into_last and position == len(field_list) - 1 and field.concrete and (field.many_to_one or field.one_to_one):
+                # The value is compared to the foreign key column, no join is needed
+                continue
+            # A many to many relation joins the through table as well
+            joins += 2 if field.many_to_many else 1
+        return joins
+
+    def relation_cost(self, field_list, into_last=False) -> int:
+        to_many = sum(1 for field in field_list if field.many_to_many or field.one_to_many)
+        return self.count_joins(field_list, into_last) * self.join_cost + to_many * self.to_many_cost
+
+    def filter_cost(self, field_list, lookup) -> int:
+        """
+        Returns the cost of filtering on lookup, the fields are the ones traversed by the lookup
+        """
+        cost = self.relation_cost(field_list)
+        suffix = lookup.rsplit('__', 1)[-1]
+        if suffix in self.REGEX_LOOKUPS:
+            cost += self.regex_cost
+        return cost
+
+    def search_filter_cost(self, field_list, search_lookups) -> int:
+        """
+        Returns the cost of a related search, search_lookups are the icontains lookups on the fields of the related model
+        """
+        return self.relation_cost(field_list, into_last=True) + self.search_cost * len(search_lookups)
+
+    def order_cost(self, field_list) -> int:
+        """
+        Returns the cost of ordering by the last of the fields
+        """
+        cost = self.relation_cost(field_list)
+        if not is_indexed(field_list[-1]):
+            cost += self.unindexed_order_cost
+        return cost
+
+
+@lru_cache(maxsize=None)
+def _get_estimator(class_path):
+    return import_string(class_path)()
+
+
+def get_cost_estimator() -> QueryCostEstimator:
+    return _get_estimator(get_setting('ANSIBLE_BASE_REST_FILTERS_COST_ESTIMATOR', 'ansible_base.rest_filters.cost.QueryCostEstimator'))
+
+
+def get_query_budget(view):
+    """
+    Returns the filter_query_budget of the view or ANSIBLE_BASE_REST_FILTERS_QUERY_BUDGET, None means there is no budget
+    """
+    budget = getattr(view, 'filter_query_budget', None)
+    if budget is None:
+        budget = get_setting('ANSIBLE_BASE_REST_FILTERS_QUERY_BUDGET', None)
+    return budget
+
+
+def get_over_budget_action(view) -> str:
+    action = getattr(view, 'filter_over_budget_action', None) or get_setting('ANSIBLE_BASE_REST_FILTERS_OVER_BUDGET_ACTION', REJECT_OVER_BUDGET)
+    if action not in (REJECT_OVER_BUDGET, DOWNGRADE_OVER_BUDGET):
+        raise ImproperlyConfigured(f'Invalid filter over budget action {action}, must be {REJECT_OVER_BUDGET} or {DOWNGRADE_OVER_BUDGET}')
+    return action
+
+
+def get_query_cost(request) -> int:
+    request = getattr(request, '_request', request)
+    return getattr(request, 'filter_query_cost', 0)
+
+
+def record_query_cost(request, cost):
+    # Reported in the X-API-Query-Cost header by FilterStrategyMiddleware when DEBUG is on
+    request = getattr(request, '_request', request)
+    request.filter_query_cost = cost
+
+
+def is_over_budget(cost, view) -> bool:
+    budget = get_query_budget(view)
+    return budget is not None and cost > budget
+
+
+def over_budget_error(cost, view) -> ParseError:
+    return ParseError(
+        _('The requested filters and ordering are too expensive (cost {cost}, the limit is {budget}), use fewer or simpler filters.').format(
+            cost=cost, budget=get_query_budget(view)
+        )
+    )
+
+
+def explain_query(queryset, cost):
+    """
+    When DEBUG and ANSIBLE_BASE_REST_FILTERS_EXPLAIN_QUERIES are on, log the plan of the filtered queryset
+    """
+    if not (settings.DEBUG and get_setting('ANSIBLE_BASE_REST_FILTERS_EXPLAIN_QUERIES', False)):
+        return
+    try:
+        plan = queryset.explain()
+    except Exception as e:
+        logger.warning(f'Unable to explain the query of {queryset.model._meta.label}: {e}')
+        return
+    logger.info(f'Query plan of {queryset.model._meta.label} (cost {cost}):\n{plan}')
@@ -0,0 +1,236 @@
+import re
+from collections import Counter
+from urllib.parse import parse_qsl, urlparse
+
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models, router
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.urls.exceptions import Resolver404
+from rest_framework.exceptions import APIException
+
+from ansible_base.rest_filters.cost import get_cost_estimator
+from ansible_base.rest_filters.rest_framework.field_lookup_backend import FieldLookupBackend
+from ansible_base.rest_filters.rest_framework.order_backend import OrderByBackend
+from ansible_base.rest_filters.utils import get_fields_from_path, get_filterable_paths
+
+# Lookups which a btree index can't be used for
+SUBSTRING_LOOKUPS = ('contains', 'icontains', 'endswith', 'iendswith', 'regex', 'iregex', 'search')
+
+# The request line of a common or combined format access log entry
+ACCESS_LOG_REQUEST_RE = re.compile(r'"[A-Z]+ (\S+) HTTP/[\d.]+"')
+
+
+def iter_viewsets(url_patterns, prefix=''):
+    """
+    Yields (url name, view class) for every class based view in url_patterns
+    """
+    for pattern in url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_viewsets(pattern.url_patterns, f'{prefix}{pattern.namespace}:' if pattern.namespace else prefix)
+        elif isinstance(pattern, URLPattern):
+            cls = getattr(pattern.callback, 'cls', None)
+            if cls is not None:
+                yield f'{prefix}{pattern.name or pattern.pattern}', cls
+
+
+def get_view_model(cls):
+    queryset = getattr(cls, 'queryset', None)
+    return queryset.model if queryset is not None else None
+
+
+def uses_backend(cls, backend_class) -> bool:
+    return any(isinstance(backend, type) and issubclass(backend, backend_class) for backend in getattr(cls, 'filter_backends', ()))
+
+
+class Candidate:
+    """
+    A column which is filtered or ordered on through the API
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.paths = set()
+        self.views = set()
+        self.lookups = Counter()
+        self.requests = 0
+        # The sum of the estimated cost of each request, so requests x cost
+        self.score = 0
+
+    def record(self, cost, lookup=None):
+        self.requests += 1
+        self.score += cost
+        if lookup:
+            self.lookups[lookup] += 1
+
+    @property
+    def mostly_substring_lookups(self) -> bool:
+        substring = sum(count for lookup, count in self.lookups.items() if lookup in SUBSTRING_LOOKUPS)
+        return substring * 2 > sum(self.lookups.values())
+
+    def index_definition(self) -> str:
+        index = models.Index(fields=[self.field.name])
+        index.set_name_with_model(self.field.model)
+        return f"models.Index(fields=['{self.field.name}'], name='{index.name}')"
+
+
+class Command(BaseCommand):
+    help = (
+        "Suggest database indexes for the fields which can be filtered and ordered on through the API. "
+        "Every filterable path of every view using the rest_filters backends is resolved and compared to the indexes in the database, "
+        "the columns without an index are ranked by how often a sample of requests used them times the estimated cost of the query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sample",
+            action="append",
+            dest="samples",
+            help="A file of recorded requests, one URL or access log line per line, can be repeated. Without a sample each path counts once",
+            required=False,
+        )
+        parser.add_argument("--depth", type=int, default=2, help="Follow relations this many models deep when listing the filterable paths", required=False)
+        parser.add_argument("--limit", type=int, default=20, help="The number of suggestions to show, 0 shows all of them", required=False)
+        parser.add_argument("--include-unused", action="store_true", help="Also list columns which are not used by the sample", required=False)
+
+    def handle(self, *args, **options):
+        if options['depth'] < 1:
+            raise CommandError("--depth must be at least 1")
+
+        self.estimator = get_cost_estimator()
+        self.lookup_backend = FieldLookupBackend()
+        self.indexed_columns = {}
+        self.candidates = {}
+
+        viewsets = {}
+        for name, cls in iter_viewsets(get_resolver().url_patterns):
+            model = get_view_model(cls)
+            if model is not None and (uses_backend(cls, FieldLookupBackend) or uses_backend(cls, OrderByBackend)):
+                # The list view is registered before the detail view
+                viewsets.setdefault(cls, (name, model))
+
+        for cls, (name, model) in viewsets.items():
+            for path in get_filterable_paths(model, options['depth']):
+                candidate, cost = self.add_path(name, model, path)
+                if candidate is not None and not options['samples']:
+                    candidate.record(cost)
+
+        for sample in options['samples'] or []:
+            self.read_sample(sample, viewsets)
+
+        candidates = [candidate for candidate in self.candidates.values() if candidate.requests or options['include_unused']]
+        candidates.sort(key=lambda candidate: (-candidate.score, candidate.field.model._meta.label, candidate.field.name))
+        if options['limit']:
+            candidates = candidates[: options['limit']]
+
+        if not candidates:
+            self.stdout.write("Every filterable and orderable column is indexed")
+            return
+
+        self.stdout.write("Suggested indexes, ranked by requests x estimated cost:")
+        for candidate in candidates:
+            self.write_candidate(candidate)
+
+    def is_indexed(self, field) -> bool:
+        """
+        Returns True if the column of field is the leading column of an index in the database
+        """
+        table = field.model._meta.db_table
+        if table not in self.indexed_columns:
+            connection = connections[router.db_for_read(field.model)]
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, table)
+            self.indexed_columns[table] = {
+                constraint['columns'][0]
+                for constraint in constraints.values()
+                if constraint['columns'] and (constraint['index'] or constraint['unique'] or constraint['primary_key'])
+            }
+        return field.column in self.indexed_columns[table]
+
+    def add_path(self, view_name, model, path):
+        """
+        Returns the candidate for the column at the end of path and the estimated cost of using path,
+        the candidate is None if path does not end at a column or the column is already indexed
+        """
+        try:
+            field_list, new_path = get_fields_from_path(model, path)
+        except (APIException, FieldDoesNotExist, FieldError):
+            # Not filterable, ex. a password field or a field marked with prevent_search
+            return None, 0
+        field = field_list[-1]
+        if not field.concrete or field.many_to_many or field.primary_key or isinstance(field, models.JSONField) or self.is_indexed(field):
+            return None, 0
+
+        key = (field.model, field.name)
+        candidate = self.candidates.get(key, None)
+        if candidate is None:
+            candidate = self.candidates[key] = Candidate(field)
+        candidate.paths.add(new_path)
+        candidate.views.add(view_name)
+        # The cost of filtering or ordering on an unindexed column, including the joins to reach it
+        return candidate, self.estimator.order_cost(field_list)
+
+    def read_sample(self, sample, viewsets):
+        try:
+            with open(sample, 'r') as f:
+                lines = f.readlines()
+        except OSError as e:
+            raise CommandError(f"Unable to read {sample}: {e}")
+
+        for line in lines:
+            match = ACCESS_LOG_REQUEST_RE.search(line)
+            url = urlparse(match.group(1) if match else line.strip())
+            if not url.query:
+                continue
+            try:
+                cls = getattr(resolve(url.path).func, 'cls', None)
+            except Resolver404:
+                continue
+            if cls not in viewsets:
+                continue
+            name, model = viewsets[cls]
+            for key, value in parse_qsl(url.query):
+                for path, lookup in self.get_paths_from_param(cls, model, key, value):
+                    candidate, cost = self.add_path(name, model, path)
+                    if candidate is not None:
+                        candidate.record(cost, lookup)
+
+    def get_paths_from_param(self, cls, model, key, value):
+        """
+        Yields the (path, lookup) used by a query parameter, handling the prefixes and suffixes like FieldLookupBackend and OrderByBackend do
+        """
+        if key in ('order', 'order_by'):
+            if uses_backend(cls, OrderByBackend):
+                for order in value.split(','):
+                    if order.lstrip('-'):
+                        yield order.lstrip('-'), 'order'
+            return
+        if key in FieldLookupBackend.RESERVED_NAMES or key == 'role_level' or not uses_backend(cls, FieldLookupBackend):
+            return
+
+        if key.endswith('__int'):
+            key = key[:-5]
+        for prefix in ('chain__', 'or__'):
+            if key.startswith(prefix):
+                key = key[len(prefix) :]
+                break
+        if key.startswith('not__'):
+            key = key[5:]
+        try:
+            _, new_lookup = self.lookup_backend.get_fields_from_lookup(model, key)
+        except (APIException, FieldDoesNotExist, FieldError):
+            return
+        path, lookup = new_lookup.rsplit('__', 1)
+        yield path, lookup
+
+    def write_candidate(self, candidate):
+        label = f'{candidate.field.model._meta.label}.{candidate.field.name}'
+        self.stdout.write(
+            f"{label}: score {candidate.score} from {candidate.requests} requests, "
+            f"used by {', '.join(sorted(candidate.views))} as {', '.join(sorted(candidate.paths))}"
+        )
+        if candidate.lookups:
+            self.stdout.write(f"    # lookups: {', '.join(f'{lookup} ({count})' for lookup, count in candidate.lookups.most_common())}")
+        if candidate.mostly_substring_lookups:
+            self.stdout.write("    # Mostly substring lookups which a btree index can't be used for, consider search_index_operations(kind='trigram')")
+        self.stdout.write(f"    {candidate.index_definition()}")
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+
+class FilterStrategyMiddleware(MiddlewareMixin):
+    """
+    When DEBUG is on, report how FieldLookupBackend removed duplicate rows from the filtered queryset in the X-API-Filter-Strategy header
+    the estimated cost of the filters and ordering in the X-API-Query-Cost header and whether the rows came from the result cache
+    in the X-API-Filter-Cache header
+    """
+
+    def process_response(self, request, response):
+        if not settings.DEBUG:
+            return response
+        strategies = getattr(request, 'filter_strategies', None)
+        if strategies:
+            response['X-API-Filter-Strategy'] = ', '.join(strategies)
+        cost = getattr(request, 'filter_query_cost', None)
+        if cost is not None:
+            response['X-API-Query-Cost'] = str(cost)
+        result_cache = getattr(request, 'filter_result_cache', None)
+        if result_cache:
+            response['X-API-Filter-Cache'] = result_cache
+        return response
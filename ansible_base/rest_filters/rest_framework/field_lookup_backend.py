@@ -3,18 +3,33 @@ import re
 from functools import reduce
 
 from django.contrib.contenttypes.fields import GenericForeignKey
-from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
-from django.db import models
-from django.db.models import BooleanField, CharField, IntegerField, JSONField, Q, TextField
+from django.core.exceptions import FieldDoesNotExist, FieldError, ImproperlyConfigured, ValidationError
+from django.db import connections, models, router
+from django.db.models import BooleanField, CharField, Exists, IntegerField, JSONField, OuterRef, Q, TextField
 from django.db.models.fields.related import ForeignKey, ForeignObjectRel, ManyToManyField
 from django.db.models.functions import Cast
 from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
-from rest_framework.exceptions import ParseError
+from rest_framework.exceptions import ParseError, PermissionDenied
 from rest_framework.filters import BaseFilterBackend
 
+from ansible_base.lib.utils.models import is_json_key_path_allowed
+from ansible_base.lib.utils.settings import get_setting
 from ansible_base.lib.utils.validation import to_python_boolean
-from ansible_base.rest_filters.utils import get_fields_from_path
+from ansible_base.rest_filters.cost import get_cost_estimator, is_over_budget, over_budget_error, record_query_cost
+from ansible_base.rest_filters.result_cache import get_path_models, record_filter_models
+from ansible_base.rest_filters.search import FULLTEXT_SEARCH_MODE, get_fulltext_search_expression, get_search_field_names, get_search_mode
+from ansible_base.rest_filters.utils import get_fields_and_json_keys_from_path, get_filterable_paths, lookup_cache
+
+
+def parse_json_value(value):
+    """
+    Query string values compared to JSON are JSON themselves (5, true, "5", {"a": 1}), anything else is a string
+    """
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
 
 
 class FieldLookupBackend(BaseFilterBackend):
@@ -22,7 +37,7 @@ class FieldLookupBackend(BaseFilterBackend):
     Filter using field lookups provided via query string parameters.
     """
 
-    RESERVED_NAMES = ('page', 'page_size', 'format', 'order', 'order_by', 'search', 'type', 'host_filter', 'count_disabled', 'no_truncate', 'limit')
+    RESERVED_NAMES = ('page', 'page_size', 'format', 'order', 'order_by', 'search', 'type', 'host_filter', 'count_disabled', 'no_truncate', 'limit', 'cursor')
 
     SUPPORTED_LOOKUPS = (
         'exact',
@@ -42,13 +57,80 @@ class FieldLookupBackend(BaseFilterBackend):
         'in',
         'isnull',
         'search',
+        'has_key',
+        'has_keys',
+        'has_any_keys',
     )
 
+    # Lookups on the keys of a JSONField
+    JSON_KEY_LOOKUPS = ('has_key', 'has_keys', 'has_any_keys')
+
     # A list of fields that we know can be filtered on without the possibility
     # of introducing duplicates
     NO_DUPLICATES_ALLOW_LIST = (CharField, IntegerField, BooleanField, TextField)
 
+    # Ways of removing the duplicate rows caused by filtering across to-many relations
+    DISTINCT_STRATEGY = 'distinct'
+    SUBQUERY_STRATEGY = 'subquery'
+    EXISTS_STRATEGY = 'exists'
+
+    def get_distinct_strategy(self, view):
+        """
+        Returns distinct (apply .distinct() to the whole queryset) or subquery (filter to-many relations in a subquery)
+        from the filter_distinct_strategy of the view or ANSIBLE_BASE_REST_FILTERS_DISTINCT_STRATEGY
+        """
+        strategy = getattr(view, 'filter_distinct_strategy', None) or get_setting('ANSIBLE_BASE_REST_FILTERS_DISTINCT_STRATEGY', self.DISTINCT_STRATEGY)
+        if strategy not in (self.DISTINCT_STRATEGY, self.SUBQUERY_STRATEGY):
+            raise ImproperlyConfigured(f'Invalid filter distinct strategy {strategy}, must be {self.DISTINCT_STRATEGY} or {self.SUBQUERY_STRATEGY}')
+        return strategy
+
+    @staticmethod
+    def crosses_to_many(field_list) -> bool:
+        """
+        Returns True if the fields of a lookup cross a to-many relation, filtering on it can then return a row more than once
+        """
+        return any(getattr(field, 'many_to_many', False) or getattr(field, 'one_to_many', False) for field in field_list)
+
+    def apply_filters(self, queryset, filters, to_many, strategy, strategies, annotations=None):
+        """
+        Filter queryset by filters, in the subquery strategy filters crossing to-many relations are wrapped so no distinct is needed
+        annotations are the annotations of queryset the filters use, the subquery needs them too
+        """
+        if not filters:
+            return queryset
+        if not to_many or strategy == self.DISTINCT_STRATEGY:
+            return queryset.filter(*filters)
+
+        subquery = queryset.model._base_manager.annotate(**(annotations or {})).filter(*filters)
+        if queryset.query.has_filters():
+            # The rows are already narrowed down so check each of them for a match
+            strategies.append(self.EXISTS_STRATEGY)
+            return queryset.filter(Exists(subquery.filter(pk=OuterRef('pk'))))
+        # Otherwise let the database drive the query from the matching pks
+        strategies.append(self.SUBQUERY_STRATEGY)
+        return queryset.filter(pk__in=subquery.values('pk'))
+
+    def record_strategies(self, request, strategies):
+        # Reported in the X-API-Filter-Strategy header by FilterStrategyMiddleware when DEBUG is on
+        request = getattr(request, '_request', request)
+        request.filter_strategies = getattr(request, 'filter_strategies', []) + strategies
+
+    def check_query_cost(self, request, view, cost):
+        # The ordering is added to the cost by OrderByBackend
+        record_query_cost(request, cost)
+        if is_over_budget(cost, view):
+            raise over_budget_error(cost, view)
+
     def get_fields_from_lookup(self, model, lookup):
+        field_list, new_lookup, _, _ = self.resolve_lookup(model, lookup)
+        return field_list, new_lookup
+
+    def resolve_lookup(self, model, lookup):
+        """
+        Returns the fields traversed by lookup, the rewritten lookup, whether filtering on it needs a distinct and
+        the keys inside of the JSONField the lookup ends at (None if it doesn't end at a JSONField)
+        The resolved path is cached per model so only the lookup suffix is handled on each request
+        """
         if '__' in lookup and lookup.rsplit('__', 1)[-1] in self.SUPPORTED_LOOKUPS:
             path, suffix = lookup.rsplit('__', 1)
         else:
@@ -58,14 +140,28 @@ class FieldLookupBackend(BaseFilterBackend):
         if not path:
             raise ParseError(_('Query string field name not provided.'))
 
+        field_list, new_path, needs_distinct, json_keys = lookup_cache.get((type(self), model, path), self.resolve_path, model, path)
+        return field_list, '__'.join([new_path, suffix]), needs_distinct, json_keys
+
+    def resolve_path(self, model, path):
         # FIXME: Could build up a list of models used across relationships, use
         # those lookups combined with request.user.get_queryset(Model) to make
         # sure user cannot query using objects he could not view.
-        field_list, new_path = get_fields_from_path(model, path)
+        field_list, new_path, json_keys = get_fields_and_json_keys_from_path(model, path)
+        needs_distinct = not all(isinstance(f, self.NO_DUPLICATES_ALLOW_LIST) for f in field_list)
+        return field_list, new_path, needs_distinct, json_keys
 
-        new_lookup = new_path
-        new_lookup = '__'.join([new_path, suffix])
-        return field_list, new_lookup
+    def warm_lookup_cache(self, models, depth):
+        """
+        Resolve every filterable path of models up to depth models deep so that the first requests don't have to
+        """
+        for model in models:
+            for path in get_filterable_paths(model, depth):
+                try:
+                    self.get_fields_from_lookup(model, path)
+                except (ParseError, PermissionDenied, FieldDoesNotExist):
+                    # The outcome is cached along with the valid paths
+                    pass
 
     def get_field_from_lookup(self, model, lookup):
         '''Method to match return type of single field, if needed.'''
@@ -96,10 +192,12 @@ class FieldLookupBackend(BaseFilterBackend):
         except UnicodeEncodeError:
             raise ValueError("%r is not an allowed field name. Must be ascii encodable." % lookup)
 
-        field_list, new_lookup = self.get_fields_from_lookup(model, lookup)
+        field_list, new_lookup, needs_distinct, json_keys = self.resolve_lookup(model, lookup)
         field = field_list[-1]
 
-        needs_distinct = not all(isinstance(f, self.NO_DUPLICATES_ALLOW_LIST) for f in field_list)
+        if json_keys is not None and self.is_native_json_lookup(model, new_lookup, json_keys, value):
+            value, new_lookup = self.json_value_to_python(model, field, new_lookup, json_keys, value)
+            return value, new_lookup, needs_distinct
 
         # Type names are stored without underscores internally, but are presented and
         # and serialized over the API containing underscores so we remove `_`
@@ -128,9 +226,8 @@ class FieldLookupBackend(BaseFilterBackend):
             if not related_model:
                 raise ValueError('%s is not searchable' % new_lookup[:-8])
             new_lookups = []
-            for rm_field in related_model._meta.fields:
-                if rm_field.name in ('username', 'first_name', 'last_name', 'email', 'name', 'description', 'playbook'):
-                    new_lookups.append('{}__{}__icontains'.format(new_lookup[:-8], rm_field.name))
+            for field_name in get_search_field_names(related_model):
+                new_lookups.append('{}__{}__icontains'.format(new_lookup[:-8], field_name))
             return value, new_lookups, needs_distinct
         else:
             if isinstance(field, JSONField):
@@ -138,6 +235,79 @@ class FieldLookupBackend(BaseFilterBackend):
             value = self.value_to_python_for_field(field, value)
         return value, new_lookup, needs_distinct
 
+    def supports_json_containment(self, model):
+        return connections[router.db_for_read(model)].features.supports_json_field_contains
+
+    def is_native_json_lookup(self, model, new_lookup, json_keys, value):
+        """
+        Returns True if new_lookup on a JSONField is done with the JSON lookups of the database
+
+        Lookups on keys inside of the JSON always are, as is a containment check of a JSON object or array where the database supports it.
+        Other lookups on the whole field compare the JSON serialised as text.
+        """
+        suffix = new_lookup.rsplit('__', 1)[-1]
+        if json_keys or suffix in self.JSON_KEY_LOOKUPS:
+            return True
+        return suffix == 'contains' and isinstance(parse_json_value(value), (dict, list)) and self.supports_json_containment(model)
+
+    def json_value_to_python(self, model, field, new_lookup, json_keys, value):
+        path, suffix = new_lookup.rsplit('__', 1)
+        if suffix in self.JSON_KEY_LOOKUPS:
+            keys = value.split(',')
+            for key in keys:
+                if not is_json_key_path_allowed(field, json_keys + [key]):
+                    raise PermissionDenied(_('Filtering on key {} of {} is not allowed.').format('__'.join(json_keys + [key]), field.name))
+            return (value if suffix == 'has_key' else keys), new_lookup
+        elif suffix == 'isnull':
+            return to_python_boolean(value), new_lookup
+        elif suffix == 'in':
+            if not value:
+                raise ValueError('cannot provide empty value for __in')
+            return [parse_json_value(item) for item in value.split(',')], new_lookup
+        elif suffix in ('regex', 'iregex'):
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise ValueError(e.args[0])
+            return value, new_lookup
+        elif suffix not in ('exact', 'contains', 'gt', 'gte', 'lt', 'lte'):
+            # Text lookups compare the value of the key as text
+            return value, new_lookup
+
+        value = parse_json_value(value)
+        if (
+            suffix == 'exact'
+            and json_keys
+            and not isinstance(value, (dict, list))
+            and not any(key.isdigit() for key in json_keys)
+            and self.supports_json_containment(model)
+        ):
+            # Comparing the value of a key can't use an index but a containment check (@> on PostgreSQL) can use a GIN index
+            for key in reversed(json_keys):
+                value = {key: value}
+            return value, '__'.join(path.split('__')[: -len(json_keys)] + ['contains'])
+        return value, new_lookup
+
+    def build_search_q(self, term, constrains, search_mode):
+        """
+        Returns a Q matching term in any of the related fields of the icontains lookups in constrains
+
+        In the fulltext search mode the fields of each relation are matched with a single (indexable) full-text search instead
+        """
+        q = Q()
+        if search_mode != FULLTEXT_SEARCH_MODE:
+            for constrain in constrains:
+                q |= Q(**{constrain: term})
+            return q
+
+        relations = {}
+        for constrain in constrains:
+            relation, field_name, _ = constrain.rsplit('__', 2)
+            relations.setdefault(relation, []).append(f'{relation}__{field_name}')
+        for field_paths in relations.values():
+            q |= Q(get_fulltext_search_expression(field_paths, term))
+        return q
+
     def filter_queryset(self, request, queryset, view):
         try:
             # Apply filters specified via query_params. Each entry in the lists
@@ -147,7 +317,13 @@ class FieldLookupBackend(BaseFilterBackend):
             chain_filters = []
             role_filters = []
             search_filters = {}
+            search_to_many = False
+            # The Cast annotations the filters on JSONFields as text use
+            annotations = {}
             needs_distinct = False
+            estimator = get_cost_estimator()
+            cost = 0
+            filter_models = set()
             # Can only have two values: 'AND', 'OR'
             # If 'AND' is used, an item must satisfy all conditions to show up in the results.
             # If 'OR' is used, an item just needs to satisfy one condition to appear in results.
@@ -166,7 +342,7 @@ class FieldLookupBackend(BaseFilterBackend):
                 # when not capturing job event hosts M2M.
                 if queryset.model._meta.object_name == 'JobEvent' and key.startswith('hosts__name'):
                     key = key.replace('hosts__name', 'or__host__name')
-                    or_filters.append((False, 'host__name__isnull', True))
+                    or_filters.append((False, 'host__name__isnull', True, False))
 
                 # Custom __int filter suffix (internal use only).
                 q_int = False
@@ -188,6 +364,10 @@ class FieldLookupBackend(BaseFilterBackend):
                         search_value, new_keys, _ = self.value_to_python(queryset.model, key, force_str(value))
                         assert isinstance(new_keys, list)
                         search_filters[search_value] = new_keys
+                        field_list = self.get_fields_from_lookup(queryset.model, key)[0]
+                        search_to_many = search_to_many or self.crosses_to_many(field_list)
+                        cost += estimator.search_filter_cost(field_list, new_keys)
+                        filter_models |= get_path_models(field_list)
                     # by definition, search *only* joins across relations,
                     # so it _always_ needs a .distinct()
                     needs_distinct = True
@@ -217,57 +397,73 @@ class FieldLookupBackend(BaseFilterBackend):
                     value, new_key, distinct = self.value_to_python(queryset.model, key, value)
                     if distinct:
                         needs_distinct = True
+                    field_list = self.get_fields_from_lookup(queryset.model, key)[0]
+                    # Only filters across to-many relations are wrapped in the subquery strategy
+                    to_many = self.crosses_to_many(field_list)
+                    cost += estimator.filter_cost(field_list, new_key)
+                    filter_models |= get_path_models(field_list)
                     if '_as_txt' in new_key:
                         fname = next(item for item in new_key.split('__') if item.endswith('_as_txt'))
-                        queryset = queryset.annotate(**{fname: Cast(fname[:-7], output_field=TextField())})
+                        annotations[fname] = Cast(fname[:-7], output_field=TextField())
+                        queryset = queryset.annotate(**{fname: annotations[fname]})
                     if q_chain:
-                        chain_filters.append((q_not, new_key, value))
+                        chain_filters.append((q_not, new_key, value, to_many))
                     elif q_or:
-                        or_filters.append((q_not, new_key, value))
+                        or_filters.append((q_not, new_key, value, to_many))
                     else:
-                        and_filters.append((q_not, new_key, value))
+                        and_filters.append((q_not, new_key, value, to_many))
+
+            self.check_query_cost(request, view, cost)
+            record_filter_models(request, filter_models)
 
             # Now build Q objects for database query filter.
             if and_filters or or_filters or chain_filters or role_filters or search_filters:
+                strategy = self.get_distinct_strategy(view)
+                strategies = []
                 args = []
-                for n, k, v in and_filters:
+                # Whether any of args crosses a to-many relation
+                args_to_many = False
+                for n, k, v, m in and_filters:
                     if n:
                         args.append(~Q(**{k: v}))
                     else:
                         args.append(Q(**{k: v}))
+                    args_to_many = args_to_many or m
                 for role_name in role_filters:
                     if not hasattr(queryset.model, 'accessible_pk_qs'):
                         raise ParseError(_('Cannot apply role_level filter to this list because its model does not use roles for access control.'))
                     args.append(Q(pk__in=queryset.model.accessible_pk_qs(request.user, role_name)))
                 if or_filters:
                     q = Q()
-                    for n, k, v in or_filters:
+                    for n, k, v, m in or_filters:
                         if n:
                             q |= ~Q(**{k: v})
                         else:
                             q |= Q(**{k: v})
+                        args_to_many = args_to_many or m
                     args.append(q)
+                search_mode = get_search_mode(queryset.db)
                 if search_filters and search_filter_relation == 'OR':
                     q = Q()
                     for term, constrains in search_filters.items():
-                        for constrain in constrains:
-                            q |= Q(**{constrain: term})
+                        q |= self.build_search_q(term, constrains, search_mode)
                     args.append(q)
+                    args_to_many = args_to_many or search_to_many
                 elif search_filters and search_filter_relation == 'AND':
                     for term, constrains in search_filters.items():
-                        q_chain = Q()
-                        for constrain in constrains:
-                            q_chain |= Q(**{constrain: term})
-                        queryset = queryset.filter(q_chain)
-                for n, k, v in chain_filters:
+                        q_chain = self.build_search_q(term, constrains, search_mode)
+                        queryset = self.apply_filters(queryset, [q_chain], search_to_many, strategy, strategies, annotations)
+                for n, k, v, m in chain_filters:
                     if n:
                         q = ~Q(**{k: v})
                     else:
                         q = Q(**{k: v})
-                    queryset = queryset.filter(q)
-                queryset = queryset.filter(*args)
-                if needs_distinct:
+                    queryset = self.apply_filters(queryset, [q], m, strategy, strategies, annotations)
+                queryset = self.apply_filters(queryset, args, args_to_many, strategy, strategies, annotations)
+                if needs_distinct and strategy == self.DISTINCT_STRATEGY:
                     queryset = queryset.distinct()
+                    strategies.append(self.DISTINCT_STRATEGY)
+                self.record_strategies(request, strategies)
             return queryset
         except (FieldError, FieldDoesNotExist, ValueError, TypeError) as e:
             raise ParseError(e.args[0]) from e
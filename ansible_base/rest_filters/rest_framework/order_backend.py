@@ -1,8 +1,24 @@
+import logging
+
 from django.core.exceptions import FieldDoesNotExist, FieldError
 from rest_framework.exceptions import ParseError
 from rest_framework.filters import BaseFilterBackend
 
-from ansible_base.rest_filters.utils import get_all_field_names, get_field_from_path
+from ansible_base.lib.utils.models import get_field_index
+from ansible_base.rest_filters.cost import (
+    DOWNGRADE_OVER_BUDGET,
+    explain_query,
+    get_cost_estimator,
+    get_over_budget_action,
+    get_query_cost,
+    is_over_budget,
+    over_budget_error,
+    record_query_cost,
+)
+from ansible_base.rest_filters.result_cache import get_path_models, get_result_cache_timeout, record_filter_models
+from ansible_base.rest_filters.utils import get_field_from_path, get_fields_from_path
+
+logger = logging.getLogger('ansible_base.rest_filters.rest_framework.order_backend')
 
 
 class OrderByBackend(BaseFilterBackend):
@@ -20,17 +36,18 @@ class OrderByBackend(BaseFilterBackend):
                         order_by = value.split(',')
                     else:
                         order_by = (value,)
+            order_by = self.check_ordering_cost(request, view, queryset.model, order_by)
             default_order_by = self.get_default_ordering(view)
             # glue the order by and default order by together so that the default is the backup option
             order_by = list(order_by or []) + list(default_order_by or [])
+            new_order_by = []
             if order_by:
                 order_by = self._validate_ordering_fields(queryset.model, order_by)
                 # Special handling of the type field for ordering. In this
                 # case, we're not sorting exactly on the type field, but
                 # given the limited number of views with multiple types,
                 # sorting on polymorphic_ctype.model is effectively the same.
-                new_order_by = []
-                if 'polymorphic_ctype' in get_all_field_names(queryset.model):
+                if get_field_index(queryset.model).has_polymorphic_ctype:
                     for field in order_by:
                         if field == 'type':
                             new_order_by.append('polymorphic_ctype__model')
@@ -43,11 +60,47 @@ class OrderByBackend(BaseFilterBackend):
                         if field not in ('type', '-type'):
                             new_order_by.append(field)
                 queryset = queryset.order_by(*new_order_by)
+            explain_query(queryset, get_query_cost(request))
+
+            if get_result_cache_timeout(view):
+                # The order of the rows cached by ResultCachePageNumberPagination depends on the models ordered by too
+                for field_name in new_order_by:
+                    record_filter_models(request, get_path_models(get_fields_from_path(queryset.model, field_name.lstrip('-'))[0]))
             return queryset
         except FieldError as e:
             # Return a 400 for invalid field names.
             raise ParseError(*e.args)
 
+    def get_ordering_cost(self, model, order_by):
+        estimator = get_cost_estimator()
+        cost = 0
+        for field_name in order_by:
+            try:
+                field_list, _ = get_fields_from_path(model, field_name.lstrip('-'))
+            except (FieldError, FieldDoesNotExist) as e:
+                raise ParseError(e.args[0])
+            cost += estimator.order_cost(field_list)
+        return cost
+
+    def check_ordering_cost(self, request, view, model, order_by):
+        """
+        Adds the cost of the requested ordering to the cost of the filters, returns the ordering to use
+
+        If the total is over the budget the request is rejected, or with the downgrade action the requested ordering is dropped
+        in favor of the default ordering of the view
+        """
+        cost = get_query_cost(request)
+        if order_by:
+            cost += self.get_ordering_cost(model, order_by)
+            if is_over_budget(cost, view):
+                if get_over_budget_action(view) != DOWNGRADE_OVER_BUDGET:
+                    raise over_budget_error(cost, view)
+                logger.info(f'Ignoring the ordering {",".join(order_by)} of {model._meta.label}, the query cost {cost} is over budget')
+                cost = get_query_cost(request)
+                order_by = None
+        record_query_cost(request, cost)
+        return order_by
+
     def get_default_ordering(self, view):
         ordering = getattr(view, 'ordering', None)
         if isinstance(ordering, str):
@@ -0,0 +1,216 @@
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from ansible_base.rest_filters.result_cache import get_cached_result, get_result_cache_timeout, is_cacheable_request
+from ansible_base.rest_filters.utils import get_fields_from_path
+
+
+class KeysetCursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder truncates datetimes and times to milliseconds, the cursor keeps the microseconds so it compares equal to the row
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination using the ordering applied to the queryset by OrderByBackend (or the default ordering of the model).
+
+    The primary key is appended to the ordering as a tiebreaker and the sort key of the last row of a page is encoded into
+    an opaque cursor. The next page is selected with WHERE (col > x) OR (col = x AND pk > y) so the cost of a page does not depend on how deep it is.
+    Nullable columns are sorted with nulls last.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.keys = self.get_keys(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = cursor['reverse'] if cursor else False
+
+        # Each key is (annotation name, descending, nullable, nulls first) in the direction the rows are read
+        read_keys = [(name, descending != reverse, nullable, reverse) for name, _, descending, nullable, _ in self.keys]
+        queryset = queryset.annotate(**{name: F(path) for name, path, _, _, _ in self.keys}).order_by(*self.get_order_by(read_keys))
+        if cursor:
+            after = self.get_after_q(read_keys, cursor['values'])
+            queryset = queryset.filter(after) if after is not None else queryset.none()
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Coming from a cursor means there is at least one row the other way
+        self.has_next = (cursor is not None) if reverse else has_more
+        self.has_previous = has_more if reverse else (cursor is not None)
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_keys(self, queryset):
+        """
+        Returns the sort keys of queryset as (annotation name, path, descending, nullable, field), ending with the primary key
+        """
+        model = queryset.model
+        ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+        keys = []
+        for position, order in enumerate(ordering):
+            if not isinstance(order, str) or order == '?':
+                raise ParseError(_('Keyset pagination can only be used with ordering by fields.'))
+            descending = order.startswith('-')
+            path = order.lstrip('-')
+            field_list, path = get_fields_from_path(model, path)
+            if any(field.many_to_many or field.one_to_many for field in field_list):
+                raise ParseError(_('Keyset pagination can not be ordered by {}, it is a to-many relation.').format(path))
+            field = field_list[-1]
+            if field.is_relation and field.concrete and not field.primary_key:
+                # Order by the id of the related object, not by the ordering of the related model
+                path = f'{path}_id'
+            nullable = any(f.null for f in field_list)
+            keys.append((f'keyset_{position}', path, descending, nullable, field))
+            if len(field_list) == 1 and (field.primary_key or (field.unique and not field.null)):
+                # The rest of the ordering can never be reached
+                return keys
+        keys.append((f'keyset_{len(keys)}', 'pk', False, False, model._meta.pk))
+        return keys
+
+    def get_order_by(self, read_keys):
+        order_by = []
+        for name, descending, nullable, nulls_first in read_keys:
+            expression = F(name).desc if descending else F(name).asc
+            if nullable:
+                order_by.append(expression(nulls_first=True) if nulls_first else expression(nulls_last=True))
+            else:
+                order_by.append(expression())
+        return order_by
+
+    def get_after_q(self, read_keys, values):
+        """
+        Returns a Q selecting the rows after values, ex. (a > 1) OR (a = 1 AND pk > 5), or None if there are no rows after them
+        """
+        after = []
+        equal = []
+        for (name, descending, nullable, nulls_first), value in zip(read_keys, values):
+            if value is None:
+                # Non null values come after nulls only if nulls are first
+                if nulls_first:
+                    after.append(reduce(lambda a, b: a & b, equal, Q(**{f'{name}__isnull': False})))
+                equal.append(Q(**{f'{name}__isnull': True}))
+                continue
+
+            q = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            if nullable and not nulls_first:
+                q |= Q(**{f'{name}__isnull': True})
+            after.append(reduce(lambda a, b: a & b, equal, q))
+            equal.append(Q(**{name: value}))
+
+        if not after:
+            return None
+        return reduce(lambda a, b: a | b, after)
+
+    def get_ordering_signature(self):
+        return [f'{"-" if descending else ""}{path}' for _, path, descending, _, _ in self.keys]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse, ordering = cursor['v'], bool(cursor['r']), cursor['o']
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor from a different ordering can't be used
+        if ordering != self.get_ordering_signature() or not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        # A tampered value would only fail in the database, convert them like the fields do
+        try:
+            values = [None if value is None else field.to_python(value) for value, (_, _, _, _, field) in zip(values, self.keys)]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        return {'values': values, 'reverse': reverse}
+
+    def encode_cursor(self, row, reverse):
+        cursor = {'v': [getattr(row, name) for name, _, _, _, _ in self.keys], 'r': reverse, 'o': self.get_ordering_signature()}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, cls=KeysetCursorEncoder).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ResultCachePageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination which serves the rows of a filtered list from the result cache, see get_cached_result.
+
+    Views opt in to the result cache by using it, the filter backends still return a QuerySet.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        timeout = get_result_cache_timeout(view)
+        if timeout and is_cacheable_request(request, view):
+            queryset = get_cached_result(request, queryset, view, timeout)
+        return super().paginate_queryset(queryset, request, view)
@@ -1,10 +1,12 @@
+import threading
+
+from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import FieldError
-from django.db.models import Q
 from rest_framework.exceptions import ParseError
 from rest_framework.filters import BaseFilterBackend
 
-from ansible_base.lib.utils.models import get_all_field_names, get_type_for_model
+from ansible_base.lib.utils.models import get_field_index, get_type_for_model
 
 
 class TypeFilterBackend(BaseFilterBackend):
@@ -12,6 +14,32 @@ class TypeFilterBackend(BaseFilterBackend):
     Filter on type field now returned with all objects.
     """
 
+    _types_map = None
+    _types_map_lock = threading.Lock()
+
+    @classmethod
+    def get_types_map(cls):
+        """
+        Returns a dict of type name to ContentType pk, built once from the ContentType cache and kept until the next migrate
+        """
+        types_map = cls._types_map
+        if types_map is None:
+            with cls._types_map_lock:
+                types_map = cls._types_map
+                if types_map is None:
+                    # The types which can be filtered on are the models of the 'main' app and the user model
+                    type_models = [
+                        model for model in apps.get_models(include_swapped=True) if model._meta.app_label == 'main' or model._meta.label_lower == 'auth.user'
+                    ]
+                    content_types = ContentType.objects.get_for_models(*type_models, for_concrete_models=False)
+                    types_map = {get_type_for_model(model): ct.pk for model, ct in content_types.items()}
+                    cls._types_map = types_map
+        return types_map
+
+    @classmethod
+    def clear_types_map(cls, **kwargs):
+        cls._types_map = None
+
     def filter_queryset(self, request, queryset, view):
         try:
             types = None
@@ -22,17 +50,10 @@ class TypeFilterBackend(BaseFilterBackend):
                     else:
                         types = (value,)
             if types:
-                types_map = {}
-                # TODO: We need to revisit this out since we don't have a main app
-                for ct in ContentType.objects.filter(Q(app_label='main') | Q(app_label='auth', model='user')):
-                    ct_model = ct.model_class()
-                    if not ct_model:
-                        continue
-                    ct_type = get_type_for_model(ct_model)
-                    types_map[ct_type] = ct.pk
                 model = queryset.model
                 model_type = get_type_for_model(model)
-                if 'polymorphic_ctype' in get_all_field_names(model):
+                if get_field_index(model).has_polymorphic_ctype:
+                    types_map = self.get_types_map()
                     types_pks = set([v for k, v in types_map.items() if k in types])
                     queryset = queryset.filter(polymorphic_ctype_id__in=types_pks)
                 elif model_type not in types:
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from ansible_base.lib.utils.settings import get_setting
+
+VERSION_KEY = 'dab_rest_filters:version:{}'
+RESULT_KEY = 'dab_rest_filters:result:{}'
+
+# Query parameters which select a page of the result or its format, not the rows in it
+PAGE_PARAMS = ('page', 'page_size', 'limit', 'offset', 'format', 'no_truncate', 'count_disabled')
+
+# Query parameters whose values are order sensitive
+ORDER_PARAMS = ('order', 'order_by')
+
+# Cached in place of the primary keys of results which have more than ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_MAX_ROWS rows
+TOO_MANY_ROWS = 'too many rows'
+
+HIT = 'hit'
+MISS = 'miss'
+SKIP = 'skip'
+
+
+def get_result_cache():
+    return caches[get_setting('ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_ALIAS', 'default')]
+
+
+def get_result_cache_timeout(view) -> int:
+    """
+    Returns the number of seconds to cache the results of view for, 0 if they are not cached
+
+    The timeout is ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_TIMEOUT, a view can change it or opt out with filter_result_cache_timeout.
+    Only the views using ResultCachePageNumberPagination are cached.
+    """
+    timeout = get_setting('ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_TIMEOUT', 0)
+    if not timeout:
+        return 0
+    view_timeout = getattr(view, 'filter_result_cache_timeout', None)
+    return timeout if view_timeout is None else view_timeout
+
+
+def canonical_query_params(query_params) -> list:
+    """
+    Returns the query parameters which select the rows of a list, sorted and with their values normalised
+    so that equivalent queries have the same cache key
+    """
+    params = []
+    for key, values in query_params.lists():
+        if key in PAGE_PARAMS:
+            continue
+        values = [value.strip() for value in values]
+        if key.endswith('__in'):
+            values = [','.join(sorted({item.strip() for item in value.split(',')})) for value in values]
+        if key not in ORDER_PARAMS:
+            values = sorted(values)
+        params.append([key, values])
+    return sorted(params)
+
+
+def get_path_models(field_list) -> set:
+    """
+    Returns the models whose rows decide if a lookup through the fields matches
+    """
+    models = set()
+    for field in field_list:
+        models.add(field.model)
+        if field.related_model is not None:
+            models.add(field.related_model)
+    return models
+
+
+def record_filter_models(request, models):
+    # The versions of these models are part of the result cache key
+    request = getattr(request, '_request', request)
+    request.filter_models = getattr(request, 'filter_models', set()) | set(models)
+
+
+def get_filter_models(request) -> set:
+    request = getattr(request, '_request', request)
+    return getattr(request, 'filter_models', set())
+
+
+def get_version_labels(model) -> list:
+    # A change to a row of a child model changes the row of its concrete parents too
+    model = model._meta.concrete_model
+    return [m._meta.label for m in [model] + model._meta.get_parent_list()]
+
+
+def get_model_versions(models) -> list:
+    """
+    Returns the version stamps of models, a model without a version (or whose version was evicted) gets a new one
+    """
+    cache = get_result_cache()
+    keys = sorted({VERSION_KEY.format(label) for model in models for label in get_version_labels(model)})
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Someone else may be adding it at the same time, whichever is added first wins
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_versions(models):
+    cache = get_result_cache()
+    cache.set_many({VERSION_KEY.format(label): uuid.uuid4().hex for model in models for label in get_version_labels(model)}, None)
+
+
+def invalidate_cached_results(sender, **kwargs):
+    """
+    Receiver for post_save, post_delete and m2m_changed which invalidates the cached results of lists filtered on the changed model
+    """
+    if not get_setting('ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_TIMEOUT', 0):
+        return
+    action = kwargs.get('action', None)
+    if action is not None and not action.startswith('post_'):
+        return
+
+    models = {sender}
+    if action is not None:
+        # For m2m_changed the sender is the through model
+        models.update((type(kwargs['instance']), kwargs['model']))
+    bump_model_versions(models)
+    # A request running before the transaction is committed could cache the old rows again
+    transaction.on_commit(lambda: bump_model_versions(models), using=kwargs.get('using', None))
+
+
+def is_cacheable_request(request, view) -> bool:
+    """
+    Returns True if the rows of the list requested can be served from the result cache
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # get_object() filters the queryset too, only lists are cached
+    lookup = getattr(view, 'lookup_url_kwarg', None) or getattr(view, 'lookup_field', None)
+    return lookup not in (getattr(view, 'kwargs', None) or {})
+
+
+def get_result_key(request, view, models) -> str:
+    user = getattr(request, 'user', None)
+    raw = json.dumps(
+        [
+            f'{type(view).__module__}.{type(view).__qualname__}',
+            sorted((str(key), str(value)) for key, value in (getattr(view, 'kwargs', None) or {}).items()),
+            user.pk if user is not None and user.is_authenticated else None,
+            canonical_query_params(request.query_params),
+            get_model_versions(models),
+        ]
+    )
+    return RESULT_KEY.format(hashlib.sha256(raw.encode('utf-8')).hexdigest())
+
+
+def record_result_cache(request, outcome):
+    # Reported in the X-API-Filter-Cache header by FilterStrategyMiddleware when DEBUG is on
+    request = getattr(request, '_request', request)
+    request.filter_result_cache = outcome
+
+
+class CachedResult:
+    """
+    The rows of a list whose primary keys are cached, given to the paginator in place of the queryset
+
+    It can be counted, sliced and iterated like the queryset it replaces. Only the rows which are sliced (ex. by a paginator)
+    are fetched, with a single pk__in query, and they are returned in the order of the cached primary keys.
+    """
+
+    ordered = True
+    chunk_size = 1000
+
+    def __init__(self, queryset, pks):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.pks = pks
+
+    def fetch(self, pks) -> list:
+        rows = {row.pk: row for row in self.queryset.filter(pk__in=pks)}
+        # Rows deleted since the pks were cached are left out
+        return [rows[pk] for pk in pks if pk in rows]
+
+    def count(self) -> int:
+        return len(self.pks)
+
+    def exists(self) -> bool:
+        return bool(self.pks)
+
+    def __len__(self):
+        return len(self.pks)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return self.fetch(self.pks[k])
+        rows = self.fetch([self.pks[k]])
+        if not rows:
+            raise IndexError(k)
+        return rows[0]
+
+    def __iter__(self):
+        for start in range(0, len(self.pks), self.chunk_size):
+            yield from self.fetch(self.pks[start : start + self.chunk_size])
+
+
+def get_cached_result(request, queryset, view, timeout):
+    """
+    Returns a CachedResult of the rows of queryset, caching its primary keys on the first request,
+    or queryset if it has too many rows to cache
+    """
+    cache = get_result_cache()
+    key = get_result_key(request, view, get_filter_models(request) | {queryset.model})
+    pks = cache.get(key, None)
+    if pks == TOO_MANY_ROWS:
+        record_result_cache(request, SKIP)
+        return queryset
+
+    if pks is None:
+        max_rows = get_setting('ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_MAX_ROWS', 10000)
+        # Ordering by a to-many relation can list a row more than once
+        pks = list(dict.fromkeys(queryset.values_list('pk', flat=True)[: max_rows + 1]))
+        if len(pks) > max_rows:
+            cache.set(key, TOO_MANY_ROWS, timeout)
+            record_result_cache(request, SKIP)
+            return queryset
+        cache.set(key, pks, timeout)
+        record_result_cache(request, MISS)
+    else:
+        record_result_cache(request, HIT)
+
+    # The rows are fetched from the unfiltered queryset of the view so its select_related and prefetch_related are kept
+    return CachedResult(view.get_queryset(), pks)
@@ -0,0 +1,139 @@
+from django.db import connections, router
+from django.db.backends.utils import names_digest
+from django.db.migrations.operations.base import Operation
+from django.db.models import TextField
+from django.db.models.functions import Cast, Upper
+
+from ansible_base.lib.utils.settings import get_setting
+
+# The fields of a related model which are searched by <relation>__search filters
+SEARCH_FIELD_NAMES = ('username', 'first_name', 'last_name', 'email', 'name', 'description', 'playbook')
+
+ICONTAINS_SEARCH_MODE = 'icontains'
+FULLTEXT_SEARCH_MODE = 'fulltext'
+
+TRIGRAM_SEARCH_INDEX = 'trigram'
+FULLTEXT_SEARCH_INDEX = 'fulltext'
+
+# The text search configuration has to be the same in queries and indexes for the indexes to be used
+FULLTEXT_SEARCH_CONFIG = 'simple'
+
+
+def get_search_field_names(model) -> list:
+    return [field.name for field in model._meta.fields if field.name in SEARCH_FIELD_NAMES]
+
+
+def get_search_mode(using='default') -> str:
+    """
+    Returns the search mode from ANSIBLE_BASE_REST_FILTERS_SEARCH_MODE, full-text search is only available on PostgreSQL
+    """
+    mode = get_setting('ANSIBLE_BASE_REST_FILTERS_SEARCH_MODE', None) or ICONTAINS_SEARCH_MODE
+    if mode == FULLTEXT_SEARCH_MODE and connections[using].vendor != 'postgresql':
+        return ICONTAINS_SEARCH_MODE
+    return mode
+
+
+def get_search_vector(field_paths):
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector(*field_paths, config=FULLTEXT_SEARCH_CONFIG)
+
+
+def get_fulltext_search_expression(field_paths, term):
+    """
+    Returns a boolean expression which is true if any of the words in term are in the fields at field_paths
+    """
+    from django.contrib.postgres.search import SearchQuery, SearchVectorExact
+
+    return SearchVectorExact(get_search_vector(field_paths), SearchQuery(term, config=FULLTEXT_SEARCH_CONFIG, search_type='websearch'))
+
+
+def get_search_index_name(model, suffix, *parts) -> str:
+    # Index names are limited to 30 characters
+    table = model._meta.db_table
+    return f'{table[:16]}_{names_digest(table, *parts, length=8)}_{suffix}'
+
+
+def get_search_indexes(model, kind: str, field_names=None) -> list:
+    """
+    Returns the PostgreSQL indexes which make the search filters on model fast
+
+    trigram indexes are used by the default icontains search, fulltext indexes by the fulltext search mode
+    """
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    field_names = field_names or get_search_field_names(model)
+    if kind == TRIGRAM_SEARCH_INDEX:
+        # icontains is UPPER("field"::text) LIKE UPPER('%term%') so the index has to be on the same expression
+        return [
+            GinIndex(
+                OpClass(Upper(Cast(field_name, output_field=TextField())), name='gin_trgm_ops'),
+                name=get_search_index_name(model, 'trgm', field_name),
+            )
+            for field_name in field_names
+        ]
+    elif kind == FULLTEXT_SEARCH_INDEX:
+        return [GinIndex(get_search_vector(field_names), name=get_search_index_name(model, 'fts', *field_names))]
+    raise ValueError(f'Unknown search index kind {kind}, must be {TRIGRAM_SEARCH_INDEX} or {FULLTEXT_SEARCH_INDEX}')
+
+
+class AddSearchIndexes(Operation):
+    """
+    A migration operation which creates the search indexes of a model on PostgreSQL and does nothing on other databases
+
+    The indexes are not added to the model state so they don't need to be declared in the Meta of the model.
+    Trigram indexes need the pg_trgm extension, it is created if it does not exist yet.
+    Use search_index_operations to get the operations for a migration.
+    """
+
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, model_name, kind, field_names=None):
+        self.model_name = model_name
+        self.kind = kind
+        self.field_names = field_names
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _get_indexes(self, app_label, schema_editor, from_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return None, []
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not router.allow_migrate_model(schema_editor.connection.alias, model):
+            return None, []
+        return model, get_search_indexes(model, self.kind, self.field_names)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model, indexes = self._get_indexes(app_label, schema_editor, from_state)
+        if indexes and self.kind == TRIGRAM_SEARCH_INDEX:
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for index in indexes:
+            schema_editor.add_index(model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model, indexes = self._get_indexes(app_label, schema_editor, from_state)
+        for index in indexes:
+            schema_editor.remove_index(model, index)
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'kind': self.kind}
+        if self.field_names:
+            kwargs['field_names'] = self.field_names
+        return (self.__class__.__name__, [], kwargs)
+
+    def describe(self):
+        return f"Create {self.kind} search indexes on {self.model_name}"
+
+    @property
+    def migration_name_fragment(self):
+        return f'{self.model_name.lower()}_{self.kind}_search_indexes'
+
+
+def search_index_operations(*model_names, kind: str = TRIGRAM_SEARCH_INDEX) -> list:
+    """
+    Returns the migration operations to create the search indexes for model_names, ex.
+        operations = search_index_operations('user', 'team', kind='trigram')
+    """
+    return [AddSearchIndexes(model_name, kind) for model_name in model_names]
@@ -1,8 +1,14 @@
-from django.db.models.fields.related import ForeignObjectRel
+import copy
+import threading
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import JSONField
 from django.utils.translation import gettext_lazy as _
-from rest_framework.exceptions import ParseError, PermissionDenied
+from rest_framework.exceptions import APIException, ParseError, PermissionDenied
 
-from ansible_base.lib.utils.models import get_all_field_names
+from ansible_base.lib.utils.models import get_field_index, is_json_key_path_allowed
+from ansible_base.lib.utils.settings import get_setting
 
 
 def get_fields_from_path(model, path):
@@ -16,10 +22,25 @@ def get_fields_from_path(model, path):
     for special cases we do substitutions
         ([<IntegerField for timeout>], 'project__timeout')
     """
+    field_list, new_path, _ = get_fields_and_json_keys_from_path(model, path)
+    return field_list, new_path
+
+
+def get_fields_and_json_keys_from_path(model, path):
+    """
+    Like get_fields_from_path, but the path may continue into the keys of a JSONField if the field allows filtering on them
+    Returns the fields, the revised lookup path and the JSON keys, the keys are None if the path does not end at a JSONField
+    ex., given
+        model=AuthenticatorMap
+        path='triggers__groups__has_or'
+    returns
+        ([<JSONField for triggers>], 'triggers__groups__has_or', ['groups', 'has_or'])
+    """
     # Store of all the fields used to detect repeats
     field_list = []
     new_parts = []
-    for name in path.split('__'):
+    parts = path.split('__')
+    for position, name in enumerate(parts):
         if model is None:
             raise ParseError(_('No related model for field {}.').format(name))
         # TODO: Do we want to keep these AWX specific items here?
@@ -29,7 +50,8 @@ def get_fields_from_path(model, path):
                 name, name
             )
 
-        if name == 'type' and 'polymorphic_ctype' in get_all_field_names(model):
+        index = get_field_index(model)
+        if name == 'type' and index.has_polymorphic_ctype:
             name = 'polymorphic_ctype'
             new_parts.append('polymorphic_ctype__model')
         else:
@@ -41,23 +63,30 @@ def get_fields_from_path(model, path):
             field = model._meta.pk
         else:
             name_alt = name.replace("_", "")
-            if name_alt in model._meta.fields_map.keys():
-                field = model._meta.fields_map[name_alt]
+            if name_alt in index.fields_map:
+                field = index.fields_map[name_alt]
                 new_parts.pop()
                 new_parts.append(name_alt)
             else:
                 field = model._meta.get_field(name)
-            if isinstance(field, ForeignObjectRel) and getattr(field.field, '__prevent_search__', False):
-                raise PermissionDenied(_('Filtering on %s is not allowed.' % name))
-            elif getattr(field, '__prevent_search__', False):
+            if field.name in index.prevent_search:
                 raise PermissionDenied(_('Filtering on %s is not allowed.' % name))
         if field in field_list:
             # Field traversed twice, could create infinite JOINs, DoS-ing the service
             raise ParseError(_('Loops not allowed in filters, detected on field {}.').format(field.name))
         field_list.append(field)
+
+        if isinstance(field, JSONField):
+            # The rest of the path are keys inside of the JSON
+            json_keys = parts[position + 1 :]
+            if json_keys and not is_json_key_path_allowed(field, json_keys):
+                raise PermissionDenied(_('Filtering on key {} of {} is not allowed.').format('__'.join(json_keys), field.name))
+            new_parts.extend(json_keys)
+            return field_list, '__'.join(new_parts), json_keys
+
         model = getattr(field, 'related_model', None)
 
-    return field_list, '__'.join(new_parts)
+    return field_list, '__'.join(new_parts), None
 
 
 def get_field_from_path(model, path):
@@ -69,3 +98,81 @@ def get_field_from_path(model, path):
     """
     field_list, new_path = get_fields_from_path(model, path)
     return (field_list[-1], new_path)
+
+
+def get_filterable_paths(model, depth):
+    """
+    Yields every lookup path of model which could be filtered on, following relations up to depth models deep
+    ex., given
+        model=Organization
+        depth=2
+    yields 'name', 'created_by', 'created_by__username', ...
+    """
+    for field in model._meta.get_fields():
+        # GenericForeignKeys can't be filtered on
+        if field.many_to_one and field.related_model is None:
+            continue
+        yield field.name
+        if depth > 1 and field.related_model is not None:
+            for path in get_filterable_paths(field.related_model, depth - 1):
+                yield f'{field.name}__{path}'
+
+
+class LookupCache:
+    """
+    A bounded, thread safe, least recently used cache of resolved filter lookups.
+
+    Resolving a lookup which is not allowed or does not exist raises an exception, those exceptions are cached as well
+    so the same bad lookup is not resolved again on every request.
+    The size defaults to ANSIBLE_BASE_REST_FILTERS_LOOKUP_CACHE_SIZE, setting it to 0 disables the cache.
+    """
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        if self._maxsize is None:
+            self._maxsize = get_setting('ANSIBLE_BASE_REST_FILTERS_LOOKUP_CACHE_SIZE', 1024)
+        return self._maxsize
+
+    def get(self, key, resolve, *args):
+        """
+        Returns the cached value for key, calling resolve(*args) to compute it the first time
+        """
+        if not self.maxsize:
+            return resolve(*args)
+
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            try:
+                entry = (resolve(*args), None)
+            except (APIException, FieldDoesNotExist) as e:
+                entry = (None, e)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        value, exception = entry
+        if exception is not None:
+            # Raise a copy so that the cached exception does not collect a traceback from each request
+            raise copy.copy(exception)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+lookup_cache = LookupCache()
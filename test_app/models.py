@@ -4,6 +4,7 @@ from django.db import models
 from ansible_base.lib.abstract_models import AbstractOrganization, AbstractTeam
 from ansible_base.lib.abstract_models.common import CommonModel, NamedCommonModel
 from ansible_base.lib.utils.models import user_summary_fields
+from ansible_base.resource_registry.managers import ResourceRegistryManager
 
 
 class EncryptionModel(NamedCommonModel):
@@ -17,7 +18,7 @@ class EncryptionModel(NamedCommonModel):
 
 
 class Organization(AbstractOrganization):
-    pass
+    objects = ResourceRegistryManager()
 
 
 class User(AbstractUser, CommonModel):
@@ -26,4 +27,4 @@ class User(AbstractUser, CommonModel):
 
 
 class Team(AbstractTeam):
-    pass
+    objects = ResourceRegistryManager()
@@ -0,0 +1,129 @@
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from ansible_base.authentication.management.commands.reencrypt_fields import Command
+from ansible_base.authentication.models import Authenticator
+from ansible_base.lib.utils.encryption import AESGCM_ENCRYPTION_METHOD, Fernet256
+from test_app.models import EncryptionModel
+
+old_encryption = Fernet256(secret_keys=['old'])
+new_encryption = Fernet256(secret_keys=['new', 'old'], method=AESGCM_ENCRYPTION_METHOD)
+
+
+@pytest.fixture
+def old_encrypted_objects(saml_configuration):
+    with mock.patch('ansible_base.lib.utils.encryption.ansible_encryption', old_encryption):
+        models = [EncryptionModel.objects.create(name=f'model{i}', testing1=str(i)) for i in range(5)]
+        authenticator = Authenticator.objects.create(
+            name="Test SAML Authenticator",
+            type="ansible_base.authentication.authenticator_plugins.saml",
+            configuration=saml_configuration,
+        )
+    yield models, authenticator
+    authenticator.delete()
+
+
+def assert_reencrypted(models, authenticator, saml_configuration):
+    for model in models:
+        model = EncryptionModel.objects.get(pk=model.pk)
+        assert new_encryption.is_current(model.__dict__['testing1'])
+        assert new_encryption.is_current(model.__dict__['testing2'])
+        assert model.testing1 == model.name[-1]
+        assert model.testing2 == 'b'
+
+    authenticator = Authenticator.objects.get(pk=authenticator.pk)
+    assert new_encryption.is_current(authenticator.__dict__['configuration']['SP_PRIVATE_KEY'])
+    assert authenticator.configuration['SP_PRIVATE_KEY'] == saml_configuration['SP_PRIVATE_KEY']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('extra_args', ([], ['--batch-size', '2'], ['--workers', '3', '--batch-size', '2']))
+def test_reencrypt_fields(old_encrypted_objects, saml_configuration, extra_args):
+    models, authenticator = old_encrypted_objects
+    assert old_encryption.is_current(EncryptionModel.objects.get(pk=models[0].pk).__dict__['testing1'])
+
+    out = StringIO()
+    with mock.patch('ansible_base.lib.utils.encryption.ansible_encryption', new_encryption):
+        call_command('reencrypt_fields', *extra_args, stdout=out)
+        assert_reencrypted(models, authenticator, saml_configuration)
+        assert 'test_app.EncryptionModel: finished, re-encrypted 5 of 5 rows' in out.getvalue()
+        assert 'dab_authentication.Authenticator: finished, re-encrypted 1 of 1 rows' in out.getvalue()
+
+        # Everything is current so running again changes nothing
+        out = StringIO()
+        call_command('reencrypt_fields', stdout=out)
+        assert 'test_app.EncryptionModel: finished, re-encrypted 0 of 5 rows' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_reencrypt_fields_dry_run(old_encrypted_objects):
+    models, _ = old_encrypted_objects
+
+    out = StringIO()
+    with mock.patch('ansible_base.lib.utils.encryption.ansible_encryption', new_encryption):
+        call_command('reencrypt_fields', '--dry-run', '--model', 'test_app.EncryptionModel', stdout=out)
+    assert 'test_app.EncryptionModel: 5 of 5 rows need to be re-encrypted' in out.getvalue()
+    assert 'Authenticator' not in out.getvalue()
+    assert old_encryption.is_current(EncryptionModel.objects.get(pk=models[0].pk).__dict__['testing1'])
+
+
+@pytest.mark.django_db
+def test_reencrypt_fields_resume(old_encrypted_objects, saml_configuration, tmp_path):
+    models, authenticator = old_encrypted_objects
+    state_file = str(tmp_path / 'state.json')
+
+    with mock.patch('ansible_base.lib.utils.encryption.ansible_encryption', new_encryption):
+        # Simulate being interrupted after the first batch
+        process_batch = Command.process_batch
+
+        def interrupt_after_first_batch(self, model, descriptors, batch, *args):
+            if batch[0] != models[0].pk:
+                raise KeyboardInterrupt
+            return process_batch(self, model, descriptors, batch, *args)
+
+        with mock.patch.object(Command, 'process_batch', interrupt_after_first_batch):
+            with pytest.raises(KeyboardInterrupt):
+                call_command('reencrypt_fields', '--batch-size', '2', '--state-file', state_file, '--model', 'test_app.EncryptionModel', stdout=StringIO())
+        assert new_encryption.is_current(EncryptionModel.objects.get(pk=models[1].pk).__dict__['testing1'])
+        assert old_encryption.is_current(EncryptionModel.objects.get(pk=models[2].pk).__dict__['testing1'])
+
+        out = StringIO()
+        call_command('reencrypt_fields', '--batch-size', '2', '--state-file', state_file, '-v', '2', stdout=out)
+        assert 'test_app.EncryptionModel: processed 2 rows, re-encrypted 2' in out.getvalue()
+        assert 'test_app.EncryptionModel: finished, re-encrypted 3 of 3 rows' in out.getvalue()
+        assert_reencrypted(models, authenticator, saml_configuration)
+
+        out = StringIO()
+        call_command('reencrypt_fields', '--state-file', state_file, stdout=out)
+        assert 'test_app.EncryptionModel: already re-encrypted, skipping' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_reencrypt_fields_resume_skips_done_batches(old_encrypted_objects, tmp_path):
+    models, _ = old_encrypted_objects
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(f'{{"test_app.EncryptionModel": {{"last_pk": {models[2].pk}, "rows": 3, "reencrypted": 3, "done": false}}}}')
+
+    out = StringIO()
+    with mock.patch('ansible_base.lib.utils.encryption.ansible_encryption', new_encryption):
+        call_command('reencrypt_fields', '--state-file', str(state_file), '--model', 'test_app.EncryptionModel', stdout=out)
+    assert 'test_app.EncryptionModel: finished, re-encrypted 2 of 2 rows' in out.getvalue()
+    assert old_encryption.is_current(EncryptionModel.objects.get(pk=models[0].pk).__dict__['testing1'])
+    assert new_encryption.is_current(EncryptionModel.objects.get(pk=models[4].pk).__dict__['testing1'])
+
+
+@pytest.mark.parametrize(
+    'args,message',
+    (
+        (['--model', 'test_app.Organization'], 'test_app.Organization is not a model with encrypted fields'),
+        (['--batch-size', '0'], '--batch-size must be at least 1'),
+        (['--workers', '0'], '--workers must be at least 1'),
+    ),
+)
+def test_reencrypt_fields_invalid_args(args, message):
+    with pytest.raises(CommandError) as e:
+        call_command('reencrypt_fields', *args)
+    assert message in str(e.value)
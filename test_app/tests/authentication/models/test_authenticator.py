@@ -3,6 +3,7 @@ from unittest import mock
 import pytest
 
 from ansible_base.authentication.models import Authenticator
+from ansible_base.lib.utils.encryption import ENCRYPTED_STRING
 
 
 @pytest.mark.django_db
@@ -13,3 +14,29 @@ def test_authenticator_from_db(ldap_authenticator):
     with mock.patch('ansible_base.authentication.models.authenticator.get_authenticator_plugin', side_effect=ImportError("Test Exception")):
         ldap_auth = Authenticator.objects.first()
         assert ldap_auth.configuration.get('BIND_PASSWORD', None) != 'securepassword'
+
+
+@pytest.mark.django_db
+def test_authenticator_configuration_decrypted_lazily(saml_authenticator, saml_configuration):
+    with mock.patch('ansible_base.lib.utils.encryption.Fernet256.decrypt_string') as decrypt_string:
+        authenticators = list(Authenticator.objects.all())
+        assert authenticators[0].name == saml_authenticator.name
+        decrypt_string.assert_not_called()
+
+    authenticator = Authenticator.objects.get(pk=saml_authenticator.pk)
+    assert authenticator.__dict__['configuration']['SP_PRIVATE_KEY'].startswith(ENCRYPTED_STRING)
+    assert authenticator.configuration['SP_PRIVATE_KEY'] == saml_configuration['SP_PRIVATE_KEY']
+    assert authenticator.configuration is authenticator.configuration
+
+
+@pytest.mark.django_db
+def test_authenticator_configuration_modified_in_place(saml_authenticator, saml_configuration):
+    authenticator = Authenticator.objects.get(pk=saml_authenticator.pk)
+    authenticator.configuration['SP_ENTITY_ID'] = 'new_entity'
+    authenticator.save()
+    assert authenticator.configuration['SP_PRIVATE_KEY'] == saml_configuration['SP_PRIVATE_KEY']
+
+    authenticator = Authenticator.objects.get(pk=saml_authenticator.pk)
+    assert authenticator.__dict__['configuration']['SP_PRIVATE_KEY'].startswith(ENCRYPTED_STRING)
+    assert authenticator.configuration['SP_ENTITY_ID'] == 'new_entity'
+    assert authenticator.configuration['SP_PRIVATE_KEY'] == saml_configuration['SP_PRIVATE_KEY']
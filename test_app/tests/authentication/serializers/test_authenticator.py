@@ -1,9 +1,11 @@
 from unittest import mock
 
 import pytest
+from django.urls import reverse
 from rest_framework.serializers import ValidationError
 
 from ansible_base.authentication.serializers import AuthenticatorSerializer
+from ansible_base.lib.utils.encryption import ENCRYPTED_STRING, ansible_encryption
 
 
 @pytest.mark.django_db
@@ -63,3 +65,20 @@ def test_authenticator_validate_import_error(shut_up_logging):
                     "order": 497,
                 }
             )
+
+
+def test_authenticator_list_does_not_decrypt(admin_api_client, saml_authenticator):
+    with mock.patch.object(ansible_encryption, 'decrypt_many', wraps=ansible_encryption.decrypt_many) as decrypt_many:
+        response = admin_api_client.get(reverse('authenticator-list'))
+        assert response.status_code == 200
+        decrypt_many.assert_not_called()
+    configuration = next(item['configuration'] for item in response.data['results'] if item['id'] == saml_authenticator.id)
+    assert configuration['SP_PRIVATE_KEY'] == ENCRYPTED_STRING
+    assert configuration['SP_ENTITY_ID'] == saml_authenticator.configuration['SP_ENTITY_ID']
+
+    # The detail view still goes through the plugin's to_representation, which needs the decrypted configuration
+    with mock.patch.object(ansible_encryption, 'decrypt_many', wraps=ansible_encryption.decrypt_many) as decrypt_many:
+        response = admin_api_client.get(reverse('authenticator-detail', kwargs={'pk': saml_authenticator.id}))
+        assert response.status_code == 200
+        decrypt_many.assert_called()
+    assert response.data['configuration']['SP_PRIVATE_KEY'] == ENCRYPTED_STRING
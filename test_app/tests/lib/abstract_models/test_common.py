@@ -1,8 +1,13 @@
+import datetime
 from functools import partial
+from unittest import mock
 
 import pytest
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
+from ansible_base.lib.utils.encryption import ENCRYPTED_STRING
 from test_app.models import EncryptionModel, Organization
 
 
@@ -81,3 +86,157 @@ def test_save_attribution_created_by_set_manually_and_retained(django_user_model
     random_user.refresh_from_db()
     assert random_user.created_by == user
     assert random_user.modified_by == system_user
+
+
+def _update_statements(queries):
+    return [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+
+
+@pytest.mark.django_db
+def test_save_update_fields_only_writes_requested_and_audit_columns():
+    model = EncryptionModel.objects.create(name='original', testing1='c')
+    model = EncryptionModel.objects.get(pk=model.pk)
+    original_modified_on = model.modified_on
+
+    model.name = 'renamed'
+    model.testing2 = 'z'
+    with CaptureQueriesContext(connection) as queries:
+        model.save(update_fields=['name'])
+
+    updates = _update_statements(queries.captured_queries)
+    assert len(updates) == 1
+    assert '"name"' in updates[0]
+    assert '"modified_on"' in updates[0]
+    assert '"modified_by_id"' in updates[0]
+    assert '"testing1"' not in updates[0]
+    assert '"testing2"' not in updates[0]
+
+    model.refresh_from_db()
+    assert model.name == 'renamed'
+    assert model.testing2 == 'b'
+    assert model.testing1 == 'c'
+    assert model.modified_on > original_modified_on
+
+
+@pytest.mark.django_db
+def test_save_update_fields_only_encrypts_requested_fields():
+    model = EncryptionModel.objects.create(testing1='c')
+    model = EncryptionModel.objects.get(pk=model.pk)
+    original_testing2 = model.__dict__['testing2']
+
+    model.testing1 = 'd'
+    model.save(update_fields=['testing1'])
+
+    # testing2 was not written so it was not encrypted again
+    assert model.__dict__['testing2'] == original_testing2
+    assert model.__dict__['testing1'].startswith(ENCRYPTED_STRING)
+
+    model.refresh_from_db()
+    assert model.testing1 == 'd'
+    assert model.testing2 == 'b'
+
+
+@pytest.mark.django_db
+def test_save_update_fields_keeps_explicit_modified_on():
+    model = EncryptionModel.objects.create()
+    modified_on = model.modified_on - datetime.timedelta(days=1)
+
+    model.modified_on = modified_on
+    model.save(update_fields=['modified_on'])
+
+    model.refresh_from_db()
+    assert model.modified_on == modified_on
+
+
+@pytest.mark.django_db
+def test_save_without_update_fields_writes_all_columns():
+    model = EncryptionModel.objects.create()
+    with CaptureQueriesContext(connection) as queries:
+        model.save()
+
+    updates = _update_statements(queries.captured_queries)
+    assert len(updates) == 1
+    assert '"testing1"' in updates[0]
+    assert '"name"' in updates[0]
+
+
+@pytest.mark.django_db
+def test_save_tracked_dirty_fields():
+    with mock.patch.object(EncryptionModel, 'track_dirty_fields', True):
+        model = EncryptionModel.objects.create(name='original')
+        assert model.get_dirty_fields() == []
+
+        model = EncryptionModel.objects.get(pk=model.pk)
+        assert model.get_dirty_fields() == []
+
+        model.name = 'renamed'
+        assert model.get_dirty_fields() == ['name']
+        with CaptureQueriesContext(connection) as queries:
+            model.save()
+
+        updates = _update_statements(queries.captured_queries)
+        assert len(updates) == 1
+        assert '"name"' in updates[0]
+        assert '"modified_on"' in updates[0]
+        assert '"testing1"' not in updates[0]
+        assert model.get_dirty_fields() == []
+
+        # Changing an encrypted field only re-encrypts that field
+        model.testing1 = 'q'
+        assert model.get_dirty_fields() == ['testing1']
+        testing2 = model.__dict__['testing2']
+        model.save()
+        assert model.__dict__['testing1'].startswith(ENCRYPTED_STRING)
+        assert model.__dict__['testing2'] == testing2
+        assert model.get_dirty_fields() == []
+
+        model = EncryptionModel.objects.get(pk=model.pk)
+        assert model.name == 'renamed'
+        assert model.testing1 == 'q'
+        assert model.testing2 == 'b'
+
+
+@pytest.mark.django_db
+def test_dirty_fields_not_tracked_by_default():
+    model = EncryptionModel.objects.create()
+    model = EncryptionModel.objects.get(pk=model.pk)
+    assert model.get_dirty_fields() is None
+
+
+@pytest.mark.django_db
+def test_encrypted_fields_decrypted_lazily():
+    EncryptionModel.objects.create(testing1='c')
+
+    with mock.patch('ansible_base.lib.utils.encryption.Fernet256.decrypt_string') as decrypt_string:
+        models = list(EncryptionModel.objects.all())
+        assert models[0].name == ''
+        decrypt_string.assert_not_called()
+
+    model = EncryptionModel.objects.first()
+    assert model.__dict__['testing1'].startswith(ENCRYPTED_STRING)
+    with mock.patch('ansible_base.lib.utils.encryption.Fernet256.decrypt_string', return_value='c') as decrypt_string:
+        assert model.testing1 == 'c'
+        assert model.testing1 == 'c'
+        decrypt_string.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_encrypted_fields_stay_decrypted_after_save():
+    model = EncryptionModel.objects.create(testing1='c')
+    assert model.__dict__['testing1'].startswith(ENCRYPTED_STRING)
+    assert model.testing1 == 'c'
+
+    model.testing1 = 'd'
+    model.save()
+    assert model.testing1 == 'd'
+
+    model = EncryptionModel.objects.get(pk=model.pk)
+    assert model.testing1 == 'd'
+
+
+@pytest.mark.django_db
+def test_deferred_encrypted_field():
+    EncryptionModel.objects.create(testing1='c')
+    model = EncryptionModel.objects.defer('testing1').first()
+    assert 'testing1' not in model.__dict__
+    assert model.testing1 == 'c'
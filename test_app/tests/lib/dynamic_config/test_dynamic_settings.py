@@ -1,6 +1,8 @@
 from os import path
 from textwrap import dedent
 
+import pytest
+
 from ansible_base.lib import dynamic_config
 
 
@@ -112,3 +114,29 @@ def test_filtering():
     updated_settings = get_updated_settings(additional_config)
     assert 'ansible_base.rest_filters.rest_framework.type_filter_backend.TypeFilterBackend' in updated_settings['REST_FRAMEWORK']['DEFAULT_FILTER_BACKENDS']
     assert 'something' in updated_settings['REST_FRAMEWORK']
+
+
+@pytest.mark.parametrize('debug', (True, False))
+def test_rest_filters_middleware(debug):
+    additional_config = dedent(
+        f'''
+        DEBUG = {debug}
+        INSTALLED_APPS = ['ansible_base.rest_filters']
+        MIDDLEWARE = ['something']
+    '''
+    )
+    updated_settings = get_updated_settings(additional_config)
+    # The middleware only adds debugging headers
+    expected = ['something', 'ansible_base.rest_filters.middleware.FilterStrategyMiddleware'] if debug else ['something']
+    assert updated_settings['MIDDLEWARE'] == expected
+    assert not [name for name in updated_settings if 'filter_middleware' in name]
+
+
+def test_rest_filters_middleware_without_debug():
+    additional_config = dedent(
+        '''
+        INSTALLED_APPS = ['ansible_base.rest_filters']
+    '''
+    )
+    updated_settings = get_updated_settings(additional_config)
+    assert 'MIDDLEWARE' not in updated_settings
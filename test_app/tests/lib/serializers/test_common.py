@@ -1,9 +1,11 @@
+from unittest import mock
+
 import pytest
 from crum import impersonate
 
 from ansible_base.authentication.models import AuthenticatorMap
 from ansible_base.lib.serializers.common import CommonModelSerializer
-from ansible_base.lib.utils.encryption import ENCRYPTED_STRING
+from ansible_base.lib.utils.encryption import ENCRYPTED_STRING, ansible_encryption
 from test_app.models import EncryptionModel
 from test_app.serializers import EncryptionTestSerializer
 
@@ -17,6 +19,17 @@ def test_representation_of_encrypted_fields():
     assert response['testing2'] == ENCRYPTED_STRING
 
 
+@pytest.mark.django_db
+def test_representation_of_encrypted_fields_does_not_decrypt():
+    model = EncryptionModel.objects.get(pk=EncryptionModel.objects.create(testing1='secret').pk)
+    with mock.patch.object(ansible_encryption, 'decrypt_many', wraps=ansible_encryption.decrypt_many) as decrypt_many:
+        response = EncryptionTestSerializer().to_representation(model)
+        decrypt_many.assert_not_called()
+    assert response['testing1'] == ENCRYPTED_STRING
+    # The encrypted fields still decrypt when they are read
+    assert model.testing1 == 'secret'
+
+
 @pytest.mark.django_db
 def test_update_of_encrypted_fields():
     model = EncryptionModel.objects.create()
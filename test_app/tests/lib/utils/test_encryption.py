@@ -1,6 +1,13 @@
+import base64
+
 import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from django.conf import settings
+from django.test import override_settings
+from django.utils.encoding import smart_str
 
-from ansible_base.lib.utils.encryption import ENCRYPTION_METHOD, Fernet256
+from ansible_base.lib.utils.encryption import AESGCM_ENCRYPTION_METHOD, ENCRYPTED_STRING, ENCRYPTION_METHOD, Fernet256
 
 
 def test_fernet256_encrypt_is_idempotent():
@@ -41,3 +48,130 @@ def test_fernet256_unsupported_algorithm():
     with pytest.raises(ValueError) as e:
         fernet.decrypt_string(encrypted_string)
     assert str(e.value) == "Unsupported algorithm: monkey"
+
+
+@pytest.mark.parametrize('method', (ENCRYPTION_METHOD, AESGCM_ENCRYPTION_METHOD))
+def test_fernet256_round_trip(method):
+    fernet = Fernet256(secret_keys=['new', 'old'], method=method)
+    encrypted_string = fernet.encrypt_string("test")
+    assert encrypted_string.startswith(f'{ENCRYPTED_STRING}UTF8${method}${fernet.key_id}$')
+    assert fernet.decrypt_string(encrypted_string) == "test"
+
+
+def test_fernet256_single_key_writes_legacy_strings():
+    """
+    Ensure that with a single key and AESCBC strings are written without a key id, so older code can still decrypt them
+    """
+    fernet = Fernet256()
+    encrypted_string = fernet.encrypt_string("test")
+    assert fernet.key_id not in encrypted_string
+    assert fernet.parse_encrypted_string(encrypted_string)[:2] == (ENCRYPTION_METHOD, None)
+    # What older code did to decrypt
+    b64data = encrypted_string[len(f'{ENCRYPTED_STRING}UTF8${ENCRYPTION_METHOD}$') :]
+    assert smart_str(fernet.decrypt(base64.b64decode(b64data))) == "test"
+    assert fernet.is_current(encrypted_string)
+    assert fernet.decrypt_string(encrypted_string) == "test"
+
+    # Strings written with a key id by the primary key are current too, legacy strings stop being current once there is a ring
+    assert fernet.is_current(Fernet256(secret_keys=[settings.SECRET_KEY, 'old']).encrypt_string("test"))
+    assert not Fernet256(secret_keys=[settings.SECRET_KEY, 'old']).is_current(encrypted_string)
+
+
+def test_fernet256_methods_coexist():
+    """
+    Ensure that strings encrypted with either method can be decrypted regardless of the method used for encrypting
+    """
+    cbc = Fernet256(method=ENCRYPTION_METHOD)
+    gcm = Fernet256(method=AESGCM_ENCRYPTION_METHOD)
+    assert cbc.decrypt_string(gcm.encrypt_string("test")) == "test"
+    assert gcm.decrypt_string(cbc.encrypt_string("test")) == "test"
+
+
+def test_fernet256_default_key_is_secret_key():
+    assert Fernet256().key_id == Fernet256(secret_keys=[settings.SECRET_KEY]).key_id
+
+
+def test_fernet256_legacy_string_without_key_id():
+    """
+    Ensure that strings encrypted before the key ring existed can still be decrypted by any key in the ring
+    """
+    old_fernet = Fernet256(secret_keys=['old'])
+    legacy_string = f'{ENCRYPTED_STRING}UTF8${ENCRYPTION_METHOD}${smart_str(base64.b64encode(old_fernet.encrypt(b"test")))}'
+
+    fernet = Fernet256(secret_keys=['new', 'old'])
+    assert fernet.decrypt_string(legacy_string) == "test"
+
+    with pytest.raises(InvalidToken):
+        Fernet256(secret_keys=['new']).decrypt_string(legacy_string)
+
+
+@pytest.mark.parametrize('method', (ENCRYPTION_METHOD, AESGCM_ENCRYPTION_METHOD))
+def test_fernet256_key_rotation(method):
+    old_fernet = Fernet256(secret_keys=['old'], method=method)
+    old_string = old_fernet.encrypt_string("test")
+
+    fernet = Fernet256(secret_keys=['new', 'old'], method=method)
+    new_string = fernet.encrypt_string("test")
+    assert fernet.key_id in new_string
+    assert old_fernet.key_id not in new_string
+
+    assert fernet.decrypt_string(old_string) == "test"
+    assert fernet.decrypt_string(new_string) == "test"
+
+    with pytest.raises(ValueError) as e:
+        old_fernet.decrypt_string(new_string)
+    assert str(e.value) == f"Unknown encryption key id: {fernet.key_id}"
+
+
+def test_fernet256_aesgcm_tampered_envelope():
+    fernet = Fernet256(method=AESGCM_ENCRYPTION_METHOD)
+    other = Fernet256(secret_keys=['other', settings.SECRET_KEY], method=AESGCM_ENCRYPTION_METHOD)
+    encrypted_string = fernet.encrypt_string("test")
+
+    # The key id is authenticated so swapping it for another valid key id must fail
+    with pytest.raises(InvalidTag):
+        other.decrypt_string(encrypted_string.replace(fernet.key_id, other.key_id))
+
+
+def test_fernet256_invalid_method():
+    with pytest.raises(ValueError) as e:
+        Fernet256(method='monkey')
+    assert str(e.value) == "Unsupported algorithm: monkey"
+
+
+@override_settings(ANSIBLE_BASE_ENCRYPTION_KEYS=['new', 'old'], ANSIBLE_BASE_ENCRYPTION_METHOD=AESGCM_ENCRYPTION_METHOD)
+def test_fernet256_settings():
+    fernet = Fernet256()
+    assert fernet.method == AESGCM_ENCRYPTION_METHOD
+    assert fernet.key_id == Fernet256(secret_keys=['new']).key_id
+    assert list(fernet.keys) == [fernet.key_id, Fernet256(secret_keys=['old']).key_id]
+
+
+@pytest.mark.parametrize('method', (ENCRYPTION_METHOD, AESGCM_ENCRYPTION_METHOD))
+@pytest.mark.parametrize('workers', (None, 3))
+def test_fernet256_encrypt_decrypt_many(method, workers):
+    """
+    Ensure the batch APIs keep the order of the values and match the single value APIs
+    """
+    fernet = Fernet256(secret_keys=['new', 'old'], method=method)
+    old_fernet = Fernet256(secret_keys=['old'])
+    values = [f'value{i}' for i in range(10)] + [5, '']
+
+    encrypted = fernet.encrypt_many(values, workers=workers)
+    assert len(encrypted) == len(values)
+    assert len(set(encrypted)) == len(values)
+    assert all(fernet.is_current(value) for value in encrypted)
+    assert [fernet.decrypt_string(value) for value in encrypted] == [str(value) for value in values]
+
+    # Already encrypted strings are left alone and strings encrypted by different methods and keys can be mixed
+    assert fernet.encrypt_many(encrypted, workers=workers) == encrypted
+    mixed = encrypted + [old_fernet.encrypt_string('old value'), 'not encrypted']
+    assert fernet.decrypt_many(mixed, workers=workers) == [str(value) for value in values] + ['old value', 'not encrypted']
+
+
+def test_fernet256_decrypt_many_invalid():
+    fernet = Fernet256()
+    with pytest.raises(ValueError, match='decrypt_many can only accept strings'):
+        fernet.decrypt_many(['a', 5])
+    with pytest.raises(ValueError, match='Unknown encryption key id'):
+        fernet.decrypt_many([Fernet256(secret_keys=['other', 'another']).encrypt_string('a')])
@@ -0,0 +1,24 @@
+import json
+
+from ansible_base.lib.utils.management import StateFileMixin
+
+
+def test_state_file(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    command = StateFileMixin()
+    command.state = command.load_state(state_file)
+    assert command.state == {}
+    command.state['model'] = {'last_pk': 5}
+    command.save_state()
+    assert json.loads((tmp_path / 'state.json').read_text()) == {'model': {'last_pk': 5}}
+    # The temporary file is renamed over the state file
+    assert [path.name for path in tmp_path.iterdir()] == ['state.json']
+    assert StateFileMixin().load_state(state_file) == {'model': {'last_pk': 5}}
+
+
+def test_no_state_file(tmp_path):
+    command = StateFileMixin()
+    command.state = command.load_state(None)
+    command.state['model'] = {'last_pk': 5}
+    command.save_state()
+    assert list(tmp_path.iterdir()) == []
@@ -1,6 +1,11 @@
+from unittest import mock
 from unittest.mock import MagicMock
 
+from django.apps import apps
+
+from ansible_base.authentication.models import Authenticator, AuthenticatorMap
 from ansible_base.lib.utils import models
+from test_app.models import Organization
 
 
 def test_get_type_for_model():
@@ -8,3 +13,35 @@ def test_get_type_for_model():
     dummy_model._meta.concrete_model._meta.object_name = 'SnakeCaseString'
 
     assert models.get_type_for_model(dummy_model) == 'snake_case_string'
+
+
+def test_get_field_index():
+    index = models.get_field_index(Authenticator)
+    assert {'name', 'created_by', 'configuration', 'authenticatormap'} <= index.names
+    assert 'created_by_id' in index.attnames
+    assert 'created_by_id' in index.all_names
+    assert not index.has_polymorphic_ctype
+    assert index.prevent_search == frozenset({'configuration'})
+    assert set(models.get_all_field_names(Authenticator)) == index.all_names
+
+
+def test_get_field_index_is_cached():
+    index = models.get_field_index(Authenticator)
+    with mock.patch.object(Authenticator._meta, 'get_fields') as get_fields:
+        assert models.get_field_index(Authenticator) is index
+        models.get_all_field_names(Authenticator)
+    get_fields.assert_not_called()
+
+
+def test_get_field_index_not_cached_before_apps_ready():
+    with mock.patch.object(apps, 'ready', False), mock.patch.dict(models._field_indexes, clear=True):
+        index = models.get_field_index(Organization)
+        assert Organization not in models._field_indexes
+        assert models.get_field_index(Organization) is not index
+
+
+def test_get_field_index_relation_prevent_search():
+    # The reverse relation is prevented from search along with the field it comes from
+    with mock.patch.object(AuthenticatorMap._meta.get_field('authenticator'), '__prevent_search__', True, create=True):
+        index = models.build_field_index(Authenticator)
+    assert 'authenticatormap' in index.prevent_search
@@ -0,0 +1,59 @@
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from ansible_base.resource_registry.models import Resource
+from test_app.models import Organization
+
+
+def export(*args):
+    out = StringIO()
+    call_command('export_resources', '--resource-type', 'shared.organization', *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def organizations(db):
+    return [Organization.objects.create(name=f'export {i}') for i in range(3)]
+
+
+def test_export_resources_stdout(organizations):
+    resources = [json.loads(line) for line in export().splitlines()]
+    assert [resource['name'] for resource in resources] == [organization.name for organization in organizations]
+    assert resources[0]['ansible_id'] == Resource.get_resource_for_object(organizations[0]).ansible_id
+
+
+def test_export_resources_gzip(organizations, tmp_path):
+    output = tmp_path / 'resources.ndjson.gz'
+    assert export('--output', str(output), '--gzip') == f'Exported 3 resources to {output}\n'
+    with gzip.open(output, 'rt') as f:
+        assert [json.loads(line)['name'] for line in f] == [organization.name for organization in organizations]
+
+
+def test_export_resources_resume(organizations, tmp_path):
+    output = tmp_path / 'resources.ndjson'
+    export('--output', str(output))
+    lines = output.read_text().splitlines(keepends=True)
+    # An export interrupted in the middle of the third line
+    output.write_text(''.join(lines[:2]) + lines[2][:10])
+    assert 'Exported 1 resources' in export('--output', str(output), '--resume')
+    assert output.read_text().splitlines(keepends=True) == lines
+
+
+@pytest.mark.parametrize(
+    'args,message',
+    (
+        (['--resume'], '--resume needs an uncompressed --output file'),
+        (['--output', 'x', '--gzip', '--resume'], '--resume needs an uncompressed --output file'),
+        (['--after', 'abc'], 'Resource abc does not exist'),
+        (['--chunk-size', '0'], '--chunk-size must be at least 1'),
+    ),
+)
+@pytest.mark.django_db
+def test_export_resources_invalid_args(args, message):
+    with pytest.raises(CommandError) as e:
+        call_command('export_resources', *args)
+    assert message in str(e.value)
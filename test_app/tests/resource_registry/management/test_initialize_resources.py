@@ -0,0 +1,56 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import CommandError, call_command
+
+from ansible_base.resource_registry.models import Resource, ResourceType, get_content_hash
+from ansible_base.resource_registry.shared_types import OrganizationType
+from test_app.models import Organization
+
+
+def test_initialize_resources_command(tmp_path, db):
+    organizations = [Organization.objects.create(name=f'org {i}') for i in range(3)]
+    content_type = ContentType.objects.get_for_model(Organization)
+    Resource.objects.filter(content_type=content_type).delete()
+    ResourceType.objects.filter(content_type=content_type).update(migrated=False)
+
+    # An interrupted run recorded its progress after the first organization
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'test_app.Organization': {'last_pk': organizations[0].pk, 'rows': 1}}))
+
+    out = StringIO()
+    call_command('initialize_resources', '--model', 'test_app.Organization', '--batch-size', '1', '--state-file', str(state_file), stdout=out)
+    assert f'test_app.Organization: creating Resources after primary key {organizations[0].pk}' in out.getvalue()
+    assert 'test_app.Organization: processed 3 rows' in out.getvalue()
+    assert set(Resource.objects.filter(content_type=content_type).values_list('object_id', flat=True)) == {str(o.pk) for o in organizations[1:]}
+    assert json.loads(state_file.read_text()) == {'test_app.Organization': {'last_pk': organizations[2].pk, 'rows': 3}}
+    assert ResourceType.objects.get(content_type=content_type).migrated
+
+
+def test_initialize_resources_command_backfills_content_hashes(organization):
+    Resource.objects.filter(content_type=ContentType.objects.get_for_model(Organization)).update(content_hash=None)
+
+    out = StringIO()
+    call_command('initialize_resources', '--model', 'test_app.Organization', stdout=out)
+    assert out.getvalue() == 'test_app.Organization: computed 1 content hashes\n'
+    assert Resource.get_resource_for_object(organization).content_hash == get_content_hash(organization, OrganizationType)
+
+    out = StringIO()
+    call_command('initialize_resources', '--model', 'test_app.Organization', stdout=out)
+    assert out.getvalue() == ''
+
+
+@pytest.mark.parametrize(
+    'args,message',
+    (
+        (['--model', 'test_app.EncryptionModel'], 'test_app.EncryptionModel is not a registered resource model'),
+        (['--batch-size', '0'], '--batch-size must be at least 1'),
+    ),
+)
+@pytest.mark.django_db
+def test_initialize_resources_invalid_args(args, message):
+    with pytest.raises(CommandError) as e:
+        call_command('initialize_resources', *args)
+    assert message in str(e.value)
@@ -0,0 +1,48 @@
+from io import StringIO
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import CommandError, call_command
+
+from ansible_base.resource_registry.models import Resource, get_content_hash
+from ansible_base.resource_registry.shared_types import OrganizationType
+from test_app.models import Organization
+
+
+def reconcile(*args):
+    out = StringIO()
+    call_command('reconcile_resources', '--model', 'test_app.Organization', *args, stdout=out)
+    return out.getvalue()
+
+
+def test_reconcile_resources(organization):
+    content_type = ContentType.objects.get_for_model(Organization)
+    resources = Resource.objects.filter(content_type=content_type)
+    # Drift which the signals didn't see
+    resources.filter(object_id=str(organization.pk)).update(name='stale')
+    missing = Organization.objects.create(name='missing')
+    resources.filter(object_id=str(missing.pk)).delete()
+    Resource.objects.create(content_type=content_type, object_id='999999', name='orphan')
+    unhashed = Organization.objects.create(name='unhashed')
+    resources.filter(object_id=str(unhashed.pk)).update(content_hash=None)
+
+    assert reconcile('--dry-run') == 'test_app.Organization: 1 would be created, 1 would be deleted, 1 would be renamed, 1 would be rehashed\n'
+    assert reconcile() == 'test_app.Organization: 1 created, 1 deleted, 1 renamed, 1 rehashed\n'
+    assert reconcile() == 'test_app.Organization: 0 created, 0 deleted, 0 renamed, 0 rehashed\n'
+    names = dict(resources.values_list('object_id', 'name'))
+    assert names == {str(organization.pk): organization.name, str(missing.pk): 'missing', str(unhashed.pk): 'unhashed'}
+    assert resources.get(object_id=str(unhashed.pk)).content_hash == get_content_hash(unhashed, OrganizationType)
+
+
+@pytest.mark.parametrize(
+    'args,message',
+    (
+        (['--model', 'test_app.EncryptionModel'], 'test_app.EncryptionModel is not a registered resource model'),
+        (['--batch-size', '0'], '--batch-size must be at least 1'),
+    ),
+)
+@pytest.mark.django_db
+def test_reconcile_resources_invalid_args(args, message):
+    with pytest.raises(CommandError) as e:
+        call_command('reconcile_resources', *args)
+    assert message in str(e.value)
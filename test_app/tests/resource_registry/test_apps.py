@@ -0,0 +1,118 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ansible_base.resource_registry.apps import backfill_content_hashes, create_resources, initialize_resources
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType, get_content_hash
+from ansible_base.resource_registry.shared_types import OrganizationType
+from test_app.models import Organization
+
+
+def unmigrate_organizations():
+    content_type = ContentType.objects.get_for_model(Organization)
+    Resource.objects.filter(content_type=content_type).delete()
+    ResourceType.objects.filter(content_type=content_type).update(migrated=False)
+    return ResourceType.objects.get(content_type=content_type)
+
+
+def get_resource_names():
+    return dict(Resource.objects.filter(content_type=ContentType.objects.get_for_model(Organization)).values_list('object_id', 'name'))
+
+
+def get_content_hashes():
+    return dict(Resource.objects.filter(content_type=ContentType.objects.get_for_model(Organization)).values_list('object_id', 'content_hash'))
+
+
+def test_create_resources_in_batches(db):
+    organizations = [Organization.objects.create(name=f'org {i}') for i in range(5)]
+    r_type = unmigrate_organizations()
+
+    calls = []
+    with CaptureQueriesContext(connection) as queries:
+        assert create_resources(apps, r_type, batch_size=2, progress=lambda last_pk, rows: calls.append((last_pk, rows))) == 5
+    assert calls == [(organizations[1].pk, 2), (organizations[3].pk, 4), (organizations[4].pk, 5)]
+    assert get_resource_names() == {str(organization.pk): organization.name for organization in organizations}
+    assert get_content_hashes() == {str(organization.pk): get_content_hash(organization, OrganizationType) for organization in organizations}
+    assert ResourceType.objects.get(pk=r_type.pk).migrated
+    # Only the primary key and name columns are streamed, the rows are loaded by batch to be hashed
+    select = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT') and 'FROM "test_app_organization"' in query['sql']]
+    streamed = [sql for sql in select if ' IN (' not in sql]
+    assert streamed and all('"description"' not in sql for sql in streamed)
+    assert len(select) - len(streamed) == 3
+
+
+def test_create_resources_resumes(db):
+    organizations = [Organization.objects.create(name=f'org {i}') for i in range(3)]
+    r_type = unmigrate_organizations()
+    assert create_resources(apps, r_type, batch_size=2, start_after=organizations[0].pk) == 2
+    assert set(get_resource_names()) == {str(organizations[1].pk), str(organizations[2].pk)}
+
+
+def test_initialize_resources_without_create_on_migrate(organization):
+    r_type = unmigrate_organizations()
+    with override_settings(ANSIBLE_BASE_RESOURCE_CREATE_ON_MIGRATE=False):
+        initialize_resources(sender=None)
+    assert get_resource_names() == {}
+    assert not ResourceType.objects.get(pk=r_type.pk).migrated
+
+    initialize_resources(sender=None)
+    assert get_resource_names() == {str(organization.pk): organization.name}
+
+
+def get_migration_apps(migration):
+    """
+    Returns the models after migrating dab_resource_registry back to migration, with the other apps fully migrated
+    """
+    loader = MigrationLoader(connection)
+    nodes = [node for node in loader.graph.leaf_nodes() if node[0] != 'dab_resource_registry'] + [('dab_resource_registry', migration)]
+    return loader.project_state(nodes).apps
+
+
+def test_initialize_resources_before_content_hashes(organization):
+    # migrate dab_resource_registry 0002 runs the post migrate signal with models which don't have content_hash
+    unmigrate_organizations()
+    initialize_resources(sender=None, apps=get_migration_apps('0002_resourcechange'))
+    assert get_resource_names() == {str(organization.pk): organization.name}
+    assert get_content_hashes() == {str(organization.pk): None}
+
+
+def test_initialize_resources_before_the_model_is_migrated(organization):
+    # migrate dab_resource_registry on a fresh database runs the post migrate signal before test_app is migrated
+    r_type = unmigrate_organizations()
+    initialize_resources(sender=None, apps=MigrationLoader(connection).project_state(('dab_resource_registry', '0002_resourcechange')).apps)
+    assert get_resource_names() == {}
+    assert not ResourceType.objects.get(pk=r_type.pk).migrated
+
+
+def test_backfill_content_hashes(organization):
+    resources = Resource.objects.filter(content_type=ContentType.objects.get_for_model(Organization))
+    resources.update(content_hash=None)
+    last_change = ResourceChange.objects.order_by('id').last()
+
+    # The data migration uses the historical models
+    import_module('ansible_base.resource_registry.migrations.0004_backfill_resource_content_hash').backfill_content_hashes(
+        get_migration_apps('0004_backfill_resource_content_hash'), None
+    )
+    assert get_content_hashes() == {str(organization.pk): get_content_hash(organization, OrganizationType)}
+    # Only the hashes were missing, the resources didn't change
+    assert ResourceChange.objects.order_by('id').last() == last_change
+
+
+def test_backfill_content_hashes_in_batches(db):
+    organizations = [Organization.objects.create(name=f'org {i}') for i in range(5)]
+    content_type = ContentType.objects.get_for_model(Organization)
+    Resource.objects.filter(content_type=content_type).update(content_hash=None)
+    # A Resource whose row is gone stays unhashed
+    orphan = Organization.objects.create(name='orphan')
+    Organization.objects.filter(pk=orphan.pk)._raw_delete(Organization.objects.db)
+    Resource.objects.filter(content_type=content_type, object_id=str(orphan.pk)).update(content_hash=None)
+
+    assert backfill_content_hashes(apps, ResourceType.objects.get(content_type=content_type), batch_size=2) == len(organizations)
+    hashes = get_content_hashes()
+    assert hashes.pop(str(orphan.pk)) is None
+    assert all(hashes[str(organization.pk)] == get_content_hash(organization, OrganizationType) for organization in organizations)
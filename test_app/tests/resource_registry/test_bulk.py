@@ -0,0 +1,92 @@
+import uuid
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ansible_base.resource_registry.models import Resource, ResourceChange
+from ansible_base.resource_registry.models.service_id import service_id
+from test_app.models import Organization, User
+
+URL = reverse("resource-bulk")
+
+
+def new_ansible_id():
+    return f"{service_id().split('-')[0]}:{uuid.uuid4()}"
+
+
+def test_bulk_upsert(admin_api_client, organization):
+    organization_id = Resource.get_resource_for_object(organization).ansible_id
+    other_organization_id = Resource.get_resource_for_object(Organization.objects.create(name="other org")).ansible_id
+    user_id = new_ansible_id()
+    items = [
+        {"resource_type": "shared.organization", "resource_data": {"name": "bulk org"}},
+        {"ansible_id": user_id, "resource_type": "shared.user", "resource_data": {"username": "bulk-user", "first_name": "Bulk"}},
+        {"ansible_id": organization_id, "resource_type": "shared.organization", "resource_data": {"name": "renamed org"}},
+        {"resource_type": "shared.user", "resource_data": {"first_name": "no username"}},
+        {"resource_type": "shared.team", "resource_data": {"name": "team"}},
+        {"resource_type": "shared.nothing", "resource_data": {}},
+        {"ansible_id": "not an ansible id", "resource_type": "shared.user", "resource_data": {"username": "x"}},
+        {"ansible_id": user_id, "resource_type": "shared.user", "resource_data": {"username": "again"}},
+        {"ansible_id": other_organization_id, "resource_type": "shared.user", "resource_data": {"username": "wrong type"}},
+        "not an item",
+    ]
+    response = admin_api_client.post(URL, items, format="json")
+    assert response.status_code == 200, response.data
+    results = response.data['results']
+    assert [result['status'] for result in results] == ['created', 'created', 'updated'] + ['failed'] * 7
+    assert response.data['failed'] == 7
+    assert [result['index'] for result in results] == list(range(10))
+    assert 'username' in results[3]['errors']['resource_data']
+    assert 'cannot be managed' in str(results[4]['errors'])
+    assert 'does not exist' in str(results[5]['errors'])
+    assert 'ansible_id' in results[6]['errors']
+    assert 'already used by another item' in str(results[7]['errors'])
+    assert 'is not a shared.user' in str(results[8]['errors'])
+
+    new_organization = Organization.objects.get(name="bulk org")
+    assert results[0]['ansible_id'] == Resource.get_resource_for_object(new_organization).ansible_id
+    user = User.objects.get(username="bulk-user")
+    assert user.first_name == "Bulk"
+    user_resource = Resource.get_resource_for_object(user)
+    assert user_resource.ansible_id == results[1]['ansible_id'] == user_id
+    assert user_resource.name == "bulk-user"
+    organization.refresh_from_db()
+    assert organization.name == "renamed org"
+    assert Resource.get_resource_for_object(organization).name == "renamed org"
+
+    # The changes are in the change feed with the final ansible_ids
+    changes = ResourceChange.objects.filter(resource_id=user_resource.resource_id)
+    assert list(changes.values_list('action', 'name')) == [('create', 'bulk-user')]
+
+
+def test_bulk_upsert_failures_in_a_chunk(admin_api_client, organization):
+    items = [
+        {"resource_type": "shared.organization", "resource_data": {"name": "unique"}},
+        {"resource_type": "shared.organization", "resource_data": {"name": organization.name}},
+        {"resource_type": "shared.organization", "resource_data": {"name": "unique"}},
+    ]
+    response = admin_api_client.post(URL, items, format="json")
+    assert response.status_code == 200
+    assert [result['status'] for result in response.data['results']] == ['created', 'failed', 'failed']
+    assert Organization.objects.filter(name="unique").count() == 1
+    assert Resource.objects.filter(name="unique").count() == 1
+
+
+def test_bulk_upsert_queries(admin_api_client):
+    def resource_queries(count):
+        items = [{"resource_type": "shared.organization", "resource_data": {"name": f"{count} org {i}"}} for i in range(count)]
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_api_client.post(URL, items, format="json")
+        assert response.data['failed'] == 0
+        return len([query for query in queries.captured_queries if 'dab_resource_registry' in query['sql']])
+
+    assert resource_queries(2) == resource_queries(10)
+
+
+def test_bulk_upsert_invalid_request(admin_api_client):
+    assert admin_api_client.post(URL, {"resource_type": "shared.organization"}, format="json").status_code == 400
+
+
+def test_bulk_upsert_requires_admin(user_api_client):
+    assert user_api_client.post(URL, [], format="json").status_code == 403
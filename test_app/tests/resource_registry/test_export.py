@@ -0,0 +1,74 @@
+import gzip
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ansible_base.resource_registry.export import export_resources
+from ansible_base.resource_registry.models import Resource
+from test_app.models import Organization
+
+URL = reverse("resource-export")
+
+
+def read_export(response):
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+    content = b''.join(response.streaming_content)
+    if response.get('Content-Encoding') == 'gzip':
+        content = gzip.decompress(content)
+    return [json.loads(line) for line in content.decode('utf-8').splitlines()]
+
+
+def test_export(admin_api_client, organization, local_authenticator):
+    resources = read_export(admin_api_client.get(URL))
+    assert len(resources) == Resource.objects.count()
+    # Grouped by resource type
+    types = [resource['resource_type'] for resource in resources]
+    assert types == sorted(types, key=lambda name: types.index(name))
+
+    exported = {resource['object_id']: resource for resource in resources if resource['resource_type'] == 'shared.organization'}
+    assert exported[str(organization.pk)]['resource_data'] == {'name': organization.name}
+    assert exported[str(organization.pk)]['ansible_id'] == Resource.get_resource_for_object(organization).ansible_id
+    # Resources without a managed serializer have no data
+    authenticator = next(resource for resource in resources if resource['resource_type'] == 'aap.authenticator')
+    assert authenticator['resource_data'] == {}
+
+
+def test_export_gzip_and_filter(admin_api_client, organization):
+    response = admin_api_client.get(URL, data={'resource_type': 'shared.organization'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert response['Content-Encoding'] == 'gzip'
+    resources = read_export(response)
+    assert {resource['resource_type'] for resource in resources} == {'shared.organization'}
+    assert organization.name in {resource['name'] for resource in resources}
+
+
+def test_export_resume(admin_api_client, organization):
+    for i in range(4):
+        Organization.objects.create(name=f'export {i}')
+    resources = read_export(admin_api_client.get(URL))
+    resumed = read_export(admin_api_client.get(URL, data={'after': resources[2]['ansible_id']}))
+    assert resumed == resources[3:]
+
+    # The position of a resource deleted since is found in the change feed
+    deleted = next(resource for resource in resources if resource['name'] == 'export 1')
+    Organization.objects.filter(name='export 1').delete()
+    index = resources.index(deleted)
+    assert read_export(admin_api_client.get(URL, data={'after': deleted['ansible_id']})) == resources[index + 1 :]
+
+
+def test_export_invalid_params(admin_api_client):
+    assert admin_api_client.get(URL, data={'after': 'abc'}).status_code == 400
+    assert admin_api_client.get(URL, data={'after': '12345678:57289235-e68e-4abf-8e50-f868f9e5ff04'}).status_code == 400
+    assert admin_api_client.get(URL, data={'resource_type': 'shared.nothing'}).status_code == 400
+
+
+def test_export_fetches_content_objects_in_chunks(organization):
+    for i in range(5):
+        Organization.objects.create(name=f'chunk {i}')
+    with CaptureQueriesContext(connection) as queries:
+        lines = list(export_resources(resource_type_names=['shared.organization'], chunk_size=2))
+    assert len(lines) == Organization.objects.count()
+    organization_queries = [query for query in queries.captured_queries if 'FROM "test_app_organization"' in query['sql']]
+    assert len(organization_queries) == -(-len(lines) // 2)
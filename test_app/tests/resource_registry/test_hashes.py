@@ -0,0 +1,127 @@
+from django.urls import reverse
+
+from ansible_base.resource_registry.bulk import upsert_resources
+from ansible_base.resource_registry.hashes import hash_bucket
+from ansible_base.resource_registry.models import Resource, get_content_hash
+from ansible_base.resource_registry.shared_types import OrganizationType, UserType
+from test_app.models import Organization, User
+
+URL = reverse("resource-hashes")
+
+
+def get_content_hash_of(obj):
+    return Resource.get_resource_for_object(obj).content_hash
+
+
+def shared_pairs():
+    resources = Resource.objects.filter(content_type__resource_type__name__startswith='shared.').order_by('resource_id')
+    return [(resource.ansible_id, resource.content_hash) for resource in resources]
+
+
+def test_content_hash_kept_current(organization, user):
+    assert get_content_hash_of(organization) == get_content_hash(organization, OrganizationType)
+    assert get_content_hash_of(user) == get_content_hash(user, UserType)
+
+    # Fields the managed serializer doesn't have don't change the hash
+    content_hash = get_content_hash_of(organization)
+    organization.description = 'changed'
+    organization.save()
+    assert get_content_hash_of(organization) == content_hash
+
+    user.email = 'changed@example.com'
+    user.save()
+    assert get_content_hash_of(user) == get_content_hash(User.objects.get(pk=user.pk), UserType)
+
+
+def test_content_hash_kept_current_by_bulk_operations(organization):
+    Organization.objects.filter(pk=organization.pk).update(name='updated')
+    organization.refresh_from_db()
+    resource = Resource.get_resource_for_object(organization)
+    assert (resource.name, resource.content_hash) == ('updated', get_content_hash(organization, OrganizationType))
+
+    timestamps = {'created_on': organization.created_on, 'modified_on': organization.modified_on}
+    organizations = Organization.objects.bulk_create([Organization(name=f'bulk {i}', **timestamps) for i in range(2)])
+    for obj in organizations:
+        assert get_content_hash_of(obj) == get_content_hash(obj, OrganizationType)
+
+    ansible_id = Resource.get_resource_for_object(organization).ansible_id
+    results = upsert_resources([{"ansible_id": ansible_id, "resource_type": "shared.organization", "resource_data": {"name": "upserted"}}])
+    assert results[0]['status'] == 'updated'
+    organization.refresh_from_db()
+    assert get_content_hash_of(organization) == get_content_hash(organization, OrganizationType)
+
+
+def test_hashes(admin_api_client, organization, user, local_authenticator):
+    response = admin_api_client.get(URL)
+    assert response.status_code == 200
+    assert response.data['next'] is None
+    pairs = [(pair['ansible_id'], pair['content_hash']) for pair in response.data['results']]
+    # Only the shared resources, ordered by resource_id
+    assert pairs == shared_pairs()
+    assert (Resource.get_resource_for_object(organization).ansible_id, get_content_hash_of(organization)) in pairs
+
+    response = admin_api_client.get(URL, data={'resource_type': 'shared.organization'})
+    assert [pair['ansible_id'] for pair in response.data['results']] == [Resource.get_resource_for_object(organization).ansible_id]
+
+
+def test_hashes_paging(admin_api_client, organization):
+    for i in range(4):
+        Organization.objects.create(name=f'hashes {i}')
+    pairs = []
+    url = URL + '?page_size=2'
+    while url:
+        response = admin_api_client.get(url)
+        assert len(response.data['results']) <= 2
+        pairs += [(pair['ansible_id'], pair['content_hash']) for pair in response.data['results']]
+        url = response.data['next']
+    assert pairs == shared_pairs()
+
+
+def test_hashes_buckets(admin_api_client, organization):
+    for i in range(20):
+        Organization.objects.create(name=f'bucket {i}')
+    pairs = shared_pairs()
+
+    response = admin_api_client.get(URL, data={'depth': 1})
+    assert response.status_code == 200
+    buckets = response.data['buckets']
+    assert sum(bucket['count'] for bucket in buckets) == len(pairs)
+    bucket = buckets[0]
+    members = [pair for pair in pairs if pair[0].split(':')[1].startswith(bucket['prefix'])]
+    assert bucket['hash'] == hash_bucket(members)
+
+    # Drill down into a bucket, then list the pairs in it
+    response = admin_api_client.get(URL, data={'depth': 3, 'prefix': bucket['prefix']})
+    assert sum(sub_bucket['count'] for sub_bucket in response.data['buckets']) == bucket['count']
+    assert all(sub_bucket['prefix'].startswith(bucket['prefix']) for sub_bucket in response.data['buckets'])
+    response = admin_api_client.get(URL, data={'prefix': bucket['prefix']})
+    assert [(pair['ansible_id'], pair['content_hash']) for pair in response.data['results']] == members
+
+    # A changed resource changes the hash of its bucket only
+    changed = Organization.objects.get(name='bucket 0')
+    changed_prefix = Resource.get_resource_for_object(changed).resource_id.hex[:1]
+    changed.name = 'changed'
+    changed.save()
+    after = {bucket['prefix']: bucket['hash'] for bucket in admin_api_client.get(URL, data={'depth': 1}).data['buckets']}
+    before = {bucket['prefix']: bucket['hash'] for bucket in buckets}
+    assert {prefix for prefix in before if before[prefix] != after[prefix]} == {changed_prefix}
+
+
+def test_hashes_invalid_params(admin_api_client):
+    for params, field in (
+        ({'prefix': 'xyz'}, 'prefix'),
+        ({'prefix': '0' * 9}, 'prefix'),
+        ({'depth': 0}, 'depth'),
+        ({'depth': 4}, 'depth'),
+        ({'depth': 2, 'prefix': 'ab'}, 'depth'),
+        ({'depth': 'a'}, 'depth'),
+        ({'after': 'nope'}, 'after'),
+        ({'resource_type': 'shared.nothing'}, 'resource_type'),
+    ):
+        response = admin_api_client.get(URL, data=params)
+        assert response.status_code == 400, params
+        assert field in response.data, params
+
+
+def test_hashes_requires_admin(user_api_client):
+    assert user_api_client.get(URL).status_code == 403
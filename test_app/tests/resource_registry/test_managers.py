@@ -0,0 +1,73 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from ansible_base.resource_registry.managers import update_resource_names
+from ansible_base.resource_registry.models import Resource
+from test_app.models import Organization, Team
+
+
+def new_organization(name):
+    # bulk_create doesn't call save(), which sets the audit columns
+    return Organization(name=name, created_on=now(), modified_on=now())
+
+
+def get_resources(model):
+    return Resource.objects.filter(content_type=ContentType.objects.get_for_model(model))
+
+
+def get_resource_names(model):
+    return dict(get_resources(model).values_list('object_id', 'name'))
+
+
+def test_bulk_create(db):
+    organizations = Organization.objects.bulk_create([new_organization(f'bulk {i}') for i in range(3)])
+    assert get_resource_names(Organization) == {str(organization.pk): organization.name for organization in organizations}
+
+
+def test_bulk_create_ignore_conflicts(organization):
+    Organization.objects.bulk_create([new_organization(organization.name), new_organization('new')], ignore_conflicts=True)
+    new = Organization.objects.get(name='new')
+    assert get_resource_names(Organization) == {str(organization.pk): organization.name, str(new.pk): 'new'}
+
+
+def test_bulk_update(db):
+    organizations = Organization.objects.bulk_create([new_organization(f'bulk {i}') for i in range(3)])
+    for organization in organizations:
+        organization.name = f'{organization.name} renamed'
+    with CaptureQueriesContext(connection) as queries:
+        Organization.objects.bulk_update(organizations, ['name'])
+    resource_updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "dab_resource_registry_resource"')]
+    assert len(resource_updates) == 1
+    assert set(get_resource_names(Organization).values()) == {'bulk 0 renamed', 'bulk 1 renamed', 'bulk 2 renamed'}
+
+
+def test_update(organization):
+    Organization.objects.filter(pk=organization.pk).update(name='updated')
+    assert get_resource_names(Organization) == {str(organization.pk): 'updated'}
+    # Updates which don't change the name leave the Resources alone
+    with CaptureQueriesContext(connection) as queries:
+        Organization.objects.filter(name='updated').update(description='changed')
+    assert not [query for query in queries.captured_queries if 'dab_resource_registry_resource' in query['sql']]
+
+
+def test_update_changing_the_filtered_rows(organization):
+    Organization.objects.filter(name=organization.name).update(name='moved')
+    assert get_resource_names(Organization) == {str(organization.pk): 'moved'}
+
+
+def test_delete(organization):
+    team = Team.objects.create(name='team', organization=organization)
+    Organization.objects.create(name='kept')
+    Organization.objects.filter(pk=organization.pk).delete()
+    assert set(get_resource_names(Organization).values()) == {'kept'}
+    # The Resources of rows deleted by a cascade are deleted by their signal receivers
+    assert not get_resources(Team).filter(object_id=str(team.pk)).exists()
+
+
+def test_update_resource_names(organization):
+    Resource.objects.filter(object_id=str(organization.pk), content_type=ContentType.objects.get_for_model(Organization)).update(name='stale')
+    assert update_resource_names(Organization) == 1
+    assert update_resource_names(Organization) == 0
+    assert get_resource_names(Organization) == {str(organization.pk): organization.name}
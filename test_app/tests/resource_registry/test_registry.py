@@ -0,0 +1,95 @@
+from unittest import mock
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.schemas.generators import BaseSchemaGenerator
+
+from ansible_base.authentication.models import Authenticator
+from ansible_base.resource_registry.models import Resource, ResourceType
+from ansible_base.resource_registry.registry import (
+    ResourceConfig,
+    ResourceInspector,
+    clear_registry,
+    get_registry,
+    get_resource_config,
+    get_resource_inspector,
+)
+from test_app.models import Organization
+
+
+def test_registry_is_built_once():
+    registry = get_registry()
+    assert get_registry() is registry
+    assert set(registry.get_resources().keys()) == {'test_app.User', 'test_app.Team', 'test_app.Organization', 'dab_authentication.Authenticator'}
+
+    clear_registry()
+    assert get_registry() is not registry
+    assert get_registry().get_resources().keys() == registry.get_resources().keys()
+
+
+def test_registry_without_config_module():
+    with override_settings():
+        from django.conf import settings
+
+        del settings.ANSIBLE_BASE_RESOURCE_CONFIG_MODULE
+        assert get_registry() is False
+
+
+def test_resource_config_does_not_inspect_endpoints():
+    with mock.patch.object(ResourceInspector, '__init__', side_effect=AssertionError('inspected')):
+        config = ResourceConfig(Organization)
+    assert config.model_label == 'test_app.Organization'
+
+
+def test_resource_inspector_is_built_once():
+    ResourceInspector.clear_instance()
+
+    def no_endpoints(generator):
+        generator.endpoints = []
+
+    with mock.patch.object(BaseSchemaGenerator, '_initialise_endpoints', autospec=True, side_effect=no_endpoints) as initialise_endpoints:
+        for resource in get_registry().get_resources().values():
+            assert resource.actions == {}
+        get_resource_inspector()
+    assert initialise_endpoints.call_count == 1
+    ResourceInspector.clear_instance()
+
+    actions = get_registry().get_config_for_model(model=Authenticator).actions
+    assert ('GET', '/api/v1/authenticators/{pk}/') in actions['retrieve']
+    assert get_resource_inspector() is get_resource_inspector()
+
+
+def test_resource_inspector_is_cleared_with_the_url_conf():
+    inspector = get_resource_inspector()
+    with override_settings(ROOT_URLCONF='test_app.urls'):
+        assert get_resource_inspector() is not inspector
+
+
+def test_get_resource_config():
+    assert get_resource_config('test_app.Organization') is get_registry().get_config_for_model(model=Organization)
+    with override_settings():
+        from django.conf import settings
+
+        del settings.ANSIBLE_BASE_RESOURCE_CONFIG_MODULE
+        with pytest.raises(ImproperlyConfigured):
+            get_resource_config('test_app.Organization')
+
+
+def test_loading_resource_types_does_not_use_the_registry(organization):
+    with mock.patch('ansible_base.resource_registry.registry.get_registry', side_effect=AssertionError('registry used')):
+        resources = list(Resource.objects.select_related('content_type__resource_type'))
+        resource_types = list(ResourceType.objects.all())
+    assert resources and resource_types
+    assert resource_types[0].get_resource_config() is get_registry().get_config_for_model(model=resource_types[0].content_type.model_class())
+
+
+def test_resources_list_builds_no_registry(admin_api_client, organization):
+    get_registry()
+    get_resource_inspector()
+    with mock.patch('ansible_base.resource_registry.registry.ResourceRegistry.__init__', side_effect=AssertionError('registry built')):
+        with mock.patch.object(ResourceInspector, '__init__', side_effect=AssertionError('inspected')):
+            response = admin_api_client.get(reverse('resource-list'))
+    assert response.status_code == 200
+    assert response.data['count'] > 0
@@ -0,0 +1,138 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Max
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+from ansible_base.resource_registry.managers import update_resource_names
+from ansible_base.resource_registry.models import Resource, ResourceChange
+from test_app.models import Organization
+
+
+@pytest.fixture
+def since(db):
+    return ResourceChange.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+
+@pytest.fixture
+def no_lag():
+    # Every change is settled as soon as it is recorded
+    with override_settings(ANSIBLE_BASE_RESOURCE_CHANGE_FEED_LAG=0):
+        yield
+
+
+def get_changes(client, **params):
+    response = client.get(reverse("resource-changes"), data=params)
+    assert response.status_code == 200
+    return response.data
+
+
+def test_resource_changes(admin_api_client, since, no_lag):
+    organization = Organization.objects.create(name='changes')
+    ansible_id = Resource.get_resource_for_object(organization).ansible_id
+    organization.name = 'renamed'
+    organization.save()
+    organization.delete()
+
+    data = get_changes(admin_api_client, since=since)
+    assert [(change['action'], change['name'], change['ansible_id'], change['resource_type']) for change in data['results']] == [
+        ('create', 'changes', ansible_id, 'shared.organization'),
+        ('update', 'renamed', ansible_id, 'shared.organization'),
+        ('delete', 'renamed', ansible_id, 'shared.organization'),
+    ]
+    assert data['next'] is None
+    assert data['last_id'] == data['results'][-1]['id']
+
+    # Polling again from the last change returns nothing new
+    data = get_changes(admin_api_client, since=data['last_id'])
+    assert data['results'] == []
+    assert data['last_id'] == since + 3
+
+
+def test_resource_changes_pages(admin_api_client, since, no_lag):
+    for i in range(5):
+        Organization.objects.create(name=f'page {i}')
+
+    names = []
+    params = {'since': since, 'page_size': 2}
+    while True:
+        data = get_changes(admin_api_client, **params)
+        names.extend(change['name'] for change in data['results'])
+        if not data['next']:
+            break
+        assert f"since={data['last_id']}" in data['next']
+        params['since'] = data['last_id']
+    assert names == [f'page {i}' for i in range(5)]
+
+
+def test_resource_changes_watermark(admin_api_client, since):
+    for i in range(2):
+        Organization.objects.create(name=f'watermark {i}')
+    first_change = ResourceChange.objects.get(id=since + 1)
+    # The first change is recorded by a transaction which didn't commit yet
+    first_change.delete()
+
+    data = get_changes(admin_api_client, since=since)
+    assert [change['name'] for change in data['results']] == ['watermark 1']
+    # The recent changes are returned again by the next poll
+    assert data['last_id'] == since
+    assert data['next'] is None
+
+    # The first change is committed, it is read by the next poll
+    first_change.id = since + 1
+    first_change.save(force_insert=True)
+    data = get_changes(admin_api_client, since=data['last_id'])
+    assert [change['name'] for change in data['results']] == ['watermark 0', 'watermark 1']
+    assert data['last_id'] == since
+
+    # Once they settled the watermark moves past them
+    ResourceChange.objects.filter(id__gt=since).update(changed_on=now() - timedelta(minutes=2))
+    data = get_changes(admin_api_client, since=since)
+    assert data['last_id'] == since + 2
+    assert data['first_id'] == ResourceChange.objects.order_by('id').first().id
+
+
+def test_prune_resource_changes(admin_api_client, since, no_lag):
+    for i in range(3):
+        Organization.objects.create(name=f'prune {i}')
+    ResourceChange.objects.filter(id__lte=since + 2).update(changed_on=now() - timedelta(days=31))
+    expected = ResourceChange.objects.filter(id__lte=since + 2).count()
+
+    out = StringIO()
+    call_command('prune_resource_changes', '--batch-size', '1', stdout=out)
+    assert out.getvalue() == f'Deleted {expected} resource changes older than 30 days\n'
+    assert list(ResourceChange.objects.values_list('name', flat=True)) == ['prune 2']
+
+    # A client which polled before the pruned changes can tell it missed some
+    data = get_changes(admin_api_client, since=since)
+    assert data['first_id'] == since + 3 > since + 1
+
+
+@pytest.mark.parametrize('params', ({'since': 'abc'}, {'since': -1}, {'page_size': 'x'}))
+def test_resource_changes_invalid_params(admin_api_client, params):
+    response = admin_api_client.get(reverse("resource-changes"), data=params)
+    assert response.status_code == 400
+
+
+def test_resource_changes_requires_admin(user_api_client):
+    assert user_api_client.get(reverse("resource-changes")).status_code == 403
+
+
+def test_bulk_operations_record_changes(since):
+    organizations = Organization.objects.bulk_create([Organization(name=f'bulk {i}', created_on=now(), modified_on=now()) for i in range(3)])
+    for organization in organizations:
+        organization.name = organization.name.replace('bulk', 'renamed')
+    Organization.objects.bulk_update(organizations, ['name'])
+    # Drift which isn't recorded until it is repaired
+    Resource.objects.filter(name__startswith='renamed').update(name='stale')
+    assert update_resource_names(Organization) == 3
+    Organization.objects.filter(name__startswith='renamed').delete()
+
+    actions = list(ResourceChange.objects.filter(id__gt=since).values_list('action', 'name'))
+    assert actions == (
+        [('create', f'bulk {i}') for i in range(3)] + [('update', f'renamed {i}') for i in range(3)] * 2 + [('delete', f'renamed {i}') for i in range(3)]
+    )
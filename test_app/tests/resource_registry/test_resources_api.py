@@ -2,9 +2,12 @@ import uuid
 
 import pytest
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ansible_base.resource_registry.models import Resource
+from ansible_base.resource_registry.serializers import ResourceSerializer
 from test_app.models import EncryptionModel, Organization, Team
 
 
@@ -218,3 +221,39 @@ def test_resources_create_invalid(admin_api_client, resource):
     response = admin_api_client.post(url, resource["data"], format="json")
     assert response.status_code == 400
     assert resource["field_name"] in response.data
+
+
+def test_resources_list_query_count(admin_api_client, organization, local_authenticator):
+    url = reverse("resource-list")
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_api_client.get(url)
+        assert response.status_code == 200
+        return len(queries.captured_queries), response
+
+    count, response = count_queries()
+    results = {(resource['resource_type'], resource['object_id']): resource for resource in response.data['results']}
+    authenticator = results[('aap.authenticator', str(local_authenticator.pk))]
+    assert authenticator['url'] == reverse("resource-detail", kwargs={"ansible_id": authenticator['ansible_id']})
+    assert authenticator['detail_url'] == reverse("authenticator-detail", kwargs={"pk": local_authenticator.pk})
+    assert authenticator['has_serializer'] is False
+    assert results[('shared.organization', str(organization.pk))]['has_serializer'] is True
+
+    for i in range(5):
+        Organization.objects.create(name=f'more {i}')
+        Team.objects.create(name=f'more {i}', organization=organization)
+    assert count_queries()[0] == count
+
+
+def test_resource_serializer_many_prefetches_content_objects(organization):
+    for i in range(5):
+        Team.objects.create(name=f'team {i}', organization=organization)
+    resources = Resource.objects.select_related("content_type__resource_type").order_by('pk')
+
+    with CaptureQueriesContext(connection) as queries:
+        data = ResourceSerializer(resources, many=True).data
+    # The resources, then the organizations, teams, users and authenticators with one query each
+    assert len(queries.captured_queries) <= 5
+    team_data = [resource['resource_data'] for resource in data if resource['resource_type'] == 'shared.team']
+    assert sorted(team['name'] for team in team_data) == [f'team {i}' for i in range(5)]
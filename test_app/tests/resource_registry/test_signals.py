@@ -0,0 +1,47 @@
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+
+from ansible_base.authentication.models import AuthenticatorMap
+from ansible_base.resource_registry.models import Resource, ResourceChange
+from ansible_base.resource_registry.registry import ResourceConfig, SharedResource, get_resource_config
+from ansible_base.resource_registry.signals.handlers import get_resource_models, update_resource
+from test_app.models import Organization, Team
+
+
+def resource_queries(queries):
+    return [query['sql'] for query in queries.captured_queries if '"dab_resource_registry_resource"' in query['sql']]
+
+
+def test_receivers_only_for_registered_models():
+    assert {Organization, Team, AuthenticatorMap} & get_resource_models() == {Organization, Team}
+    assert update_resource in post_save._live_receivers(Organization)
+    assert update_resource not in post_save._live_receivers(AuthenticatorMap)
+
+
+def test_name_change_is_a_single_update(organization):
+    organization.name = 'renamed'
+    with CaptureQueriesContext(connection) as queries:
+        organization.save()
+    # The resource is only read back to record the change
+    assert [sql.split(' ')[0] for sql in resource_queries(queries)] == ['UPDATE', 'SELECT']
+    resource = Resource.get_resource_for_object(organization)
+    assert resource.name == 'renamed'
+    assert ResourceChange.objects.filter(resource_id=resource.resource_id, action='update').last().name == 'renamed'
+
+
+def test_unchanged_name_updates_nothing(organization):
+    organization.description = 'changed'
+    with CaptureQueriesContext(connection) as queries:
+        organization.save()
+    assert [sql for sql in resource_queries(queries) if not sql.startswith('UPDATE')] == []
+    config = get_resource_config('test_app.Organization')
+    shared_resource = SharedResource(serializer=config.managed_serializer, is_provider=not config.externally_managed)
+    assert Resource.update_from_object(organization, config) == 0
+    assert Resource.update_from_object(organization, ResourceConfig(Organization, name_field='not_a_field', shared_resource=shared_resource)) == 0
+
+
+def test_delete_removes_the_resource(organization):
+    resource = Resource.get_resource_for_object(organization)
+    Organization.objects.filter(pk=organization.pk).delete()
+    assert not Resource.objects.filter(pk=resource.pk).exists()
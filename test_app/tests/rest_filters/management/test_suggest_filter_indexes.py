@@ -0,0 +1,76 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+SAMPLE = '''127.0.0.1 - - [19/Oct/2026:09:00:00 +0000] "GET /api/v1/authenticators/?name__icontains=foo&order_by=-created_on HTTP/1.1" 200 10
+/api/v1/authenticators/?order_by=-created_on,name
+/api/v1/users/?chain__not__first_name=bob&order=last_name
+/api/v1/users/?first_name__icontains=bo&first_name__iregex=^b
+/api/v1/authenticator_maps/?authenticator__created_on__gt=2026-01-01
+/api/v1/users/?page_size=5
+/api/v1/nowhere/?a=b
+'''
+
+
+@pytest.fixture
+def sample(tmp_path):
+    sample = tmp_path / 'sample.log'
+    sample.write_text(SAMPLE)
+    return str(sample)
+
+
+def get_suggestions(*args):
+    out = StringIO()
+    call_command('suggest_filter_indexes', *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_suggest_filter_indexes_from_sample(sample):
+    lines = get_suggestions('--sample', sample).splitlines()
+    assert lines[0] == 'Suggested indexes, ranked by requests x estimated cost:'
+    summaries = [line.split(',')[0] for line in lines if not line.startswith(' ')][1:]
+    # created_on is ordered on twice and filtered on across a join
+    assert summaries == [
+        'dab_authentication.Authenticator.created_on: score 10 from 3 requests',
+        'test_app.User.first_name: score 9 from 3 requests',
+        'test_app.User.last_name: score 3 from 1 requests',
+    ]
+    output = '\n'.join(lines)
+    assert "models.Index(fields=['created_on'], name='dab_authent_created_be70f7_idx')" in output
+    assert '# lookups: exact (1), icontains (1), iregex (1)' in output
+    assert "consider search_index_operations(kind='trigram')" in output
+    # name is unique so it already has an index
+    assert 'Authenticator.name' not in output
+
+
+@pytest.mark.django_db
+def test_suggest_filter_indexes_without_sample():
+    output = get_suggestions('--limit', '0', '--depth', '1')
+    assert 'test_app.User.first_name: score 3 from 1 requests, used by user-list as first_name' in output
+    # Primary keys, foreign keys and unique columns are indexed
+    for indexed in ('User.id', 'User.username', 'Authenticator.name', 'AuthenticatorMap.authenticator'):
+        assert f'{indexed}:' not in output
+    # JSON fields are skipped
+    assert 'Authenticator.configuration' not in output
+
+
+@pytest.mark.django_db
+def test_suggest_filter_indexes_include_unused(sample):
+    assert 'test_app.User.email' not in get_suggestions('--sample', sample, '--limit', '0')
+    assert 'test_app.User.email: score 0 from 0 requests' in get_suggestions('--sample', sample, '--limit', '0', '--include-unused')
+
+
+@pytest.mark.parametrize(
+    'args,message',
+    (
+        (['--depth', '0'], '--depth must be at least 1'),
+        (['--sample', '/does/not/exist'], 'Unable to read /does/not/exist'),
+    ),
+)
+@pytest.mark.django_db
+def test_suggest_filter_indexes_invalid_args(args, message):
+    with pytest.raises(CommandError) as e:
+        call_command('suggest_filter_indexes', *args)
+    assert message in str(e.value)
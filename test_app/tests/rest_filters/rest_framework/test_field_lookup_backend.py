@@ -1,12 +1,18 @@
+from unittest import mock
 from unittest.mock import MagicMock, Mock
 
 import pytest
-from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.core.exceptions import FieldDoesNotExist, FieldError, ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from rest_framework.exceptions import ParseError, PermissionDenied
 
-from ansible_base.authentication.models import Authenticator, AuthenticatorMap
+from ansible_base.authentication.models import Authenticator, AuthenticatorMap, AuthenticatorUser
 from ansible_base.authentication.views import AuthenticatorViewSet
 from ansible_base.rest_filters.rest_framework.field_lookup_backend import FieldLookupBackend
+from ansible_base.rest_filters.utils import get_fields_and_json_keys_from_path, lookup_cache
 
 
 def test_filters_related():
@@ -69,6 +75,8 @@ def test_invalid_iexact():
 def test_filter_on_password_field(lookup_suffix):
     # Make the type field of Authenticator a PASSWORD_FIELD
     setattr(Authenticator, 'PASSWORD_FIELDS', ('type'))
+    # Resolved lookups are cached so they have to be cleared when a model changes at runtime
+    lookup_cache.clear()
     field_lookup = FieldLookupBackend()
     lookup = '__'.join(filter(None, ['type', lookup_suffix]))
     with pytest.raises(PermissionDenied) as excinfo:
@@ -152,3 +160,156 @@ def test_filter_queryset(query):
     request.query_params.lists.return_value = iterator
 
     filter.filter_queryset(request, AuthenticatorMap.objects.all(), AuthenticatorViewSet)
+
+
+def test_resolved_lookups_are_cached():
+    field_lookup = FieldLookupBackend()
+    with mock.patch(
+        'ansible_base.rest_filters.rest_framework.field_lookup_backend.get_fields_and_json_keys_from_path', wraps=get_fields_and_json_keys_from_path
+    ) as resolve:
+        lookup_cache.clear()
+        assert field_lookup.resolve_lookup(AuthenticatorMap, 'authenticator__name__icontains')[1:] == ('authenticator__name__icontains', True, None)
+        # Only the suffix differs so the path is not resolved again
+        assert field_lookup.resolve_lookup(AuthenticatorMap, 'authenticator__name')[1:] == ('authenticator__name__exact', True, None)
+        assert field_lookup.resolve_lookup(Authenticator, 'name__startswith')[1:] == ('name__startswith', False, None)
+        assert resolve.call_count == 2
+
+        # Forbidden lookups are cached too
+        for _ in range(2):
+            with pytest.raises(PermissionDenied):
+                field_lookup.get_fields_from_lookup(Authenticator, 'configuration__icontains')
+        assert resolve.call_count == 3
+
+
+def test_warm_lookup_cache():
+    field_lookup = FieldLookupBackend()
+    lookup_cache.clear()
+    field_lookup.warm_lookup_cache([AuthenticatorMap], 2)
+    with mock.patch('ansible_base.rest_filters.rest_framework.field_lookup_backend.get_fields_and_json_keys_from_path') as resolve:
+        field_lookup.get_fields_from_lookup(AuthenticatorMap, 'authenticator__name__icontains')
+        field_lookup.get_fields_from_lookup(AuthenticatorMap, 'map_type')
+        with pytest.raises(PermissionDenied):
+            field_lookup.get_fields_from_lookup(AuthenticatorMap, 'authenticator__configuration')
+    resolve.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    'strategy,query,expected_header',
+    (
+        ('distinct', {'authenticatormap__map_type': 'is_superuser'}, 'distinct'),
+        ('subquery', {'authenticatormap__map_type': 'is_superuser'}, 'subquery'),
+        ('subquery', {'authenticatormap__map_type': 'is_superuser', 'name__startswith': 'Test'}, 'subquery'),
+        ('subquery', {'authenticatormap__map_type': 'is_superuser', 'chain__authenticatormap__organization': 'testorg'}, 'subquery, exists'),
+        ('subquery', {'name__startswith': 'Test'}, None),
+    ),
+)
+def test_filter_distinct_strategy(admin_api_client, local_authenticator_map, local_authenticator_map_1, strategy, query, expected_header):
+    url = reverse("authenticator-list")
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_DISTINCT_STRATEGY=strategy, DEBUG=True):
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_api_client.get(url, data=query)
+    assert response.status_code == 200
+    # Both maps belong to the same authenticator but it is only listed once
+    assert [authenticator['id'] for authenticator in response.data['results']] == [local_authenticator_map.authenticator.id]
+    assert response.headers.get('X-API-Filter-Strategy') == expected_header
+
+    list_queries = [query['sql'] for query in queries.captured_queries if 'dab_authentication_authenticator' in query['sql']]
+    assert any('DISTINCT' in sql for sql in list_queries) is (strategy == 'distinct')
+
+
+@pytest.mark.parametrize(
+    'query,expected_header',
+    (
+        # The subquery needs the annotation the JSONField is compared as text with
+        ({'triggers__icontains': 'always', 'authenticator__authenticatormap__map_type': 'is_superuser'}, 'subquery'),
+        # Filters on to-one relations and JSONFields can't return duplicates, they are not wrapped
+        ({'triggers__icontains': 'always'}, None),
+        ({'authenticator__name__startswith': 'Test Local'}, None),
+    ),
+)
+def test_filter_subquery_strategy_only_wraps_to_many(admin_api_client, local_authenticator_map, query, expected_header):
+    url = reverse("authenticator_map-list")
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_DISTINCT_STRATEGY='subquery', DEBUG=True):
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_api_client.get(url, data=query)
+    assert response.status_code == 200, response.data
+    assert [authenticator_map['id'] for authenticator_map in response.data['results']] == [local_authenticator_map.id]
+    assert response.headers.get('X-API-Filter-Strategy') == expected_header
+    list_queries = [query['sql'] for query in queries.captured_queries if 'FROM "dab_authentication_authenticatormap"' in query['sql']]
+    assert any('IN (SELECT' in sql for sql in list_queries) is (expected_header is not None)
+
+
+def test_filter_distinct_strategy_invalid():
+    request = MagicMock()
+    request.query_params.lists.return_value = [('name', ['a'])]
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_DISTINCT_STRATEGY='sort'):
+        with pytest.raises(ImproperlyConfigured):
+            FieldLookupBackend().filter_queryset(request, Authenticator.objects.all(), AuthenticatorViewSet)
+
+
+def test_filter_strategy_header_only_in_debug(admin_api_client, local_authenticator_map):
+    url = reverse("authenticator-list")
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_DISTINCT_STRATEGY='subquery', DEBUG=False):
+        response = admin_api_client.get(url, data={'authenticatormap__map_type': 'is_superuser'})
+    assert response.status_code == 200
+    assert 'X-API-Filter-Strategy' not in response.headers
+
+
+@pytest.mark.parametrize(
+    'lookup,value,supports_containment,expected',
+    (
+        # The whole document is compared as text
+        ('triggers__icontains', 'always', True, ('always', 'triggers_as_txt__icontains')),
+        ('triggers__contains', '{"always": {}}', False, ('{"always": {}}', 'triggers_as_txt__contains')),
+        # Unless it is a containment check of a JSON object and the database can do it
+        ('triggers__contains', '{"always": {}}', True, ({'always': {}}, 'triggers__contains')),
+        ('triggers__has_key', 'always', False, ('always', 'triggers__has_key')),
+        ('triggers__has_any_keys', 'always,never', False, (['always', 'never'], 'triggers__has_any_keys')),
+        ('triggers__groups__has_keys', 'has_or,has_and', False, (['has_or', 'has_and'], 'triggers__groups__has_keys')),
+        # Values of keys are JSON
+        ('triggers__always', '{}', False, ({}, 'triggers__always__exact')),
+        ('triggers__groups__has_or__in', '"a",5', False, (['a', 5], 'triggers__groups__has_or__in')),
+        ('triggers__groups__has_or__icontains', 'a', False, ('a', 'triggers__groups__has_or__icontains')),
+        ('triggers__attributes__join_condition__isnull', 'true', False, (True, 'triggers__attributes__join_condition__isnull')),
+        # Comparing the value of a key is turned into an indexable containment check
+        ('triggers__attributes__join_condition', 'or', True, ({'attributes': {'join_condition': 'or'}}, 'triggers__contains')),
+        ('triggers__attributes__join_condition', 'true', True, ({'attributes': {'join_condition': True}}, 'triggers__contains')),
+        ('triggers__groups__has_or', '["a"]', True, (['a'], 'triggers__groups__has_or__exact')),
+    ),
+)
+def test_json_value_to_python(lookup, value, supports_containment, expected):
+    field_lookup = FieldLookupBackend()
+    with mock.patch.object(FieldLookupBackend, 'supports_json_containment', return_value=supports_containment):
+        assert field_lookup.value_to_python(AuthenticatorMap, lookup, value)[:2] == expected
+
+
+@pytest.mark.parametrize(
+    'model,lookup,value',
+    (
+        (AuthenticatorMap, 'triggers__secret', 'a'),
+        (AuthenticatorMap, 'triggers__groups__has_or__0', 'a'),
+        (AuthenticatorMap, 'triggers__has_key', 'secret'),
+        (AuthenticatorMap, 'triggers__has_keys', 'always,secret'),
+        (AuthenticatorUser, 'claims__email', 'a'),
+    ),
+)
+def test_json_keys_not_allowed(model, lookup, value):
+    with pytest.raises(PermissionDenied) as excinfo:
+        FieldLookupBackend().value_to_python(model, lookup, value)
+    assert 'not allowed' in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    'query,found',
+    (
+        ({'triggers__has_key': 'always'}, True),
+        ({'triggers__has_key': 'never'}, False),
+        ({'triggers__always': '{}'}, True),
+        ({'triggers__always__isnull': 'false'}, True),
+        ({'triggers__never__isnull': 'false'}, False),
+    ),
+)
+def test_filter_json_keys(admin_api_client, local_authenticator_map, query, found):
+    response = admin_api_client.get(reverse("authenticator_map-list"), data=query)
+    assert response.status_code == 200
+    assert [authenticator_map['id'] for authenticator_map in response.data['results']] == ([local_authenticator_map.id] if found else [])
@@ -0,0 +1,160 @@
+import base64
+import datetime
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ansible_base.rest_filters.rest_framework.pagination import KeysetPagination
+from test_app.models import Organization, Team
+
+
+@pytest.fixture
+def organizations(db, admin_user):
+    # Duplicate descriptions and a nullable column to exercise the tiebreaker and null handling
+    return [Organization.objects.create(name=f'org{i:02}', description=f'desc{i % 3}', created_by=admin_user if i % 2 else None) for i in range(11)]
+
+
+def get_page(queryset, cursor=None, page_size=3):
+    params = {'page_size': page_size}
+    if cursor:
+        params['cursor'] = cursor
+    request = Request(APIRequestFactory().get('/organizations/', params))
+    paginator = KeysetPagination()
+    rows = paginator.paginate_queryset(queryset, request)
+    return rows, paginator.get_next_link(), paginator.get_previous_link()
+
+
+def get_cursor(link):
+    return parse_qs(urlparse(link).query)['cursor'][0] if link else None
+
+
+def walk(queryset, page_size=3):
+    """
+    Follows the next links to the end and then the previous links back to the start, returns the pks read each way
+    """
+    forward, backward, pages = [], [], []
+    rows, next_link, previous_link = get_page(queryset, page_size=page_size)
+    assert previous_link is None
+    while True:
+        pages.append(rows)
+        forward.extend(row.pk for row in rows)
+        # A cursor which doesn't compare equal to its row returns rows again, maybe forever
+        assert len(forward) == len(set(forward))
+        if not next_link:
+            break
+        rows, next_link, previous_link = get_page(queryset, get_cursor(next_link), page_size)
+        assert previous_link
+
+    while previous_link:
+        rows, next_link, previous_link = get_page(queryset, get_cursor(previous_link), page_size)
+        assert next_link
+        backward = [row.pk for row in rows] + backward
+        pages.pop()
+        assert rows == pages[-1]
+    return forward, backward
+
+
+@pytest.mark.parametrize(
+    'ordering',
+    (
+        ('name',),
+        ('-name',),
+        ('description',),
+        ('-description', 'name'),
+        ('created_by',),
+        ('-created_by', '-description'),
+        ('created_by__username', 'description'),
+    ),
+)
+def test_keyset_pagination_walk(organizations, ordering):
+    # Sort in python with nulls last in both directions, applying the keys from the last one to the first
+    expected = sorted(organizations, key=lambda org: org.pk)
+    getters = {
+        'name': lambda org: org.name,
+        'description': lambda org: org.description,
+        'created_by': lambda org: org.created_by_id,
+        'created_by__username': lambda org: org.created_by.username if org.created_by else None,
+    }
+    for order in reversed(ordering):
+        value = getters[order.lstrip('-')]
+        non_null = sorted([org for org in expected if value(org) is not None], key=value, reverse=order.startswith('-'))
+        expected = non_null + [org for org in expected if value(org) is None]
+
+    forward, backward = walk(Organization.objects.order_by(*ordering))
+    assert forward == [org.pk for org in expected]
+    assert backward == forward[: len(backward)]
+
+
+@pytest.mark.parametrize('ordering', ('created_on', '-modified_on'))
+def test_keyset_pagination_walk_datetimes(organizations, ordering):
+    # Timestamps within the same millisecond, the cursor has to keep the microseconds
+    start = datetime.datetime(2024, 1, 1, 12, 0, 0, 123000, tzinfo=datetime.timezone.utc)
+    for i, organization in enumerate(organizations):
+        offset = datetime.timedelta(microseconds=i * 7 % 11)
+        Organization.objects.filter(pk=organization.pk).update(created_on=start + offset, modified_on=start + offset)
+    field = ordering.lstrip('-')
+    expected = sorted(Organization.objects.order_by('pk'), key=lambda org: getattr(org, field), reverse=ordering.startswith('-'))
+
+    forward, backward = walk(Organization.objects.order_by(ordering), page_size=2)
+    assert forward == [org.pk for org in expected]
+    assert backward == forward[: len(backward)]
+
+
+def test_keyset_pagination_default_ordering(organizations):
+    # The default ordering of Organization is by pk
+    forward, backward = walk(Organization.objects.all(), page_size=4)
+    assert forward == sorted(org.pk for org in organizations)
+    assert backward == forward[:8]
+
+
+def test_keyset_pagination_unique_column_has_no_tiebreaker(organizations):
+    paginator = KeysetPagination()
+    assert [key[1] for key in paginator.get_keys(Organization.objects.order_by('-name'))] == ['name']
+    assert [key[1] for key in paginator.get_keys(Organization.objects.order_by('description'))] == ['description', 'pk']
+    assert [key[1] for key in paginator.get_keys(Organization.objects.order_by('created_by'))] == ['created_by_id', 'pk']
+
+
+def test_keyset_pagination_rejects_to_many_ordering(db):
+    with pytest.raises(ParseError):
+        KeysetPagination().get_keys(Organization.objects.order_by('teams__name'))
+    with pytest.raises(ParseError):
+        KeysetPagination().get_keys(Team.objects.order_by('?'))
+
+
+def encode_cursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+
+
+@pytest.mark.parametrize(
+    'ordering,cursor',
+    (
+        ('name', 'garbage'),
+        ('name', 'e30='),
+        ('name', 'eyJ2IjogWzFdLCAiciI6IGZhbHNlLCAibyI6IFsiZm9vIl19'),
+        # Values which don't fit the sort fields
+        ('created_on', encode_cursor({'v': ['notadate', 'abc'], 'r': False, 'o': ['created_on', 'pk']})),
+        ('created_on', encode_cursor({'v': [[2024], 1], 'r': False, 'o': ['created_on', 'pk']})),
+        ('description', encode_cursor({'v': ['desc1', {'pk': 1}], 'r': True, 'o': ['description', 'pk']})),
+    ),
+)
+def test_keyset_pagination_invalid_cursor(organizations, ordering, cursor):
+    with pytest.raises(NotFound):
+        get_page(Organization.objects.order_by(ordering), cursor)
+
+
+def test_keyset_pagination_cursor_from_other_ordering(organizations):
+    _, next_link, _ = get_page(Organization.objects.order_by('name'))
+    with pytest.raises(NotFound):
+        get_page(Organization.objects.order_by('-name'), get_cursor(next_link))
+
+
+def test_keyset_pagination_response(organizations):
+    request = Request(APIRequestFactory().get('/organizations/', {'page_size': 20}))
+    paginator = KeysetPagination()
+    rows = paginator.paginate_queryset(Organization.objects.order_by('name'), request)
+    response = paginator.get_paginated_response([row.name for row in rows])
+    assert response.data == {'next': None, 'previous': None, 'results': [f'org{i:02}' for i in range(11)]}
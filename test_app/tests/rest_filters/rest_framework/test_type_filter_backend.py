@@ -1,7 +1,11 @@
 from unittest.mock import MagicMock, Mock
 
 import pytest
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import FieldError
+from django.db.models.signals import post_migrate
 from rest_framework.exceptions import ParseError
 
 from ansible_base.authentication.models import Authenticator
@@ -33,3 +37,22 @@ def test_TypeFilterBackend_filter_query_set_exception():
 
     with pytest.raises(ParseError):
         filter.filter_queryset(request, Authenticator.objects.all(), AuthenticatorViewSet)
+
+
+@pytest.mark.django_db
+def test_TypeFilterBackend_types_map_is_cached(django_assert_num_queries):
+    TypeFilterBackend.clear_types_map()
+    ContentType.objects.clear_cache()
+    types_map = TypeFilterBackend.get_types_map()
+    assert types_map == {'user': ContentType.objects.get_for_model(User, for_concrete_model=False).pk}
+
+    with django_assert_num_queries(0):
+        assert TypeFilterBackend.get_types_map() is types_map
+
+
+@pytest.mark.django_db
+def test_TypeFilterBackend_types_map_cleared_on_post_migrate():
+    types_map = TypeFilterBackend.get_types_map()
+    post_migrate.send(sender=apps.get_app_config('dab_rest_filters'), app_config=apps.get_app_config('dab_rest_filters'), verbosity=0, interactive=False)
+    assert TypeFilterBackend._types_map is None
+    assert TypeFilterBackend.get_types_map() == types_map
@@ -0,0 +1,139 @@
+import logging
+from unittest import mock
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+
+from ansible_base.authentication.models import Authenticator, AuthenticatorMap
+from ansible_base.authentication.views import AuthenticatorViewSet
+from ansible_base.rest_filters.cost import QueryCostEstimator, get_cost_estimator, get_over_budget_action, is_indexed
+from ansible_base.rest_filters.utils import get_fields_from_path
+
+
+@pytest.mark.parametrize(
+    'model,lookup,expected',
+    (
+        (Authenticator, 'name__icontains', 0),
+        (Authenticator, 'name__regex', 5),
+        (Authenticator, 'created_by__exact', 0),
+        (Authenticator, 'created_by__username__exact', 1),
+        (Authenticator, 'authenticatormap__map_type__exact', 5),
+        (Authenticator, 'authenticatormap__organization__iregex', 10),
+        (AuthenticatorMap, 'authenticator__users__username__exact', 7),
+    ),
+)
+def test_filter_cost(model, lookup, expected):
+    field_list, _ = get_fields_from_path(model, lookup.rsplit('__', 1)[0])
+    assert QueryCostEstimator().filter_cost(field_list, lookup) == expected
+
+
+def test_search_filter_cost():
+    field_list, _ = get_fields_from_path(AuthenticatorMap, 'authenticator')
+    assert QueryCostEstimator().search_filter_cost(field_list, ['authenticator__name__icontains']) == 3
+
+
+@pytest.mark.parametrize(
+    'model,path,indexed,expected',
+    (
+        (Authenticator, 'id', True, 0),
+        (Authenticator, 'name', True, 0),
+        (Authenticator, 'created_by', True, 0),
+        (Authenticator, 'created_on', False, 3),
+        (Authenticator, 'created_by__email', False, 4),
+    ),
+)
+def test_order_cost(model, path, indexed, expected):
+    field_list, _ = get_fields_from_path(model, path)
+    assert is_indexed(field_list[-1]) is indexed
+    assert QueryCostEstimator().order_cost(field_list) == expected
+
+
+class CheapEstimator(QueryCostEstimator):
+    regex_cost = 0
+
+
+def test_custom_cost_estimator():
+    assert type(get_cost_estimator()) is QueryCostEstimator
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_COST_ESTIMATOR='test_app.tests.rest_filters.test_cost.CheapEstimator'):
+        assert type(get_cost_estimator()) is CheapEstimator
+
+
+def test_invalid_over_budget_action():
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_OVER_BUDGET_ACTION='ignore'):
+        with pytest.raises(ImproperlyConfigured):
+            get_over_budget_action(AuthenticatorViewSet)
+
+
+@pytest.mark.parametrize(
+    'query,status_code',
+    (
+        ({'name__icontains': 'local'}, 200),
+        ({'name__regex': 'local'}, 200),
+        ({'name__regex': 'local', 'authenticatormap__map_type': 'is_superuser'}, 400),
+        ({'or__name__regex': 'local', 'or__category__regex': 'local'}, 400),
+        ({'authenticatormap__search': 'foo'}, 200),
+        ({'users__search': 'foo'}, 400),
+    ),
+)
+def test_filters_over_budget_are_rejected(admin_api_client, local_authenticator, query, status_code):
+    url = reverse("authenticator-list")
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_QUERY_BUDGET=8):
+        response = admin_api_client.get(url, data=query)
+    assert response.status_code == status_code
+    if status_code == 400:
+        assert 'too expensive' in response.data['detail']
+
+
+def test_view_query_budget(admin_api_client, local_authenticator):
+    url = reverse("authenticator-list")
+    with mock.patch.object(AuthenticatorViewSet, 'filter_query_budget', 4, create=True):
+        response = admin_api_client.get(url, data={'name__regex': 'local'})
+    assert response.status_code == 400
+
+    # The view budget takes precedence over the setting
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_QUERY_BUDGET=4):
+        with mock.patch.object(AuthenticatorViewSet, 'filter_query_budget', 5, create=True):
+            response = admin_api_client.get(url, data={'name__regex': 'local'})
+    assert response.status_code == 200
+
+
+def test_ordering_over_budget(admin_api_client, local_authenticator, saml_authenticator):
+    url = reverse("authenticator-list")
+    query = {'name__regex': '.', 'order_by': '-created_on,created_by__email'}
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_QUERY_BUDGET=10, DEBUG=True):
+        response = admin_api_client.get(url, data=query)
+        assert response.status_code == 400
+        assert 'cost 12' in response.data['detail']
+
+        with override_settings(ANSIBLE_BASE_REST_FILTERS_OVER_BUDGET_ACTION='downgrade'):
+            response = admin_api_client.get(url, data=query)
+            assert response.status_code == 200
+            # The requested ordering is dropped, only the filters are counted
+            assert response.headers['X-API-Query-Cost'] == '5'
+
+        response = admin_api_client.get(url, data={'name__regex': '.', 'order_by': '-created_on'})
+        assert response.status_code == 200
+        assert response.headers['X-API-Query-Cost'] == '8'
+        assert [authenticator['id'] for authenticator in response.data['results']] == [saml_authenticator.id, local_authenticator.id]
+
+
+def test_query_cost_header_only_in_debug(admin_api_client, local_authenticator):
+    url = reverse("authenticator-list")
+    with override_settings(DEBUG=False):
+        response = admin_api_client.get(url, data={'name__regex': 'local'})
+    assert response.status_code == 200
+    assert 'X-API-Query-Cost' not in response.headers
+
+
+def test_explain_queries(admin_api_client, local_authenticator, caplog):
+    url = reverse("authenticator-list")
+    with caplog.at_level(logging.INFO, logger='ansible_base.rest_filters.cost'):
+        with override_settings(DEBUG=True):
+            admin_api_client.get(url, data={'name__icontains': 'local'})
+        assert 'Query plan' not in caplog.text
+
+        with override_settings(DEBUG=True, ANSIBLE_BASE_REST_FILTERS_EXPLAIN_QUERIES=True):
+            admin_api_client.get(url, data={'name__icontains': 'local'})
+        assert 'Query plan of dab_authentication.Authenticator (cost 0)' in caplog.text
@@ -0,0 +1,178 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import QueryDict
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ansible_base.authentication.models import Authenticator, AuthenticatorMap
+from ansible_base.authentication.views import AuthenticatorViewSet
+from ansible_base.rest_filters.rest_framework.field_lookup_backend import FieldLookupBackend
+from ansible_base.rest_filters.rest_framework.order_backend import OrderByBackend
+from ansible_base.rest_filters.rest_framework.pagination import ResultCachePageNumberPagination
+from ansible_base.rest_filters.result_cache import CachedResult, canonical_query_params, get_model_versions, get_result_cache, invalidate_cached_results
+from test_app.models import Team, User
+
+
+@pytest.fixture
+def result_cache_settings():
+    get_result_cache().clear()
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_TIMEOUT=60, DEBUG=True):
+        yield
+    get_result_cache().clear()
+
+
+@pytest.fixture
+def result_cache(result_cache_settings):
+    # Views opt in to the result cache with its paginator
+    with mock.patch.object(AuthenticatorViewSet, 'pagination_class', ResultCachePageNumberPagination):
+        yield
+
+
+def authenticator_queries(queries):
+    return [query['sql'] for query in queries.captured_queries if 'FROM "dab_authentication_authenticator"' in query['sql']]
+
+
+def test_canonical_query_params():
+    params = canonical_query_params(QueryDict('name__icontains= b &id__in=3,1,2&name__icontains=a&order_by=-name,id&page=2&page_size=5'))
+    assert params == [['id__in', ['1,2,3']], ['name__icontains', ['a', 'b']], ['order_by', ['-name,id']]]
+    assert params == canonical_query_params(QueryDict('order_by=-name,id&name__icontains=a&id__in=2,3,1&name__icontains=b'))
+    assert params != canonical_query_params(QueryDict('order_by=id,-name&name__icontains=a&id__in=2,3,1&name__icontains=b'))
+
+
+def test_filter_results_are_cached(admin_api_client, local_authenticator, saml_authenticator, result_cache):
+    url = reverse("authenticator-list")
+    query = {'name__icontains': 'Authenticator', 'order_by': '-name'}
+    response = admin_api_client.get(url, data=query)
+    assert response.status_code == 200
+    assert response.headers['X-API-Filter-Cache'] == 'miss'
+    expected = [authenticator['id'] for authenticator in response.data['results']]
+    assert expected == [saml_authenticator.id, local_authenticator.id]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_api_client.get(url, data={'order_by': '-name', 'name__icontains': 'Authenticator'})
+    assert response.headers['X-API-Filter-Cache'] == 'hit'
+    assert [authenticator['id'] for authenticator in response.data['results']] == expected
+    assert response.data['count'] == 2
+    # The list is a single fetch by primary key
+    sql = authenticator_queries(queries)
+    assert len(sql) == 1
+    assert 'LIKE' not in sql[0] and ' IN (' in sql[0]
+
+    # Page parameters are not part of the key
+    response = admin_api_client.get(url, data={**query, 'page': 1, 'page_size': 1})
+    assert response.headers['X-API-Filter-Cache'] == 'hit'
+
+
+def test_cached_result(local_authenticator, saml_authenticator):
+    queryset = Authenticator.objects.all()
+    result = CachedResult(queryset, [saml_authenticator.pk, 0, local_authenticator.pk])
+    assert result.count() == len(result) == 3
+    assert result.exists()
+    # Rows are returned in the order of the cached primary keys, rows which no longer exist are left out
+    assert result[1:3] == [local_authenticator]
+    assert list(result) == [saml_authenticator, local_authenticator]
+    assert result[0] == saml_authenticator
+    with pytest.raises(IndexError):
+        result[1]
+
+
+def test_cached_results_are_invalidated(admin_api_client, local_authenticator, saml_authenticator, result_cache):
+    url = reverse("authenticator-list")
+    query = {'name__icontains': 'Local'}
+    assert admin_api_client.get(url, data=query).headers['X-API-Filter-Cache'] == 'miss'
+    assert admin_api_client.get(url, data=query).headers['X-API-Filter-Cache'] == 'hit'
+
+    saml_authenticator.name = 'Local SAML'
+    saml_authenticator.save()
+    response = admin_api_client.get(url, data=query)
+    assert response.headers['X-API-Filter-Cache'] == 'miss'
+    assert {authenticator['id'] for authenticator in response.data['results']} == {local_authenticator.id, saml_authenticator.id}
+
+    Authenticator.objects.filter(pk=saml_authenticator.pk).delete()
+    response = admin_api_client.get(url, data=query)
+    assert response.headers['X-API-Filter-Cache'] == 'miss'
+    assert [authenticator['id'] for authenticator in response.data['results']] == [local_authenticator.id]
+
+
+def test_cached_results_are_invalidated_by_related_models(admin_api_client, local_authenticator_map, organization, result_cache):
+    url = reverse("authenticator-list")
+    query = {'authenticatormap__name': local_authenticator_map.name}
+    response = admin_api_client.get(url, data=query)
+    assert response.headers['X-API-Filter-Cache'] == 'miss'
+    assert response.data['count'] == 1
+
+    # A change to a model the list is not filtered on keeps the cached list
+    Team.objects.create(name='unrelated', organization=organization)
+    assert admin_api_client.get(url, data=query).headers['X-API-Filter-Cache'] == 'hit'
+
+    AuthenticatorMap.objects.filter(pk=local_authenticator_map.pk).delete()
+    response = admin_api_client.get(url, data=query)
+    assert response.headers['X-API-Filter-Cache'] == 'miss'
+    assert response.data['count'] == 0
+
+
+def test_m2m_changes_invalidate_cached_results(result_cache, local_authenticator):
+    through = Authenticator.users.through
+    versions = get_model_versions([Authenticator, User])
+    invalidate_cached_results(through, action='pre_add', instance=local_authenticator, model=User)
+    assert get_model_versions([Authenticator, User]) == versions
+    invalidate_cached_results(through, action='post_add', instance=local_authenticator, model=User)
+    assert set(get_model_versions([Authenticator, User])).isdisjoint(versions)
+
+
+def test_result_cache_disabled(admin_api_client, local_authenticator):
+    url = reverse("authenticator-list")
+    with override_settings(DEBUG=True):
+        response = admin_api_client.get(url, data={'name__icontains': 'Local'})
+    assert response.status_code == 200
+    assert 'X-API-Filter-Cache' not in response.headers
+
+
+def test_result_cache_view_opt_out(admin_api_client, local_authenticator, result_cache):
+    url = reverse("authenticator-list")
+    with mock.patch.object(AuthenticatorViewSet, 'filter_result_cache_timeout', 0, create=True):
+        response = admin_api_client.get(url, data={'name__icontains': 'Local'})
+    assert response.status_code == 200
+    assert 'X-API-Filter-Cache' not in response.headers
+
+
+def test_result_cache_only_lists(admin_api_client, local_authenticator, result_cache):
+    response = admin_api_client.get(reverse("authenticator-detail", kwargs={'pk': local_authenticator.pk}))
+    assert response.status_code == 200
+    assert 'X-API-Filter-Cache' not in response.headers
+
+
+def test_result_cache_max_rows(admin_api_client, local_authenticator, saml_authenticator, result_cache):
+    url = reverse("authenticator-list")
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_RESULT_CACHE_MAX_ROWS=1):
+        for _ in range(2):
+            response = admin_api_client.get(url, data={'name__icontains': 'Authenticator'})
+            assert response.headers['X-API-Filter-Cache'] == 'skip'
+            assert response.data['count'] == 2
+    assert Authenticator.objects.count() == 2
+
+
+def test_result_cache_needs_the_paginator(admin_api_client, local_authenticator, result_cache_settings):
+    url = reverse("authenticator-list")
+    response = admin_api_client.get(url, data={'name__icontains': 'Local'})
+    assert response.status_code == 200
+    assert 'X-API-Filter-Cache' not in response.headers
+
+
+def test_filter_backends_return_a_queryset(local_authenticator, result_cache):
+    request = Request(APIRequestFactory().get('/authenticators/', {'name__icontains': 'Local', 'order_by': 'name'}))
+    request.user = AnonymousUser()
+    view = AuthenticatorViewSet(request=request, kwargs={}, action='list', format_kwarg=None)
+    queryset = Authenticator.objects.all()
+    for backend in (FieldLookupBackend, OrderByBackend):
+        queryset = backend().filter_queryset(request, queryset, view)
+    # Later backends and the view can keep using it as a queryset
+    assert isinstance(queryset, QuerySet)
+    assert list(queryset.filter(enabled=True).values_list('pk', flat=True)) == [local_authenticator.pk]
@@ -0,0 +1,87 @@
+from unittest import mock
+
+import pytest
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorExact
+from django.db import connection
+from django.db.migrations.state import ProjectState
+from django.test import override_settings
+from django.urls import reverse
+
+from ansible_base.authentication.models import Authenticator
+from ansible_base.rest_filters.rest_framework.field_lookup_backend import FieldLookupBackend
+from ansible_base.rest_filters.search import AddSearchIndexes, get_search_field_names, get_search_indexes, get_search_mode, search_index_operations
+from test_app.models import User
+
+
+def test_get_search_field_names():
+    assert get_search_field_names(User) == ['username', 'first_name', 'last_name', 'email']
+
+
+@pytest.mark.parametrize(
+    'mode,vendor,expected',
+    (
+        (None, 'postgresql', 'icontains'),
+        ('fulltext', 'postgresql', 'fulltext'),
+        ('fulltext', 'sqlite', 'icontains'),
+    ),
+)
+def test_get_search_mode(mode, vendor, expected):
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_SEARCH_MODE=mode), mock.patch.object(connection, 'vendor', vendor):
+        assert get_search_mode() == expected
+
+
+def test_build_search_q_icontains():
+    q = FieldLookupBackend().build_search_q('find_me', ['created_by__username__icontains', 'created_by__email__icontains'], 'icontains')
+    assert q.connector == 'OR'
+    assert q.children == [('created_by__username__icontains', 'find_me'), ('created_by__email__icontains', 'find_me')]
+
+
+def test_build_search_q_fulltext():
+    constrains = ['created_by__username__icontains', 'created_by__email__icontains', 'modified_by__username__icontains']
+    q = FieldLookupBackend().build_search_q('find_me', constrains, 'fulltext')
+    # One full-text search for each relation
+    assert len(q.children) == 2
+    expression = q.children[0]
+    assert isinstance(expression, SearchVectorExact)
+    assert [source.name for source in expression.lhs.source_expressions] == ['created_by__username', 'created_by__email']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('mode', ('icontains', 'fulltext'))
+def test_search_falls_back_to_icontains(admin_api_client, local_authenticator_map, mode):
+    url = reverse("authenticator_map-list")
+    with override_settings(ANSIBLE_BASE_REST_FILTERS_SEARCH_MODE=mode):
+        response = admin_api_client.get(url, data={'authenticator__search': 'local'})
+    assert response.status_code == 200
+    assert [authenticator_map['id'] for authenticator_map in response.data['results']] == [local_authenticator_map.id]
+
+
+def test_get_search_indexes():
+    indexes = get_search_indexes(User, 'trigram')
+    assert len(indexes) == 4
+    assert len(get_search_indexes(User, 'fulltext')) == 1
+    for index in indexes + get_search_indexes(User, 'fulltext'):
+        assert isinstance(index, GinIndex)
+        assert len(index.name) <= 30
+    assert len(set(index.name for index in indexes)) == 4
+
+    with pytest.raises(ValueError):
+        get_search_indexes(User, 'btree')
+
+
+def test_search_index_operations():
+    operations = search_index_operations('user', 'team', kind='fulltext')
+    assert [operation.deconstruct() for operation in operations] == [
+        ('AddSearchIndexes', [], {'model_name': 'user', 'kind': 'fulltext'}),
+        ('AddSearchIndexes', [], {'model_name': 'team', 'kind': 'fulltext'}),
+    ]
+
+
+def test_add_search_indexes_does_nothing_on_sqlite():
+    state = ProjectState.from_apps(Authenticator._meta.apps)
+    operation = AddSearchIndexes('user', 'trigram')
+    schema_editor = mock.Mock(connection=connection)
+    operation.database_forwards('test_app', schema_editor, state, state)
+    operation.database_backwards('test_app', schema_editor, state, state)
+    assert schema_editor.mock_calls == []
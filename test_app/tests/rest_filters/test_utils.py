@@ -1,11 +1,54 @@
+from unittest.mock import Mock
+
 import pytest
 from rest_framework.exceptions import ParseError
 
 from ansible_base.authentication.models import Authenticator
-from ansible_base.rest_filters.utils import get_field_from_path
+from ansible_base.rest_filters.utils import LookupCache, get_field_from_path, get_filterable_paths
 
 
 def test_invalid_field_hop():
     with pytest.raises(ParseError) as excinfo:
         get_field_from_path(Authenticator, 'created_by__last_name__user')
     assert 'No related model for' in str(excinfo)
+
+
+def test_get_filterable_paths():
+    paths = list(get_filterable_paths(Authenticator, 2))
+    assert 'name' in paths
+    assert 'created_by' in paths
+    assert 'created_by__username' in paths
+    assert 'created_by__created_by__username' not in paths
+
+
+def test_lookup_cache_is_bounded():
+    cache = LookupCache(maxsize=2)
+    resolve = Mock(side_effect=lambda key: key.upper())
+    assert cache.get('a', resolve, 'a') == 'A'
+    assert cache.get('b', resolve, 'b') == 'B'
+    assert cache.get('a', resolve, 'a') == 'A'
+    # Adding c evicts b, the least recently used
+    assert cache.get('c', resolve, 'c') == 'C'
+    assert len(cache) == 2
+    assert resolve.call_count == 3
+    assert cache.get('b', resolve, 'b') == 'B'
+    assert resolve.call_count == 4
+
+
+def test_lookup_cache_caches_exceptions():
+    cache = LookupCache(maxsize=2)
+    resolve = Mock(side_effect=ParseError('bad lookup'))
+    for _ in range(2):
+        with pytest.raises(ParseError) as excinfo:
+            cache.get('a', resolve)
+        assert 'bad lookup' in str(excinfo.value)
+    assert resolve.call_count == 1
+
+
+def test_lookup_cache_disabled():
+    cache = LookupCache(maxsize=0)
+    resolve = Mock(return_value=1)
+    cache.get('a', resolve)
+    cache.get('a', resolve)
+    assert resolve.call_count == 2
+    assert len(cache) == 0